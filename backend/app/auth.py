@@ -1,20 +1,24 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select, event, inspect as sa_inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from .cache import TTLCache
 from .config import settings
 from .database import get_db
+from .hashing import pwd_context, password_hasher
 from .models import User
-
-# 密码加密上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from .replica import USE_PRIMARY
 
 # JWT Bearer认证
 security = HTTPBearer()
 
+# 已认证用户缓存（按令牌中的用户名缓存用户列值快照）
+user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
@@ -26,6 +30,16 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在哈希执行器中验证密码，不阻塞事件循环"""
+    return await password_hasher.verify(plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """在哈希执行器中获取密码哈希，不阻塞事件循环"""
+    return await password_hasher.hash(password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """创建访问令牌"""
     to_encode = data.copy()
@@ -51,19 +65,19 @@ def verify_token(token: str) -> Optional[str]:
         return None
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
     """验证用户身份"""
-    user = db.query(User).filter(User.username == username).first()
+    user = await db.scalar(select(User).where(User.username == username))
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> User:
     """获取当前用户"""
     credentials_exception = HTTPException(
@@ -76,15 +90,74 @@ def get_current_user(
     if username is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
+    user = await load_cached_user(db, username)
     if user is None:
         raise credentials_exception
     
     return user
 
 
+async def load_cached_user(db: AsyncSession, username: str) -> Optional[User]:
+    """
+    按用户名获取用户，优先使用进程内缓存
+    - 命中时把快照还原为会话中的持久化对象，不发出任何SQL
+    - 未命中时从主库查询并写入缓存：缓存刚因改密码、禁用等修改而失效，
+      从有延迟的只读副本读取会把旧数据重新缓存 user_cache_ttl 秒
+    """
+    snapshot = user_cache.get(username)
+    if snapshot is not None:
+        cached_user = User(**snapshot)
+        make_transient_to_detached(cached_user)
+        return await db.merge(cached_user, load=False)
+    
+    user = await db.scalar(
+        select(User).where(User.username == username).execution_options(**{USE_PRIMARY: True})
+    )
+    if user is not None:
+        user_cache.set(username, {
+            attr.key: getattr(user, attr.key) for attr in sa_inspect(User).column_attrs
+        })
+    return user
+
+
+def invalidate_cached_user(username: str):
+    """使指定用户的缓存失效"""
+    user_cache.delete(username)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    """记录本事务中被修改或删除的用户"""
+    changed = session.info.setdefault("changed_usernames", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.username)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    """事务提交后使被修改用户的缓存失效（资料更新、头像、改密码、禁用账户等）"""
+    for username in session.info.pop("changed_usernames", ()):
+        invalidate_cached_user(username)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changed_users(session, previous_transaction):
+    session.info.pop("changed_usernames", None)
+
+
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """获取当前活跃用户"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="用户账户已被禁用")
     return current_user
+
+
+def get_current_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+    """获取当前管理员用户"""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="需要管理员权限"
+        )
+    return current_user
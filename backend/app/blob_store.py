@@ -0,0 +1,273 @@
+"""
+内容寻址的媒体文件存储
+
+上传时边写临时文件边计算 SHA-256，文件按哈希保存在 blobs/ab/cd/<哈希>.<扩展名>，
+相同内容只保存一份。media_blobs 表记录每个文件被多少条 MediaItem 引用：
+- 上传：文件不存在时先存到哈希路径，再用一条 upsert（INSERT ... ON CONFLICT DO UPDATE）把引用数加一，
+  多个进程同时上传同一内容时不会重复插入记录
+- 删除：提交引用数减一之后，另开一个事务删除引用数为0的记录，在该事务提交前删除文件及其缩略图
+
+跨进程的正确性由数据库保证：删除记录时持有该行（SQLite为整个数据库）的写锁，
+同一内容的 upsert 会等待这个事务结束后新建记录；新建记录（引用数为1）的一方负责确认文件仍在存储中，
+不在时用自己的临时文件重新存入。进程内的锁只用来让同一进程的操作排队，减少数据库上的等待。
+临时文件写在本地，入库的文件通过 app.storage 存入配置的存储后端；
+预签名直传的内容已经在存储中，没有临时文件（temp_path 为 None）。
+文件通常在第一条写语句之前存好，SQLite 的进程内写锁（sqlite_profile）只覆盖SQL本身；
+只有与删除并发、需要重新存入或删除文件时才在写事务中读写存储。
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import uuid
+import weakref
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+import aiofiles.os
+from fastapi import HTTPException, UploadFile, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from .config import settings
+from .models import MediaBlob, MediaItem
+from .storage import StorageBackend, storage
+from .uploads import save_upload_file
+
+BLOB_DIR = "blobs"
+# 上传中的临时文件，以点开头不会被 /uploads 对外提供
+TEMP_DIR = os.path.join(BLOB_DIR, ".incoming")
+
+
+def blob_relative_path(content_hash: str, extension: str = "") -> str:
+    """按哈希前两级分目录的相对路径"""
+    return f"{BLOB_DIR}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{extension.lower()}"
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> Tuple[str, int]:
+    """流式计算文件的 SHA-256，返回 (哈希, 大小)"""
+    hasher = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size
+
+
+def _link_or_copy(source: str, target: str):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+async def _remove_temp(path: str):
+    try:
+        await aiofiles.os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@dataclass
+class IncomingBlob:
+    """已写入临时文件（或已直传到存储）、尚未入库的上传"""
+    temp_path: Optional[str]
+    content_hash: str
+    size: int
+    extension: str
+
+
+class BlobStore:
+    """内容寻址存储"""
+
+    def __init__(self, upload_dir: str, backend: StorageBackend):
+        self.upload_dir = upload_dir
+        self.backend = backend
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def lock(self, content_hash: str) -> asyncio.Lock:
+        """同一哈希的引用计数与文件操作在本进程内排队使用的锁（跨进程的正确性不依赖它）"""
+        lock = self._locks.get(content_hash)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[content_hash] = lock
+        return lock
+
+    def full_path(self, relative_path: str) -> str:
+        """本地暂存目录中的路径"""
+        return os.path.join(self.upload_dir, relative_path)
+
+    async def receive(
+        self,
+        file: UploadFile,
+        max_size: int,
+        too_large_detail: str = "文件大小超过限制"
+    ) -> IncomingBlob:
+        """流式保存上传文件到临时目录，同时计算哈希"""
+        hasher = hashlib.sha256()
+        temp_name = uuid.uuid4().hex
+        size = await save_upload_file(
+            file, self.full_path(TEMP_DIR), temp_name, max_size, too_large_detail, hasher=hasher
+        )
+        return IncomingBlob(
+            temp_path=self.full_path(os.path.join(TEMP_DIR, temp_name)),
+            content_hash=hasher.hexdigest(),
+            size=size,
+            extension=os.path.splitext(file.filename or "")[1]
+        )
+
+    async def adopt(self, path: str, extension: str) -> IncomingBlob:
+        """
+        把已经在磁盘上的暂存文件（如分块上传的结果）作为待入库的上传，在线程中计算哈希
+        入库使用该文件的硬链接（跨文件系统时为副本），原文件保持不变，
+        入库失败时调用方仍可重试；成功后由调用方删除原文件
+        """
+        content_hash, size = await asyncio.to_thread(hash_file, path)
+        temp_path = self.full_path(os.path.join(TEMP_DIR, uuid.uuid4().hex))
+        await asyncio.to_thread(_link_or_copy, path, temp_path)
+        return IncomingBlob(temp_path=temp_path, content_hash=content_hash, size=size, extension=extension)
+
+    async def blob_paths(self, db: AsyncSession, uploads: Iterable[IncomingBlob]) -> Dict[str, str]:
+        """
+        每个哈希在存储中的路径：已有记录时使用记录中的路径，否则按该哈希第一个文件的扩展名
+        同一批中内容相同、扩展名不同的文件（.jpg 与 .jpeg）共用一个路径
+        """
+        uploads = list(uploads)
+        paths = dict((await db.execute(
+            select(MediaBlob.content_hash, MediaBlob.file_path)
+            .where(MediaBlob.content_hash.in_({incoming.content_hash for incoming in uploads}))
+        )).all())
+        for incoming in uploads:
+            paths.setdefault(incoming.content_hash, blob_relative_path(incoming.content_hash, incoming.extension))
+        return paths
+
+    async def _put_copy(self, incoming: IncomingBlob, file_path: str):
+        """存入临时文件的硬链接，临时文件本身保留到提交之后，需要时可以再次存入"""
+        staged = self.full_path(os.path.join(TEMP_DIR, uuid.uuid4().hex))
+        await asyncio.to_thread(_link_or_copy, incoming.temp_path, staged)
+        try:
+            await self.backend.put(file_path, staged)
+        finally:
+            await _remove_temp(staged)
+
+    async def place(self, incoming: IncomingBlob, file_path: str) -> bool:
+        """
+        文件不存在时把临时文件存入 file_path，返回是否新存入
+        在本事务的第一条写语句之前调用，文件或网络I/O不占用数据库写锁；临时文件由调用方在提交后丢弃
+        """
+        if incoming.temp_path is None:
+            # 直传的内容应已在存储中
+            if not await self.backend.exists(file_path):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="文件尚未上传到存储，请重新上传"
+                )
+            return False
+        if await self.backend.exists(file_path):
+            return False
+        await self._put_copy(incoming, file_path)
+        return True
+
+    def _insert(self):
+        """media_blobs 的 INSERT，使用所在数据库的 ON CONFLICT 语法"""
+        dialect = sqlite if "sqlite" in settings.database_url else postgresql
+        return dialect.insert(MediaBlob)
+
+    async def add_reference(self, db: AsyncSession, incoming: IncomingBlob, file_path: str) -> Tuple[MediaBlob, bool]:
+        """
+        引用数加一（记录不存在时以 file_path 新建），返回 (文件记录, 是否新建)
+        已有记录时沿用记录中的路径；新建时调用方需再调用 ensure_stored() 确认文件仍在存储中
+        """
+        await db.execute(
+            self._insert()
+            .values(content_hash=incoming.content_hash, file_path=file_path, file_size=incoming.size, ref_count=1)
+            .on_conflict_do_update(
+                index_elements=[MediaBlob.content_hash],
+                set_={"ref_count": MediaBlob.ref_count + 1}
+            )
+        )
+        blob = await db.scalar(
+            select(MediaBlob)
+            .where(MediaBlob.content_hash == incoming.content_hash)
+            .execution_options(populate_existing=True)
+        )
+        # 引用数为0的记录是删除中途失败留下的，文件可能已被删除，与新建同样处理
+        return blob, blob.ref_count == 1
+
+    async def ensure_stored(self, incoming: IncomingBlob, file_path: str) -> bool:
+        """
+        新建记录之后确认文件在存储中，返回是否重新存入了文件
+        place() 之后其他进程可能删除了同一内容的最后一个引用及其文件；
+        新建的记录在提交前不会被删除，此时检查的结果可靠
+        """
+        if await self.backend.exists(file_path):
+            return False
+        if incoming.temp_path is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="文件尚未上传到存储，请重新上传"
+            )
+        await self._put_copy(incoming, file_path)
+        return True
+
+    async def discard(self, incoming: IncomingBlob):
+        """删除临时文件（已经移动或删除时忽略）"""
+        if incoming.temp_path is not None:
+            await _remove_temp(incoming.temp_path)
+
+    async def existing_thumbnails(self, db: AsyncSession, content_hash: str) -> Optional[dict]:
+        """同一内容已经生成过的缩略图，可以直接复用"""
+        return await db.scalar(
+            select(MediaItem.thumbnails)
+            .where(MediaItem.content_hash == content_hash, MediaItem.thumbnails.is_not(None))
+            .limit(1)
+        )
+
+    async def release(self, db: AsyncSession, content_hash: str):
+        """引用数减一；提交后调用 remove_unreferenced() 删除不再被引用的文件"""
+        await db.execute(
+            update(MediaBlob)
+            .where(MediaBlob.content_hash == content_hash)
+            .values(ref_count=MediaBlob.ref_count - 1)
+        )
+
+    async def remove_unreferenced(
+        self,
+        db: AsyncSession,
+        content_hash: str,
+        file_path: str,
+        extra_paths: Iterable[str] = ()
+    ) -> bool:
+        """
+        在一个事务中按已提交的引用数判断：没有引用时删除记录和文件（及 extra_paths，如缩略图），返回是否删除
+        - 没有记录时先插入引用数为0的记录，同一内容并发的 upsert 会等待本事务结束
+        - 删除记录后持有写锁删除文件，再提交；其他进程之后新建记录时会重新存入文件
+        """
+        await db.execute(
+            self._insert()
+            .values(content_hash=content_hash, file_path=file_path, file_size=0, ref_count=0)
+            .on_conflict_do_nothing(index_elements=[MediaBlob.content_hash])
+        )
+        result = await db.execute(
+            delete(MediaBlob).where(MediaBlob.content_hash == content_hash, MediaBlob.ref_count <= 0)
+        )
+        if not result.rowcount:
+            await db.rollback()
+            return False
+        await self.remove_files([file_path, *extra_paths])
+        await db.commit()
+        return True
+
+    async def remove_files(self, relative_paths: Iterable[str]):
+        """从存储中删除文件，不存在时忽略"""
+        for relative_path in relative_paths:
+            await self.backend.delete(relative_path)
+
+
+# 全局内容寻址存储
+blob_store = BlobStore(settings.upload_dir, storage)
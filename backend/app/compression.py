@@ -0,0 +1,169 @@
+"""
+响应压缩
+
+- CompressionMiddleware：按 Accept-Encoding 协商 brotli / gzip，压缩文本类响应（JSON、HTML、CSS、JS等）。
+  小于 compression_min_size 的响应不压缩；流式响应逐块压缩，不会先把整个响应读入内存。
+  brotli 已列在 requirements.txt 中；环境中没有安装时只使用 gzip。
+- /uploads 下文本类文件的预压缩 .br / .gz 版本由 media_files.MediaFiles 直接返回。
+"""
+
+import zlib
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from .config import settings
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+# 值得压缩的内容类型
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+# 逐条推送的流不压缩，避免压缩缓冲导致延迟
+EXCLUDED_TYPES = ("text/event-stream",)
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(EXCLUDED_TYPES)
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """Accept-Encoding 是否接受某个编码（q=0 表示不接受）"""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    return accepted.get(encoding, accepted.get("*", 0)) > 0
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """选择在本进程内压缩使用的编码（brotli 优先），客户端都不接受时返回 None"""
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepts_encoding(accept_encoding, encoding):
+            return encoding
+    return None
+
+
+class _Compressor:
+    """gzip / brotli 增量压缩器的统一接口"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.brotli_quality)
+        else:
+            # wbits=31 输出 gzip 格式
+            self._zlib = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        """压缩一个分块，并刷新已有输出（流式响应需要及时发出）"""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+
+
+def _weaken_etag(headers: MutableHeaders):
+    """压缩后的内容与原始字节不同，强 ETag 改为弱 ETag"""
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["etag"] = f"W/{etag}"
+
+
+class CompressionMiddleware:
+    """按 Accept-Encoding 压缩文本类响应（ASGI中间件）"""
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start_message, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message.get("headers", []))
+                if (
+                    message["status"] not in (200, 201)
+                    or "content-encoding" in headers
+                    or "content-range" in headers
+                    or not is_compressible(headers.get("content-type", ""))
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # 等第一个分块到达后再决定是否压缩
+                    start_message = message
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                # 第一个分块：完整且过小的响应原样发出
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding)
+                headers = MutableHeaders(raw=list(start_message["headers"]))
+                headers["content-encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                _weaken_etag(headers)
+                if more_body:
+                    # 流式响应：长度未知，改用分块传输
+                    del headers["content-length"]
+                    await send({**start_message, "headers": headers.raw})
+                else:
+                    compressed = compressor.finish(body)
+                    headers["content-length"] = str(len(compressed))
+                    await send({**start_message, "headers": headers.raw})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+            if more_body:
+                chunk = compressor.compress(body)
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.finish(body)})
+
+        await self.app(scope, receive, compressing_send)
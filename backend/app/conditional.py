@@ -0,0 +1,180 @@
+"""
+条件GET（ETag / Last-Modified / 304）
+
+两种生成验证器的方式：
+- 廉价验证器：列表接口在查询数据之前，用一条查询取得相关表的 (数量, 最大id, 最后修改时间)，
+  与查询参数一起生成 ETag。客户端的 If-None-Match / If-Modified-Since 匹配时直接返回304，
+  不再加载和序列化列表。仅用于修改时一定会更新 updated_at 的表。
+  所有列表接口（用户、活动、媒体、评论、通知）都使用这种方式。
+- 兜底：ConditionalGetMiddleware 只处理没有设置 ETag 的 GET JSON 响应（详情、统计等小响应），
+  对响应体计算哈希作为 ETag，匹配时返回不带响应体的304，只节省传输；
+  已由廉价验证器设置 ETag 的响应直接转发，不缓冲也不计算哈希。
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# 304响应需要保留的头
+VALIDATOR_HEADERS = ("etag", "last-modified", "cache-control", "vary")
+
+
+def make_etag(*parts) -> str:
+    """由任意可 repr 的值生成强 ETag"""
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_for_body(body: bytes) -> str:
+    """由响应体生成强 ETag"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断 If-None-Match 是否匹配（弱比较）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def table_state(model, *criteria, created_column=None):
+    """
+    某个表（满足条件的行）的 (数量, 最大id, 最后修改时间) 标量子查询
+    created_column 为创建时间字段，默认 model.created_at
+    """
+    created_column = created_column if created_column is not None else model.created_at
+    modified_at = func.coalesce(model.updated_at, created_column)
+    return [
+        select(func.count()).select_from(model).where(*criteria).scalar_subquery(),
+        select(func.max(model.id)).where(*criteria).scalar_subquery(),
+        select(func.max(modified_at)).where(*criteria).scalar_subquery(),
+    ]
+
+
+def _as_utc(value) -> Optional[datetime]:
+    if not isinstance(value, datetime):
+        return None
+    # SQLite中的时间不带时区，服务端默认值均为UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+async def check_not_modified(
+    request: Request,
+    response: Response,
+    db: AsyncSession,
+    *states
+) -> Optional[Response]:
+    """
+    用廉价验证器处理条件请求
+    - 在 response 上设置 ETag / Last-Modified
+    - 客户端缓存仍然有效时返回304响应，否则返回 None，由调用方继续正常查询
+    """
+    row = (await db.execute(select(*[column for state in states for column in state]))).one()
+    etag = make_etag(request.url.path, request.url.query, tuple(row))
+    timestamps = [value for value in (_as_utc(value) for value in row[2::3]) if value is not None]
+    last_modified = max(timestamps) if timestamps else None
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    if last_modified is not None:
+        response.headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = etag_matches(if_none_match, etag)
+    else:
+        # 只有没有 If-None-Match 时才使用 If-Modified-Since
+        not_modified = False
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and last_modified is not None:
+            try:
+                not_modified = last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                not_modified = False
+
+    if not_modified:
+        return Response(
+            status_code=304,
+            headers={key: value for key, value in response.headers.items() if key in VALIDATOR_HEADERS}
+        )
+    return None
+
+
+class ConditionalGetMiddleware:
+    """
+    为未设置 ETag 的 GET JSON 响应计算内容哈希 ETag，并处理 If-None-Match（ASGI中间件）
+    已有 ETag 的响应（使用廉价验证器的列表接口）在响应头阶段就直接转发
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope.get("headers", []))
+        if_none_match = request_headers.get(b"if-none-match", b"").decode("latin-1")
+        start_message = None
+        body_parts = []
+        passthrough = False
+
+        async def buffered_send(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                content_type = headers.get(b"content-type", b"")
+                # 只处理还没有 ETag 的 200 JSON 响应，其余原样转发
+                if (
+                    message["status"] != 200
+                    or b"etag" in headers
+                    or not content_type.startswith(b"application/json")
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(body_parts)
+            etag = etag_for_body(body)
+            headers = [
+                (key, value) for key, value in start_message.get("headers", [])
+                if key.lower() != b"content-length"
+            ]
+            headers.append((b"etag", etag.encode()))
+            headers.append((b"cache-control", b"private, no-cache"))
+
+            if etag_matches(if_none_match, etag):
+                headers = [
+                    (key, value) for key, value in headers
+                    if key.lower().decode("latin-1") in VALIDATOR_HEADERS
+                    or key.lower().startswith(b"access-control-")
+                ]
+                await send({**start_message, "status": 304, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            headers.append((b"content-length", str(len(body)).encode()))
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, buffered_send)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 import os
 
 
@@ -9,6 +9,27 @@ class Settings(BaseSettings):
     # 数据库配置
     database_url: str = "sqlite:///./class_website.db"
     
+    # 只读副本配置（可选），GET请求的查询发往副本
+    read_database_url: Optional[str] = None
+    replica_max_lag_seconds: float = 5.0  # 延迟超过该值时读取回退到主库
+    replica_lag_check_interval: float = 5.0  # 延迟检查间隔（秒）
+    
+    # 连接池配置（异步引擎；SQLite未启用下方配置时不使用连接池）
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0  # 获取连接的最长等待时间（秒）
+    db_pool_recycle: int = 1800  # 连接最长使用时间（秒），-1表示不回收
+    db_pool_pre_ping: bool = True  # 检出连接前检测是否可用
+    
+    # SQLite配置（仅在使用SQLite时生效）
+    sqlite_profile: bool = True  # 是否启用下列PRAGMA与写队列
+    sqlite_wal: bool = True
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 256 * 1024 * 1024  # 256MB
+    sqlite_cache_size_kb: int = 64 * 1024  # 64MB
+    sqlite_serialize_writes: bool = True  # 进程内串行化写事务
+    
     # JWT配置
     secret_key: str = "your-secret-key-change-this-in-production"
     algorithm: str = "HS256"
@@ -17,6 +38,72 @@ class Settings(BaseSettings):
     # 文件上传配置
     upload_dir: str = "./uploads"
     max_file_size: int = 10 * 1024 * 1024  # 10MB
+    max_video_size: int = 1024 * 1024 * 1024  # 1GB，仅分块上传（/api/media/uploads）使用
+    media_chunk_size: int = 256 * 1024  # /uploads 不支持零拷贝时每次读取发送的字节数
+    media_cache_max_age: int = 365 * 24 * 3600  # UUID 命名文件的缓存时间（秒）
+    
+    # 批量上传配置
+    batch_upload_max_files: int = 50  # 一次请求最多上传的文件数
+    batch_upload_concurrency: int = 4  # 同时写入磁盘的文件数
+    
+    # 分块上传配置
+    upload_chunk_max_size: int = 16 * 1024 * 1024  # 单个分块（一次PUT）的最大字节数
+    upload_session_ttl: int = 24 * 3600  # 会话超过该时间（秒）没有写入则被清理
+    upload_session_sweep_interval: float = 600.0  # 清理检查间隔（秒）
+    
+    # 文件存储配置（见 app/storage.py）：local 保存在 upload_dir，s3 使用 S3 兼容的对象存储（需要安装 boto3）
+    storage_backend: str = "local"
+    s3_bucket: str = ""
+    s3_endpoint_url: Optional[str] = None  # MinIO 等自建服务的地址，AWS S3 留空
+    s3_region: Optional[str] = None
+    s3_access_key_id: Optional[str] = None  # 留空时使用 boto3 默认的凭证链
+    s3_secret_access_key: Optional[str] = None
+    s3_public_url: Optional[str] = None  # 存储桶可公开读取（或经CDN）时的URL前缀，留空则使用预签名下载URL
+    s3_prefix: str = ""  # 对象key的统一前缀
+    s3_presign_expires: int = 3600  # 预签名URL有效期（秒）
+
+    # 浏览次数写回间隔（秒）
+    view_count_flush_interval: float = 5.0
+    
+    # 缩略图配置
+    thumbnail_widths: List[int] = [256, 768, 1600]
+    thumbnail_quality: int = 82
+    thumbnail_workers: int = 2
+    
+    # 密码哈希执行器配置
+    password_hash_executor: str = "thread"  # thread 或 process
+    password_hash_workers: int = 4
+    password_hash_queue_size: int = 64  # 排队上限，超出后直接返回503
+    
+    # 已认证用户缓存配置（每个进程独立）
+    user_cache_size: int = 1024
+    user_cache_ttl: int = 60  # 秒，设为0禁用缓存
+    
+    # 统计接口缓存时间（秒），设为0禁用缓存
+    stats_cache_ttl: int = 10
+    
+    # 评论树配置
+    comment_max_depth: int = 5  # 回复最大嵌套层数
+    comment_replies_preview: int = 20  # 每条评论最多返回的回复数，0表示不限制
+    
+    # 请求查询统计配置
+    query_count_warning: int = 20  # 单个请求查询次数超过该值时记录警告
+    query_time_warning_ms: float = 500.0  # 单个请求数据库耗时超过该值时记录警告
+    n_plus_one_threshold: int = 5  # 同一语句在一个请求中执行达到该次数时提示 N+1
+    
+    # 慢查询日志配置
+    slow_query_ms: float = 200.0  # 执行时间超过该值（毫秒）的语句被记录，0表示关闭
+    slow_query_log_size: int = 200  # 内存中保留的最近记录数
+    slow_query_log_file: Optional[str] = None  # 可选，逐行追加JSON的文件路径
+    slow_query_explain: bool = True  # 是否在后台获取查询计划
+    
+    # 快速JSON序列化：列出的路由器跳过 response_model 校验，直接从ORM对象编码（见 app/fast_json.py）
+    fast_json_routers: List[str] = ["media", "comments"]
+    
+    # 响应压缩配置（brotli 需要另外安装 brotli 包，未安装时只使用 gzip）
+    compression_min_size: int = 1024  # 小于该字节数的响应不压缩
+    gzip_level: int = 6
+    brotli_quality: int = 4  # 动态响应使用较低的质量，压缩速度更快
     
     # 跨域配置
     allowed_origins: List[str] = [
@@ -45,3 +132,4 @@ os.makedirs(settings.upload_dir, exist_ok=True)
 os.makedirs(f"{settings.upload_dir}/avatars", exist_ok=True)
 os.makedirs(f"{settings.upload_dir}/photos", exist_ok=True)
 os.makedirs(f"{settings.upload_dir}/videos", exist_ok=True)
+os.makedirs(f"{settings.upload_dir}/thumbnails", exist_ok=True)
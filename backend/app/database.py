@@ -1,9 +1,32 @@
 from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .config import settings
+from .replica import USE_REPLICA, RoutingSession, replica_guard
+from .pool_metrics import InstrumentedAsyncQueuePool, pool_monitor
+from .query_stats import instrument_engine
+from .slow_queries import slow_query_log
+from .sqlite_profile import SerializedWriteSession, apply_sqlite_pragmas, sqlite_pragmas
 
-# 创建数据库引擎
+
+def get_async_database_url(database_url: str) -> str:
+    """将同步数据库URL转换为对应的异步驱动URL（SQLite使用aiosqlite，PostgreSQL使用asyncpg）"""
+    # 修复Railway PostgreSQL URL格式
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+
+    scheme, separator, rest = database_url.partition("://")
+    if scheme in ("postgresql", "postgresql+psycopg2"):
+        return f"postgresql+asyncpg://{rest}"
+    if scheme in ("sqlite", "sqlite+pysqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    return database_url
+
+
+# 创建数据库引擎（同步，供启动时的架构检查和命令行脚本使用）
 engine = create_engine(
     settings.database_url,
     connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
@@ -12,14 +35,69 @@ engine = create_engine(
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# SQLite: 每个连接启用WAL等PRAGMA，并串行化写事务
+use_sqlite_profile = "sqlite" in settings.database_url and settings.sqlite_profile
+
+
+def get_pool_options() -> dict:
+    """
+    异步引擎的连接池参数
+    aiosqlite 默认使用 NullPool，启用SQLite配置时改为连接池，避免每个请求重新打开文件并执行PRAGMA
+    """
+    if "sqlite" in settings.database_url and not use_sqlite_profile:
+        return {}
+    return {
+        "poolclass": InstrumentedAsyncQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+# 创建异步数据库引擎（供API路由使用，查询不会阻塞事件循环）
+async_engine = create_async_engine(get_async_database_url(settings.database_url), **get_pool_options())
+pool_monitor.instrument(async_engine.sync_engine)
+instrument_engine(async_engine.sync_engine)
+slow_query_log.instrument(async_engine)
+
+if use_sqlite_profile:
+    apply_sqlite_pragmas(engine, sqlite_pragmas())
+    apply_sqlite_pragmas(async_engine.sync_engine, sqlite_pragmas())
+
+# 只读副本引擎（可选）
+replica_engine = None
+if settings.read_database_url:
+    replica_pool_options = get_pool_options()
+    if replica_pool_options:
+        # 副本的连接不计入主库连接池指标
+        replica_pool_options["poolclass"] = AsyncAdaptedQueuePool
+    replica_engine = create_async_engine(
+        get_async_database_url(settings.read_database_url),
+        **replica_pool_options
+    )
+    instrument_engine(replica_engine.sync_engine)
+    slow_query_log.instrument(replica_engine)
+    replica_guard.configure(replica_engine)
+
+# 创建异步会话工厂
+# 提交后不过期对象，避免在响应序列化时触发隐式的懒加载IO
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=SerializedWriteSession if use_sqlite_profile and settings.sqlite_serialize_writes else AsyncSession,
+    sync_session_class=RoutingSession if replica_engine is not None else Session,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # 创建基础模型类
 Base = declarative_base()
 
 
-def get_db():
-    """获取数据库会话依赖"""
-    db = SessionLocal()
-    try:
+async def get_db(request: Request):
+    """获取数据库会话依赖（配置了只读副本时，GET/HEAD请求的读取使用副本）"""
+    async with AsyncSessionLocal() as db:
+        if request.method in ("GET", "HEAD"):
+            db.info[USE_REPLICA] = True
         yield db
-    finally:
-        db.close()
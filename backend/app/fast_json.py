@@ -0,0 +1,201 @@
+"""
+快速JSON响应
+
+默认情况下 FastAPI 会把路由返回的ORM对象按 response_model 重新校验一遍，
+再用 jsonable_encoder + 标准库 json 编码，大列表的大部分耗时都花在这里。
+数据库中读出的数据本身是可信的，快速模式按 response_model 的字段直接从ORM对象（或dict）
+取值组装成 dict/list，跳过校验，再用 orjson 编码（未安装 orjson 时退回标准库 json）。
+
+按路由器开启：在 settings.fast_json_routers 中列出路由器名称，
+路由器通过 APIRouter(route_class=fast_json_route_class("media")) 接入。
+路由中对注入的 Response 设置的响应头和状态码会带到最终响应上。
+"""
+
+import functools
+import inspect
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Callable, Dict, Union, get_args, get_origin
+from fastapi import Response
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from .config import settings
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+# 注入 Response 时使用的参数名（路由本身没有声明 Response 参数时）
+_RESPONSE_PARAM = "fast_json_response"
+
+
+def _identity(value):
+    return value
+
+
+def _json_default(value):
+    """标准库 json 的兜底编码，与 orjson 的输出保持一致"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """紧凑编码为JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_json_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """直接编码已经组装好的数据的JSON响应"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+_serializers: Dict[Any, Callable[[Any], Any]] = {}
+
+
+def build_serializer(annotation) -> Callable[[Any], Any]:
+    """
+    根据类型注解生成序列化函数
+    - Pydantic 模型：按字段从对象属性或 dict 键取值，缺失时使用字段默认值
+    - List / Dict / Optional：递归处理元素
+    - 其余类型（str、int、datetime、枚举等）原样交给编码器
+    """
+    if annotation in _serializers:
+        return _serializers[annotation]
+
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+
+    if origin is Union:
+        non_null = [arg for arg in args if arg is not type(None)]
+        if len(non_null) != 1:
+            return _identity
+        inner = build_serializer(non_null[0])
+        if inner is _identity:
+            return _identity
+        return lambda value: None if value is None else inner(value)
+
+    if origin in (list, tuple, set, frozenset):
+        item = build_serializer(args[0]) if args else _identity
+        if item is _identity:
+            return list
+        return lambda values: [item(value) for value in values]
+
+    if origin is dict:
+        item = build_serializer(args[1]) if len(args) == 2 else _identity
+        if item is _identity:
+            return _identity
+        return lambda values: {key: item(value) for key, value in values.items()}
+
+    if inspect.isclass(annotation) and issubclass(annotation, BaseModel):
+        return _build_model_serializer(annotation)
+
+    return _identity
+
+
+def _build_model_serializer(model) -> Callable[[Any], Any]:
+    plain_fields = []
+    nested_fields = []
+
+    def serialize(obj):
+        if obj is None:
+            return None
+        if isinstance(obj, BaseModel):
+            return obj.model_dump(mode="json")
+        data = {}
+        if isinstance(obj, dict):
+            for name, default in plain_fields:
+                data[name] = obj.get(name, default)
+            for name, default, field_serializer in nested_fields:
+                value = obj.get(name, default)
+                data[name] = None if value is None else field_serializer(value)
+        else:
+            for name, default in plain_fields:
+                data[name] = getattr(obj, name, default)
+            for name, default, field_serializer in nested_fields:
+                value = getattr(obj, name, default)
+                data[name] = None if value is None else field_serializer(value)
+        return data
+
+    # 先登记再解析字段，支持自引用模型（如评论的 replies）
+    _serializers[model] = serialize
+    for name, field in model.model_fields.items():
+        default = None if field.is_required() else field.get_default(call_default_factory=True)
+        field_serializer = build_serializer(field.annotation)
+        if field_serializer is _identity:
+            plain_fields.append((name, default))
+        else:
+            nested_fields.append((name, default, field_serializer))
+    return serialize
+
+
+def fast_json_enabled(router_name: str) -> bool:
+    return router_name in settings.fast_json_routers
+
+
+class FastJSONRoute(APIRoute):
+    """
+    快速序列化的路由
+    声明了 response_model 的异步路由：返回值按 response_model 直接组装并用 orjson 编码，不再经过 Pydantic 校验。
+    response_model 仍然用于生成 OpenAPI 文档；路由自己返回 Response 时原样返回。
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs):
+        response_model = kwargs.get("response_model")
+        if (
+            response_model is not None
+            and not isinstance(response_model, DefaultPlaceholder)
+            and inspect.iscoroutinefunction(endpoint)
+        ):
+            endpoint = self._wrap_endpoint(endpoint, response_model, kwargs.get("status_code"))
+        super().__init__(path, endpoint, **kwargs)
+
+    @staticmethod
+    def _wrap_endpoint(endpoint, response_model, status_code):
+        serializer = build_serializer(response_model)
+        signature = inspect.signature(endpoint)
+        response_param = next(
+            (name for name, param in signature.parameters.items() if param.annotation is Response),
+            None
+        )
+        injected = response_param is None
+        if injected:
+            response_param = _RESPONSE_PARAM
+            signature = signature.replace(parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter(_RESPONSE_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Response),
+            ])
+
+        @functools.wraps(endpoint)
+        async def fast_endpoint(**values):
+            sub_response = values.pop(response_param) if injected else values[response_param]
+            result = await endpoint(**values)
+            if isinstance(result, Response):
+                return result
+            response = FastJSONResponse(
+                serializer(result),
+                status_code=sub_response.status_code or status_code or 200
+            )
+            # 带上路由对注入的 Response 设置的响应头（如 X-Next-Cursor、ETag）
+            response.headers.raw.extend(sub_response.headers.raw)
+            return response
+
+        fast_endpoint.__signature__ = signature
+        return fast_endpoint
+
+
+def fast_json_route_class(router_name: str):
+    """路由器使用的路由类：在 settings.fast_json_routers 中开启时使用快速序列化"""
+    return FastJSONRoute if fast_json_enabled(router_name) else APIRoute
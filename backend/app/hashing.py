@@ -0,0 +1,137 @@
+"""
+密码哈希执行器
+
+bcrypt 的哈希和校验每次需要 100~300ms 的CPU时间，直接在 async 路由中调用会阻塞整个事件循环。
+这里把它们放到有界的线程池/进程池中执行，队列满时快速返回503。
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from .config import settings
+
+# 密码加密上下文
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _run_hash_operation(operation: str, args: tuple, submitted_at: float):
+    """在工作线程/进程中执行哈希操作，返回 (结果, 排队耗时, 哈希耗时)"""
+    started_at = time.time()
+    if operation == "verify":
+        result = pwd_context.verify(*args)
+    else:
+        result = pwd_context.hash(*args)
+    return result, started_at - submitted_at, time.time() - started_at
+
+
+class PasswordHashExecutor:
+    """有界的密码哈希执行器"""
+
+    def __init__(self, mode: str, workers: int, queue_size: int):
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        # 指标
+        self._completed = 0
+        self._rejected = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._hash_time_total = 0.0
+        self._hash_time_max = 0.0
+
+    @property
+    def capacity(self) -> int:
+        """同时允许的最大任务数（执行中 + 排队中）"""
+        return self.workers + self.queue_size
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    async def _submit(self, operation: str, *args):
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="服务器繁忙，请稍后重试",
+                    headers={"Retry-After": "1"}
+                )
+            self._pending += 1
+
+        try:
+            future = self._get_executor().submit(
+                _run_hash_operation, operation, args, time.time()
+            )
+        except Exception:
+            self._release()
+            raise
+        # 在任务真正结束时才释放名额，请求被取消时也不会超出上限
+        future.add_done_callback(self._release)
+
+        result, queue_wait, hash_time = await asyncio.wrap_future(future)
+
+        with self._lock:
+            self._completed += 1
+            self._queue_wait_total += queue_wait
+            self._queue_wait_max = max(self._queue_wait_max, queue_wait)
+            self._hash_time_total += hash_time
+            self._hash_time_max = max(self._hash_time_max, hash_time)
+        return result
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """异步校验密码"""
+        return await self._submit("verify", plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        """异步计算密码哈希"""
+        return await self._submit("hash", password)
+
+    def metrics(self) -> dict:
+        """获取执行器指标（时间单位：毫秒）"""
+        with self._lock:
+            completed = self._completed
+            return {
+                "mode": self.mode,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "pending": self._pending,
+                "completed": completed,
+                "rejected": self._rejected,
+                "queue_wait_avg_ms": round(self._queue_wait_total / completed * 1000, 2) if completed else 0.0,
+                "queue_wait_max_ms": round(self._queue_wait_max * 1000, 2),
+                "hash_time_avg_ms": round(self._hash_time_total / completed * 1000, 2) if completed else 0.0,
+                "hash_time_max_ms": round(self._hash_time_max * 1000, 2),
+            }
+
+    def shutdown(self):
+        """关闭执行器"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# 全局密码哈希执行器
+password_hasher = PasswordHashExecutor(
+    mode=settings.password_hash_executor,
+    workers=settings.password_hash_workers,
+    queue_size=settings.password_hash_queue_size
+)
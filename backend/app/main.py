@@ -1,66 +1,32 @@
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from sqlalchemy import text, inspect
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 import logging
 from .config import settings
-from .database import engine, SessionLocal
-from .models import Base
-from .routers import auth, users, activities, media, comments, notifications
+from .database import async_engine, replica_engine, AsyncSessionLocal, get_db
+from .hashing import password_hasher
+from .media_files import MediaFiles
+from .migrations import run_migrations
+from .pool_metrics import pool_monitor
+from .compression import CompressionMiddleware
+from .conditional import ConditionalGetMiddleware
+from .query_stats import QueryStatsMiddleware, DB_QUERIES_HEADER, DB_TIME_HEADER
+from .replica import replica_guard
+from .resumable import upload_sessions
+from .slow_queries import slow_query_log
+from .stats import cached_stats, load_public_stats
+from .storage import LocalStorage, StorageRedirect, storage
+from .thumbnails import thumbnail_pipeline
+from .uploads import MULTIPART_OVERHEAD, UploadSizeLimitMiddleware
+from .view_counter import view_counter
+from .routers import auth, users, activities, media, comments, notifications, admin
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def ensure_database_schema():
-    """确保数据库架构是最新的，包括新添加的字段"""
-    try:
-        logger.info("检查数据库架构...")
-        
-        # 首先创建所有表
-        Base.metadata.create_all(bind=engine)
-        
-        # 检查并添加新字段（如果不存在）
-        inspector = inspect(engine)
-        
-        # 检查users表是否存在新字段
-        if inspector.has_table('users'):
-            existing_columns = [col['name'] for col in inspector.get_columns('users')]
-            
-            # 需要添加的新字段
-            new_fields = {
-                'gender': 'VARCHAR(10)',
-                'birthday': 'TIMESTAMP',
-                'interests': 'TEXT',
-                'address': 'VARCHAR(200)',
-                'emergency_contact': 'VARCHAR(100)',
-                'emergency_phone': 'VARCHAR(20)'
-            }
-            
-            db = SessionLocal()
-            try:
-                for field_name, field_type in new_fields.items():
-                    if field_name not in existing_columns:
-                        logger.info(f"添加新字段: {field_name}")
-                        sql = f"ALTER TABLE users ADD COLUMN {field_name} {field_type}"
-                        db.execute(text(sql))
-                        db.commit()
-                        logger.info(f"✅ 字段 {field_name} 添加成功")
-            except Exception as e:
-                logger.error(f"添加字段时出错: {e}")
-                db.rollback()
-            finally:
-                db.close()
-        
-        logger.info("✅ 数据库架构检查完成")
-        
-    except Exception as e:
-        logger.error(f"数据库架构检查失败: {e}")
-        # 不要阻止应用启动，让基本功能可以工作
-
-# 在应用启动时确保数据库架构
-ensure_database_schema()
-
 # 创建FastAPI应用实例
 app = FastAPI(
     title="班级建设网站API",
@@ -70,6 +36,23 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# 上传接口的请求体大小限制：在 Starlette 把 multipart 请求体缓存到磁盘之前拒绝超大的请求
+app.add_middleware(UploadSizeLimitMiddleware, limits={
+    "/api/media/upload": (settings.max_file_size + MULTIPART_OVERHEAD, "文件大小超过限制"),
+    "/api/media/upload/batch": (
+        settings.batch_upload_max_files * (settings.max_file_size + MULTIPART_OVERHEAD),
+        "批量上传的总大小超过限制"
+    ),
+    "/api/users/avatar": (users.AVATAR_MAX_SIZE + MULTIPART_OVERHEAD, "图片大小不能超过2MB"),
+})
+
+# 条件GET：为JSON响应生成ETag并处理 If-None-Match
+# 先注册的中间件位于内层，放在CORS之前注册，使304响应同样带有跨域头
+app.add_middleware(ConditionalGetMiddleware)
+
+# 响应压缩：位于条件GET外层，ETag 按未压缩的内容计算
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size)
+
 # 配置CORS中间件
 # 生产环境使用更严格的CORS，开发环境允许所有来源
 if settings.environment == "production":
@@ -88,10 +71,21 @@ else:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", DB_QUERIES_HEADER, DB_TIME_HEADER]
     )
 
-# 挂载静态文件目录
-app.mount("/uploads", StaticFiles(directory=settings.upload_dir), name="uploads")
+# 统计每个请求的SQL查询次数与耗时
+app.add_middleware(QueryStatsMiddleware)
+
+# 上传文件服务：本地存储支持 Range 请求、零拷贝发送，UUID 命名的文件长期缓存；
+# 远程存储时重定向到对象URL
+if isinstance(storage, LocalStorage):
+    uploads_app = MediaFiles(
+        settings.upload_dir, chunk_size=settings.media_chunk_size, max_age=settings.media_cache_max_age
+    )
+else:
+    uploads_app = StorageRedirect(storage)
+app.mount("/uploads", uploads_app, name="uploads")
 
 # 注册路由
 app.include_router(auth.router, prefix="/api")
@@ -100,6 +94,36 @@ app.include_router(activities.router, prefix="/api")
 app.include_router(media.router, prefix="/api")
 app.include_router(comments.router, prefix="/api")
 app.include_router(notifications.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
+
+
+@app.on_event("startup")
+async def startup_event():
+    """应用启动时执行数据库迁移并开启后台任务"""
+    try:
+        # 数据库已是最新版本时只有一次版本查询
+        await asyncio.to_thread(run_migrations)
+    except Exception as e:
+        logger.error(f"数据库迁移失败: {e}")
+        # 不要阻止应用启动，让基本功能可以工作
+    view_counter.start()
+    replica_guard.start()
+    upload_sessions.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时写回缓冲数据并释放后台资源"""
+    await view_counter.stop()
+    await replica_guard.stop()
+    await upload_sessions.stop()
+    password_hasher.shutdown()
+    await thumbnail_pipeline.shutdown()
+    await slow_query_log.shutdown()
+    await async_engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+
 
 # 根路径
 @app.get("/")
@@ -117,15 +141,13 @@ async def health_check():
     """健康检查端点，用于Railway部署监控"""
     try:
         # 简单的数据库连接测试
-        from .database import SessionLocal
-        from sqlalchemy import text
-        db = SessionLocal()
-        db.execute(text("SELECT 1"))
-        db.close()
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT 1"))
         
         return {
             "status": "healthy",
             "database": "connected",
+            "pool": pool_monitor.snapshot(),
             "environment": settings.environment,
             "version": "1.0.0"
         }
@@ -133,6 +155,7 @@ async def health_check():
         return {
             "status": "unhealthy",
             "error": str(e),
+            "pool": pool_monitor.snapshot(),
             "environment": settings.environment
         }
 
@@ -155,23 +178,11 @@ async def api_health_check():
     }
 
 @app.get("/api/public/stats")
-async def get_public_stats():
-    """获取公开的基础统计信息，不需要认证"""
-    from .database import SessionLocal
-    from .models import User, Activity, MediaItem
-    
-    db = SessionLocal()
+async def get_public_stats(db: AsyncSession = Depends(get_db)):
+    """获取公开的基础统计信息，不需要认证（单条查询，结果在进程内短时间缓存）"""
     try:
-        total_users = db.query(User).count()
-        total_activities = db.query(Activity).count()
-        total_media = db.query(MediaItem).count()
-        
-        return {
-            "total_users": total_users,
-            "total_activities": total_activities,
-            "total_media": total_media,
-            "status": "success"
-        }
+        stats = await cached_stats("public", lambda: load_public_stats(db))
+        return {**stats, "status": "success"}
     except Exception as e:
         return {
             "total_users": 0,
@@ -180,109 +191,6 @@ async def get_public_stats():
             "status": "error",
             "message": str(e)
         }
-    finally:
-        db.close()
-
-@app.post("/api/admin/migrate-database")
-async def manual_migrate_database():
-    """手动触发数据库迁移（紧急修复用）"""
-    try:
-        logger.info("手动触发数据库迁移...")
-        
-        inspector = inspect(engine)
-        if not inspector.has_table('users'):
-            return {"status": "error", "message": "users表不存在"}
-        
-        db = SessionLocal()
-        results = {
-            "constraint_fixes": [],
-            "added_fields": [],
-            "existing_fields": [],
-            "errors": []
-        }
-        
-        try:
-            # 1. 修复student_id唯一约束
-            try:
-                logger.info("修复student_id唯一约束...")
-                
-                # 删除唯一约束
-                result = db.execute(text("""
-                    SELECT constraint_name 
-                    FROM information_schema.table_constraints 
-                    WHERE table_name = 'users' 
-                    AND constraint_type = 'UNIQUE' 
-                    AND constraint_name LIKE '%student_id%'
-                """))
-                constraints = result.fetchall()
-                
-                for constraint in constraints:
-                    constraint_name = constraint[0]
-                    db.execute(text(f"ALTER TABLE users DROP CONSTRAINT {constraint_name}"))
-                    db.commit()
-                    results["constraint_fixes"].append(f"删除约束: {constraint_name}")
-                
-                # 删除唯一索引
-                db.execute(text("DROP INDEX IF EXISTS ix_users_student_id"))
-                db.commit()
-                results["constraint_fixes"].append("删除唯一索引: ix_users_student_id")
-                
-                # 创建普通索引
-                db.execute(text("CREATE INDEX IF NOT EXISTS idx_users_student_id ON users(student_id)"))
-                db.commit()
-                results["constraint_fixes"].append("创建普通索引: idx_users_student_id")
-                
-            except Exception as e:
-                results["errors"].append(f"修复约束失败: {str(e)}")
-            
-            # 2. 添加新字段
-            existing_columns = [col['name'] for col in inspector.get_columns('users')]
-            
-            new_fields = {
-                'gender': 'VARCHAR(10)',
-                'birthday': 'TIMESTAMP',
-                'interests': 'TEXT',
-                'address': 'VARCHAR(200)',
-                'emergency_contact': 'VARCHAR(100)',
-                'emergency_phone': 'VARCHAR(20)'
-            }
-            
-            for field_name, field_type in new_fields.items():
-                if field_name not in existing_columns:
-                    try:
-                        sql = f"ALTER TABLE users ADD COLUMN {field_name} {field_type}"
-                        db.execute(text(sql))
-                        db.commit()
-                        results["added_fields"].append(field_name)
-                        logger.info(f"✅ 字段 {field_name} 添加成功")
-                    except Exception as e:
-                        results["errors"].append(f"添加字段 {field_name} 失败: {str(e)}")
-                else:
-                    results["existing_fields"].append(field_name)
-            
-            return {
-                "status": "success" if not results["errors"] else "partial_success",
-                "message": "数据库迁移完成",
-                "results": results
-            }
-            
-        except Exception as e:
-            db.rollback()
-            logger.error(f"迁移失败: {e}")
-            return {
-                "status": "error",
-                "message": f"迁移失败: {str(e)}",
-                "results": results
-            }
-        finally:
-            db.close()
-            
-    except Exception as e:
-        logger.error(f"迁移过程出错: {e}")
-        return {
-            "status": "error",
-            "message": f"迁移过程出错: {str(e)}"
-        }
 
 # 添加OPTIONS请求处理，解决预检请求问题
 @app.options("/{path:path}")
@@ -0,0 +1,244 @@
+"""
+/uploads 媒体文件服务
+
+替代 StaticFiles 的ASGI应用，针对上传的照片和视频：
+- Range 请求：单个字节范围返回206，超出文件大小返回416，If-Range 不匹配时返回完整文件，视频可以直接拖动进度
+- 传输：服务器支持 ASGI 的 http.response.zerocopysend 扩展时零拷贝发送文件，否则按块读取发送
+- 强 ETag（inode-大小-修改时间）与 Last-Modified，支持 If-None-Match / If-Modified-Since 返回304
+- 文件名包含 UUID 或内容哈希的文件永远不会被改写，返回一年的 immutable 缓存头；其余文件每次重新验证
+- 文本类文件存在预压缩的 .br / .gz 同名文件且客户端支持时，直接返回压缩文件
+"""
+
+import mimetypes
+import os
+import re
+import stat
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse
+from .compression import accepts_encoding, is_compressible
+from .conditional import etag_matches
+
+# UUID 或 sha256 命名的文件内容不会变化
+IMMUTABLE_NAME = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{64}",
+    re.IGNORECASE
+)
+
+PRECOMPRESSED_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+
+class RangeNotSatisfiable(Exception):
+    """请求的范围超出文件大小"""
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个字节范围，返回 (起始, 结束) 闭区间
+    - 不是单个 bytes 范围（格式错误或多个范围）时返回 None，按完整文件处理
+    - 范围无法满足时抛出 RangeNotSatisfiable
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, sep, end_text = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        start = int(start_text) if start_text else None
+        end = int(end_text) if end_text else None
+    except ValueError:
+        return None
+
+    if start is None:
+        # 后缀范围：最后 N 个字节
+        if end is None:
+            return None
+        if end == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - end), size - 1
+    if end is not None and start > end:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    """文件的强 ETag"""
+    return f'"{stat_result.st_ino:x}-{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def is_immutable(path: str) -> bool:
+    return IMMUTABLE_NAME.search(os.path.basename(path)) is not None
+
+
+class MediaFiles:
+    """上传文件服务（ASGI应用，挂载在 /uploads）"""
+
+    def __init__(self, directory: str, chunk_size: int = 256 * 1024, max_age: int = 31536000):
+        self.directory = os.path.realpath(directory)
+        self.chunk_size = chunk_size
+        self.max_age = max_age
+
+    def lookup(self, path: str) -> Tuple[Optional[str], Optional[os.stat_result]]:
+        """把请求路径解析为上传目录内的普通文件，不允许越出目录或访问隐藏文件（如上传中的临时文件）"""
+        parts = [part for part in path.split("/") if part]
+        if not parts or any(part.startswith(".") for part in parts):
+            return None, None
+        full_path = os.path.realpath(os.path.join(self.directory, *parts))
+        if os.path.commonpath([full_path, self.directory]) != self.directory:
+            return None, None
+        try:
+            stat_result = os.stat(full_path)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            return None, None
+        if not stat.S_ISREG(stat_result.st_mode):
+            return None, None
+        return full_path, stat_result
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+            await response(scope, receive, send)
+            return
+
+        # 挂载后 scope["path"] 是相对于 /uploads 的路径
+        path = scope["path"]
+        full_path, stat_result = self.lookup(path)
+        if full_path is None:
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        if content_type.startswith("text/"):
+            content_type += "; charset=utf-8"
+        headers = {"content-type": content_type, "accept-ranges": "bytes"}
+
+        # 文本类文件优先返回预压缩版本（与 Range 互斥）
+        if is_compressible(content_type):
+            headers["vary"] = "Accept-Encoding"
+            if "range" not in request_headers:
+                accept_encoding = request_headers.get("accept-encoding", "")
+                for encoding, suffix in PRECOMPRESSED_SUFFIXES:
+                    if not accepts_encoding(accept_encoding, encoding):
+                        continue
+                    compressed_path, compressed_stat = self.lookup(path + suffix)
+                    if compressed_path is not None:
+                        full_path, stat_result = compressed_path, compressed_stat
+                        headers["content-encoding"] = encoding
+                        break
+
+        etag = file_etag(stat_result)
+        last_modified = datetime.fromtimestamp(int(stat_result.st_mtime), tz=timezone.utc)
+        headers["etag"] = etag
+        headers["last-modified"] = format_datetime(last_modified, usegmt=True)
+        if is_immutable(path):
+            headers["cache-control"] = f"public, max-age={self.max_age}, immutable"
+        else:
+            headers["cache-control"] = "public, no-cache"
+
+        if self.is_not_modified(request_headers, etag, last_modified):
+            await self.send_headers(send, 304, headers)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        size = stat_result.st_size
+        start, end = 0, size - 1
+        status_code = 200
+        range_header = request_headers.get("range")
+        if range_header and size > 0 and self.if_range_matches(request_headers, etag, last_modified):
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                headers["content-range"] = f"bytes */{size}"
+                headers["content-length"] = "0"
+                await self.send_headers(send, 416, headers)
+                await send({"type": "http.response.body", "body": b""})
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                status_code = 206
+                headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+        length = end - start + 1
+        headers["content-length"] = str(length)
+        await self.send_headers(send, status_code, headers)
+        if scope["method"] == "HEAD" or length <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+            await self.send_zerocopy(send, full_path, start, length)
+        else:
+            await self.send_chunks(send, full_path, start, length)
+
+    @staticmethod
+    def is_not_modified(request_headers: Headers, etag: str, last_modified: datetime) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, etag)
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def if_range_matches(request_headers: Headers, etag: str, last_modified: datetime) -> bool:
+        """If-Range 与当前文件一致（或没有 If-Range）时才按 Range 返回部分内容"""
+        if_range = request_headers.get("if-range")
+        if not if_range:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith(('"', "W/")):
+            # If-Range 要求强比较
+            return if_range == etag
+        try:
+            return last_modified == parsedate_to_datetime(if_range)
+        except (TypeError, ValueError):
+            return False
+
+    @staticmethod
+    async def send_headers(send, status_code: int, headers: dict):
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(key.encode("latin-1"), value.encode("latin-1")) for key, value in headers.items()],
+        })
+
+    @staticmethod
+    async def send_zerocopy(send, full_path: str, start: int, length: int):
+        """由服务器直接从文件描述符发送（sendfile）"""
+        with open(full_path, "rb") as file:
+            await send({
+                "type": ZEROCOPY_EXTENSION,
+                "file": file.fileno(),
+                "offset": start,
+                "count": length,
+                "more_body": False,
+            })
+
+    async def send_chunks(self, send, full_path: str, start: int, length: int):
+        """在线程中按块读取文件发送，内存占用只有一个分块"""
+        remaining = length
+        async with await anyio.open_file(full_path, mode="rb") as file:
+            await file.seek(start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # 文件在发送过程中被截断
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
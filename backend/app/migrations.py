@@ -0,0 +1,245 @@
+"""
+带版本号的数据库迁移
+
+每个迁移有一个递增的版本号，已执行的版本记录在 schema_version 表中。
+- 数据库已是最新版本时只执行一条 SELECT，不做任何表结构反射
+- 需要迁移时先加锁（PostgreSQL 使用事务级 advisory lock，SQLite 使用 BEGIN IMMEDIATE），
+  多个进程同时启动时只有一个执行迁移，其余等待后发现已是最新版本直接跳过
+- 全部待执行的迁移在同一个事务中完成，失败时整体回滚
+
+新增迁移时在 MIGRATIONS 末尾追加 (版本号, 说明, 函数)，不要修改已发布的迁移。
+"""
+
+import logging
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, event, exc, func, inspect, select, text
+)
+from sqlalchemy.engine import Connection, Engine
+from .database import engine
+from .models import Base, MediaBlob
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL advisory lock 的键（任意固定的64位整数）
+MIGRATION_LOCK_KEY = 720_611_001
+
+# 版本表不属于业务模型，使用独立的 MetaData，避免被 create_all 一并创建
+version_metadata = MetaData()
+schema_version_table = Table(
+    "schema_version",
+    version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now())
+)
+
+
+def add_missing_columns(conn: Connection, table_name: str, new_fields: dict):
+    """为已有的表添加缺失的字段"""
+    existing_columns = {col["name"] for col in inspect(conn).get_columns(table_name)}
+    for field_name, field_type in new_fields.items():
+        if field_name not in existing_columns:
+            logger.info(f"添加新字段: {table_name}.{field_name}")
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {field_name} {field_type}"))
+
+
+def migration_create_tables(conn: Connection):
+    """创建模型中的所有表（已存在的表不受影响）"""
+    Base.metadata.create_all(bind=conn)
+
+
+def migration_user_profile_fields(conn: Connection):
+    """users表添加个人资料字段"""
+    add_missing_columns(conn, "users", {
+        "gender": "VARCHAR(10)",
+        "birthday": "TIMESTAMP",
+        "interests": "TEXT",
+        "address": "VARCHAR(200)",
+        "emergency_contact": "VARCHAR(100)",
+        "emergency_phone": "VARCHAR(20)"
+    })
+
+
+def migration_student_id_not_unique(conn: Connection):
+    """取消student_id的唯一约束（允许多个用户不填学号），保留普通索引"""
+    if conn.dialect.name == "postgresql":
+        constraints = conn.execute(text("""
+            SELECT constraint_name
+            FROM information_schema.table_constraints
+            WHERE table_name = 'users'
+            AND constraint_type = 'UNIQUE'
+            AND constraint_name LIKE '%student_id%'
+        """)).scalars().all()
+        for constraint_name in constraints:
+            logger.info(f"删除唯一约束: {constraint_name}")
+            conn.execute(text(f'ALTER TABLE users DROP CONSTRAINT "{constraint_name}"'))
+
+    for index in inspect(conn).get_indexes("users"):
+        if index["name"] == "ix_users_student_id" and index["unique"]:
+            logger.info("删除唯一索引: ix_users_student_id")
+            conn.execute(text("DROP INDEX ix_users_student_id"))
+    # 普通索引由后面的 migration_model_indexes 补建
+
+
+def migration_media_thumbnails(conn: Connection):
+    """media_items表添加缩略图字段"""
+    add_missing_columns(conn, "media_items", {"thumbnails": "JSON"})
+
+
+def create_indexes(conn: Connection, indexes):
+    """
+    按迁移中写定的定义创建索引（已存在时跳过），indexes 为 [(索引名, 表名, (列, ...))]
+    不使用模型中当前声明的索引：模型之后新增的索引可能依赖更晚的迁移才添加的字段
+    """
+    for index_name, table_name, columns in indexes:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(columns)})"))
+
+
+# 版本5时模型中声明、已有的表上还没有的索引
+LIST_QUERY_INDEXES = (
+    ("ix_users_student_id", "users", ("student_id",)),
+    ("ix_activities_activity_date", "activities", ("activity_date",)),
+    ("ix_media_items_activity_type_time", "media_items", ("activity_id", "media_type", "upload_time")),
+    ("ix_media_items_upload_time", "media_items", ("upload_time",)),
+    ("ix_comments_media_parent_created", "comments", ("media_item_id", "parent_id", "created_at")),
+    ("ix_comments_parent_id", "comments", ("parent_id",)),
+    ("ix_notifications_user_read_created", "notifications", ("user_id", "is_read", "created_at")),
+)
+
+
+def migration_model_indexes(conn: Connection):
+    """为已有的表补建列表查询使用的索引（create_all 不会给已存在的表加索引）"""
+    create_indexes(conn, LIST_QUERY_INDEXES)
+
+
+def migration_media_blobs(conn: Connection):
+    """添加内容寻址存储表，media_items表添加 content_hash 字段"""
+    MediaBlob.__table__.create(bind=conn, checkfirst=True)
+    add_missing_columns(conn, "media_items", {
+        "content_hash": "VARCHAR(64) REFERENCES media_blobs(content_hash)"
+    })
+    create_indexes(conn, [("ix_media_items_content_hash", "media_items", ("content_hash",))])
+
+
+# 游标分页使用的时间戳字段
+PAGINATED_TIMESTAMPS = (
+    ("users", "created_at"),
+    ("activities", "created_at"),
+    ("media_items", "upload_time"),
+    ("comments", "created_at"),
+    ("notifications", "created_at"),
+)
+
+
+def migration_sqlite_timestamp_format(conn: Connection):
+    """SQLite中服务端默认值写入的时间戳（不带微秒）补齐为 SQLAlchemy 的存储格式"""
+    if conn.dialect.name != "sqlite":
+        return
+    for table_name, column_name in PAGINATED_TIMESTAMPS:
+        conn.execute(text(
+            f"UPDATE {table_name} SET {column_name} = {column_name} || '.000000' "
+            f"WHERE length({column_name}) = 19"
+        ))
+
+
+def migration_keyset_indexes(conn: Connection):
+    """媒体、通知的组合索引改为与游标分页排序一致的列顺序"""
+    for index_name in ("ix_media_items_activity_type_time", "ix_notifications_user_read_created"):
+        conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+    create_indexes(conn, [
+        ("ix_media_items_activity_time", "media_items", ("activity_id", "upload_time DESC", "id DESC")),
+        ("ix_notifications_user_created", "notifications", ("user_id", "created_at DESC", "id DESC")),
+    ])
+
+
+def migration_updated_at_columns(conn: Connection):
+    """media_items、notifications表添加 updated_at 字段（列表接口的条件GET使用）"""
+    for table_name in ("media_items", "notifications"):
+        add_missing_columns(conn, table_name, {"updated_at": "TIMESTAMP WITH TIME ZONE"})
+
+
+def migration_list_order_indexes(conn: Connection):
+    """活动、用户列表添加与游标分页排序一致的索引，评论索引补上 id"""
+    conn.execute(text("DROP INDEX IF EXISTS ix_comments_media_parent_created"))
+    create_indexes(conn, [
+        ("ix_users_created", "users", ("created_at", "id")),
+        ("ix_activities_created", "activities", ("created_at DESC", "id DESC")),
+        ("ix_comments_media_parent_created", "comments", ("media_item_id", "parent_id", "created_at", "id")),
+    ])
+
+
+# (版本号, 说明, 迁移函数)，版本号必须严格递增
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "创建基础表", migration_create_tables),
+    (2, "users表添加个人资料字段", migration_user_profile_fields),
+    (3, "取消student_id唯一约束", migration_student_id_not_unique),
+    (4, "media_items表添加缩略图字段", migration_media_thumbnails),
+    (5, "补建列表查询使用的组合索引", migration_model_indexes),
+    (6, "媒体文件内容寻址存储", migration_media_blobs),
+    (7, "统一SQLite时间戳格式", migration_sqlite_timestamp_format),
+    (8, "媒体和通知列表索引与分页排序一致", migration_keyset_indexes),
+    (9, "media_items、notifications表添加updated_at字段", migration_updated_at_columns),
+    (10, "活动、用户、评论列表索引与分页排序一致", migration_list_order_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_current_version(bind: Engine = engine) -> Optional[int]:
+    """读取数据库当前版本，版本表不存在时返回 None"""
+    try:
+        with bind.connect() as conn:
+            return conn.scalar(select(func.max(schema_version_table.c.version))) or 0
+    except exc.DBAPIError:
+        return None
+
+
+def _connect_locked(bind: Engine) -> Connection:
+    """
+    打开用于迁移的连接，开启事务时同时获取迁移锁
+    - PostgreSQL: pg_advisory_xact_lock，事务结束时自动释放
+    - SQLite: BEGIN IMMEDIATE，立即获取写锁，DDL与版本记录在同一事务中
+    """
+    conn = bind.connect()
+    if conn.dialect.name == "sqlite":
+        # 由我们自己发出BEGIN，pysqlite 默认不会为DDL开启事务
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        event.listen(conn, "begin", lambda c: c.exec_driver_sql("BEGIN IMMEDIATE"))
+    elif conn.dialect.name == "postgresql":
+        event.listen(
+            conn, "begin",
+            lambda c: c.exec_driver_sql(f"SELECT pg_advisory_xact_lock({MIGRATION_LOCK_KEY})")
+        )
+    return conn
+
+
+def run_migrations(bind: Engine = engine) -> List[str]:
+    """
+    执行所有未执行的迁移，返回本次执行的迁移说明
+    数据库已是最新版本时直接返回空列表
+    """
+    # 快速路径：不加锁、不反射
+    current = get_current_version(bind)
+    if current is not None and current >= LATEST_VERSION:
+        return []
+
+    applied = []
+    with _connect_locked(bind) as conn:
+        with conn.begin():
+            version_metadata.create_all(bind=conn)
+            # 加锁后重新读取版本，其他进程可能已经完成了迁移
+            current = conn.scalar(select(func.max(schema_version_table.c.version))) or 0
+            for version, description, migration in MIGRATIONS:
+                if version <= current:
+                    continue
+                logger.info(f"执行数据库迁移 {version}: {description}")
+                migration(conn)
+                conn.execute(
+                    schema_version_table.insert().values(version=version, description=description)
+                )
+                applied.append(f"{version}: {description}")
+
+    if applied:
+        logger.info(f"✅ 数据库已迁移到版本 {LATEST_VERSION}")
+    return applied
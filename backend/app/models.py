@@ -1,10 +1,19 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, Text, ForeignKey, Enum
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Text, ForeignKey, Enum, JSON, Index, desc
+from datetime import datetime, timezone
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
 import enum
 
 
+def utcnow() -> datetime:
+    """
+    创建时间由ORM写入：SQLite中统一按 SQLAlchemy 的格式（带6位微秒）存储，
+    游标分页按文本比较时间戳依赖该格式；server_default 只用于ORM之外的写入
+    """
+    return datetime.now(timezone.utc)
+
+
 class UserRole(str, enum.Enum):
     """用户角色枚举"""
     STUDENT = "student"
@@ -21,6 +30,10 @@ class MediaType(str, enum.Enum):
 class User(Base):
     """用户模型"""
     __tablename__ = "users"
+    __table_args__ = (
+        # 用户列表的游标分页，排序为 (created_at, id)
+        Index("ix_users_created", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(50), unique=True, index=True, nullable=False)
@@ -44,7 +57,7 @@ class User(Base):
     emergency_contact = Column(String(100), nullable=True)  # 紧急联系人
     emergency_phone = Column(String(20), nullable=True)  # 紧急联系电话
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # 关系
@@ -57,14 +70,18 @@ class User(Base):
 class Activity(Base):
     """活动模型"""
     __tablename__ = "activities"
+    __table_args__ = (
+        # 活动列表的游标分页，列顺序与排序 (created_at DESC, id DESC) 一致
+        Index("ix_activities_created", desc("created_at"), desc("id")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False)
     description = Column(Text)
-    activity_date = Column(DateTime(timezone=True))
+    activity_date = Column(DateTime(timezone=True), index=True)
     location = Column(String(200))
     creator_id = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # 关系
@@ -75,6 +92,12 @@ class Activity(Base):
 class MediaItem(Base):
     """媒体文件模型（照片和视频）"""
     __tablename__ = "media_items"
+    __table_args__ = (
+        # 按活动（及类型）筛选的列表查询，列顺序与游标分页的排序 (upload_time DESC, id DESC) 一致
+        Index("ix_media_items_activity_time", "activity_id", desc("upload_time"), desc("id")),
+        # 照片墙不带筛选条件的按时间分页
+        Index("ix_media_items_upload_time", "upload_time"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String(255), nullable=False)
@@ -86,8 +109,13 @@ class MediaItem(Base):
     description = Column(Text)
     activity_id = Column(Integer, ForeignKey("activities.id"))
     uploader_id = Column(Integer, ForeignKey("users.id"))
-    upload_time = Column(DateTime(timezone=True), server_default=func.now())
+    upload_time = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
     views_count = Column(Integer, default=0)
+    thumbnails = Column(JSON, nullable=True)  # 缩略图路径 {宽度: 相对路径}，后台生成
+    # 任何修改（包括浏览次数写回、缩略图写回）都会更新，列表的条件GET据此判断是否变化
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow)
+    # 文件内容的SHA-256，指向 media_blobs；旧数据在运行 dedupe_uploads.py 之前为空
+    content_hash = Column(String(64), ForeignKey("media_blobs.content_hash"), index=True, nullable=True)
 
     # 关系
     activity = relationship("Activity", back_populates="media_items")
@@ -95,16 +123,33 @@ class MediaItem(Base):
     comments = relationship("Comment", back_populates="media_item")
 
 
+class MediaBlob(Base):
+    """内容寻址存储的媒体文件，相同内容只保存一份，由 MediaItem 引用计数"""
+    __tablename__ = "media_blobs"
+
+    content_hash = Column(String(64), primary_key=True)  # SHA-256（十六进制）
+    file_path = Column(String(500), nullable=False)  # 相对于上传目录：blobs/ab/cd/<哈希>.<扩展名>
+    file_size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # 引用该文件的 MediaItem 数量
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
+
+
 class Comment(Base):
     """评论模型"""
     __tablename__ = "comments"
+    __table_args__ = (
+        # 某个媒体的顶级评论按 (created_at, id) 游标分页
+        Index("ix_comments_media_parent_created", "media_item_id", "parent_id", "created_at", "id"),
+        # 递归加载回复、统计回复数
+        Index("ix_comments_parent_id", "parent_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
     media_item_id = Column(Integer, ForeignKey("media_items.id"))
     author_id = Column(Integer, ForeignKey("users.id"))
     parent_id = Column(Integer, ForeignKey("comments.id"))  # 用于回复评论
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # 关系
@@ -117,6 +162,10 @@ class Comment(Base):
 class Notification(Base):
     """通知模型"""
     __tablename__ = "notifications"
+    __table_args__ = (
+        # 当前用户（未读）通知按时间分页，列顺序与游标分页的排序 (created_at DESC, id DESC) 一致
+        Index("ix_notifications_user_created", "user_id", desc("created_at"), desc("id")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False)
@@ -124,7 +173,8 @@ class Notification(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     is_read = Column(Boolean, default=False)
     related_comment_id = Column(Integer, ForeignKey("comments.id"))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow)  # 标记已读时更新
 
     # 关系
     user = relationship("User", back_populates="notifications")
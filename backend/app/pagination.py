@@ -0,0 +1,100 @@
+"""
+基于游标（keyset）的分页
+
+列表按 (时间戳, id) 排序，游标记录上一页最后一条记录的 (时间戳, id)，
+下一页直接用 WHERE 条件定位，深分页的耗时不随页码增长，也不会因为插入新数据而重复或跳过。
+下一页游标通过 X-Next-Cursor 响应头返回；不传 cursor 时仍支持 skip/limit 兼容模式。
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, or_, literal, String
+from .config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(timestamp: datetime, item_id: int) -> str:
+    """将 (时间戳, id) 编码为不透明的游标字符串"""
+    raw = json.dumps([timestamp.isoformat() if timestamp else None, item_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """解析游标，返回 (时间戳, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(timestamp) if timestamp else None), int(item_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
+
+
+def _timestamp_bind(timestamp: datetime):
+    """
+    游标时间戳的绑定参数
+    SQLite中时间以文本存储，按 SQLAlchemy 的存储格式（总是带6位微秒）绑定才能按文本正确比较
+    """
+    if "sqlite" in settings.database_url:
+        return literal(timestamp.strftime("%Y-%m-%d %H:%M:%S.%f"), String)
+    return timestamp
+
+
+def paginate(
+    query,
+    timestamp_column,
+    id_column,
+    skip: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    descending: bool = False
+):
+    """
+    为查询添加稳定的 (时间戳, id) 排序和分页条件
+    - 提供 cursor 时使用游标分页，忽略 skip
+    - 否则使用 skip/limit（兼容模式）
+    """
+    if descending:
+        query = query.order_by(timestamp_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(timestamp_column.asc(), id_column.asc())
+
+    if cursor:
+        timestamp, item_id = decode_cursor(cursor)
+        if timestamp is None:
+            # 上一页末尾记录没有时间戳，只能按id继续
+            condition = id_column < item_id if descending else id_column > item_id
+        else:
+            bound = _timestamp_bind(timestamp)
+            if descending:
+                condition = or_(
+                    timestamp_column < bound,
+                    and_(timestamp_column == bound, id_column < item_id)
+                )
+            else:
+                condition = or_(
+                    timestamp_column > bound,
+                    and_(timestamp_column == bound, id_column > item_id)
+                )
+        query = query.where(condition)
+    else:
+        query = query.offset(skip)
+
+    return query.limit(limit)
+
+
+def set_next_cursor(response: Response, items: Sequence, timestamp_attr: str, limit: int):
+    """当本页已满时，把最后一条记录编码为下一页游标写入响应头"""
+    if limit > 0 and len(items) >= limit:
+        last = items[-1]
+        if isinstance(last, dict):
+            timestamp, item_id = last[timestamp_attr], last["id"]
+        else:
+            timestamp, item_id = getattr(last, timestamp_attr), last.id
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(timestamp, item_id)
@@ -0,0 +1,109 @@
+"""
+数据库连接池指标
+
+记录异步引擎连接池的实时状态，便于排查连接池耗尽：
+- 当前检出的连接数、溢出连接数、池中空闲连接数
+- 获取连接的等待时间（含新建连接的时间）与超时次数
+- 当前打开的连接的存活时长（连接建立时记录在 connection_record.info 中）
+"""
+
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMonitor:
+    """连接池指标收集器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connected_at = {}
+        self.engine = None
+        self.checkouts = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+        self.connections_opened = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.waits += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def instrument(self, sync_engine: Engine):
+        """为引擎注册连接池事件（异步引擎传入 async_engine.sync_engine）"""
+        self.engine = sync_engine
+
+        @event.listens_for(sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            connection_record.info["connected_at"] = time.time()
+            with self._lock:
+                self.connections_opened += 1
+                self._connected_at[id(connection_record)] = connection_record.info["connected_at"]
+
+        @event.listens_for(sync_engine, "checkout")
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            with self._lock:
+                self.checkouts += 1
+
+        @event.listens_for(sync_engine, "close")
+        def _on_close(dbapi_connection, connection_record):
+            with self._lock:
+                self._connected_at.pop(id(connection_record), None)
+
+        @event.listens_for(sync_engine, "detach")
+        def _on_detach(dbapi_connection, connection_record):
+            with self._lock:
+                self._connected_at.pop(id(connection_record), None)
+
+    def snapshot(self) -> dict:
+        """获取连接池当前状态"""
+        now = time.time()
+        # dispose() 会重建连接池，每次从引擎上取当前的池
+        pool = self.engine.pool if self.engine is not None else None
+        with self._lock:
+            ages = [now - connected_at for connected_at in self._connected_at.values()]
+            metrics = {
+                "pool_class": type(pool).__name__ if pool is not None else None,
+                "checkouts": self.checkouts,
+                "connections_opened": self.connections_opened,
+                "wait_count": self.waits,
+                "avg_wait_ms": round(self.total_wait / self.waits * 1000, 3) if self.waits else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "timeouts": self.timeouts,
+                "open_connections": len(ages),
+                "oldest_connection_age_s": round(max(ages), 1) if ages else 0.0,
+                "avg_connection_age_s": round(sum(ages) / len(ages), 1) if ages else 0.0,
+            }
+        if isinstance(pool, QueuePool):
+            metrics.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+            })
+        return metrics
+
+
+# 全局连接池指标
+pool_monitor = PoolMonitor()
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """记录获取连接等待时间的异步连接池"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_monitor.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_monitor.record_wait(time.perf_counter() - started)
+        return connection
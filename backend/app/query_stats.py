@@ -0,0 +1,100 @@
+"""
+每个请求的SQL查询统计
+
+通过 SQLAlchemy 的 before_cursor_execute / after_cursor_execute 事件统计当前请求
+执行的查询次数和数据库耗时（当前请求保存在 contextvar 中，会随协程传递到事件回调）：
+- debug 模式下通过 X-DB-Queries / X-DB-Time 响应头返回
+- 查询次数或数据库耗时超过阈值的请求记录警告日志
+- 同一条SQL（只有参数不同）在一个请求中重复执行多次时，提示可能存在 N+1 查询
+"""
+
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+DB_QUERIES_HEADER = "X-DB-Queries"
+DB_TIME_HEADER = "X-DB-Time"
+
+
+class RequestQueryStats:
+    """单个请求的查询统计"""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.count = 0
+        self.total_time = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total_time += duration
+        self.statements[statement] += 1
+
+    def repeated_statements(self, threshold: int):
+        """返回重复执行次数达到阈值的语句"""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+# 当前请求的统计，不在请求中执行的查询（后台任务、脚本）不统计
+current_query_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def instrument_engine(sync_engine: Engine):
+    """为引擎注册查询计时事件（异步引擎传入 async_engine.sync_engine）"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start_time"].pop()
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.record(statement, time.perf_counter() - started)
+
+
+class QueryStatsMiddleware:
+    """统计每个HTTP请求的查询次数与耗时（ASGI中间件）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats(f"{scope['method']} {scope['path']}")
+        token = current_query_stats.set(stats)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and settings.debug:
+                headers = list(message.get("headers", []))
+                headers.append((DB_QUERIES_HEADER.lower().encode(), str(stats.count).encode()))
+                headers.append((DB_TIME_HEADER.lower().encode(), f"{stats.total_time * 1000:.2f}ms".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            current_query_stats.reset(token)
+            self.report(stats)
+
+    @staticmethod
+    def report(stats: RequestQueryStats):
+        """记录超过阈值的请求和疑似 N+1 查询"""
+        db_time_ms = stats.total_time * 1000
+        if stats.count > settings.query_count_warning or db_time_ms > settings.query_time_warning_ms:
+            logger.warning(f"请求 {stats.route} 执行了 {stats.count} 条查询，数据库耗时 {db_time_ms:.1f}ms")
+        for statement, count in stats.repeated_statements(settings.n_plus_one_threshold):
+            summary = " ".join(statement.split())[:200]
+            logger.warning(f"疑似 N+1 查询: {stats.route} 中同一语句执行了 {count} 次: {summary}")
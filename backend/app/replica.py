@@ -0,0 +1,147 @@
+"""
+只读副本路由
+
+配置 read_database_url 后，GET/HEAD 请求的会话把查询发往只读副本，其余请求只使用主库：
+- 会话中一旦发生写入（flush 或 INSERT/UPDATE/DELETE 语句），之后的读取也留在主库，
+  保证同一请求内能读到自己刚写入的数据
+- 后台定期检查副本延迟，延迟超过 replica_max_lag_seconds 或副本不可用时全部读取回退到主库
+- 带有 USE_PRIMARY 执行选项的语句总是读取主库，用于结果会被缓存、不能容忍延迟的读取
+
+注意：通过 text() 执行的写语句无法识别，需要写入的 GET 接口应避免使用 text()。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# 会话 info 中的标记
+USE_REPLICA = "use_replica"
+HAS_WRITTEN = "has_written"
+# 语句的执行选项：select(...).execution_options(**{USE_PRIMARY: True})
+USE_PRIMARY = "use_primary"
+
+# PostgreSQL 副本的回放延迟（秒）；WAL 已全部回放时视为无延迟，避免主库空闲时误报
+POSTGRESQL_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaLagGuard:
+    """只读副本延迟检查"""
+
+    def __init__(self, max_lag: float, check_interval: float):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.engine: Optional[AsyncEngine] = None
+        self.healthy = True
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def configure(self, engine: AsyncEngine):
+        """设置只读副本引擎"""
+        self.engine = engine
+
+    @property
+    def available(self) -> bool:
+        """副本是否可以承担读取"""
+        return self.engine is not None and self.healthy
+
+    async def check(self):
+        """查询副本延迟并更新状态"""
+        if self.engine is None:
+            return
+        try:
+            async with self.engine.connect() as conn:
+                if conn.dialect.name == "postgresql":
+                    lag = float(await conn.scalar(POSTGRESQL_LAG_QUERY) or 0)
+                else:
+                    await conn.execute(text("SELECT 1"))
+                    lag = 0.0
+        except Exception as e:
+            if self.healthy:
+                logger.warning(f"只读副本不可用，读取回退到主库: {e}")
+            self.healthy = False
+            self.lag_seconds = None
+            self.last_error = str(e)
+        else:
+            healthy = lag <= self.max_lag
+            if healthy != self.healthy:
+                logger.warning(f"只读副本延迟 {lag:.1f}s，{'恢复使用副本' if healthy else '读取回退到主库'}")
+            self.healthy = healthy
+            self.lag_seconds = lag
+            self.last_error = None
+        self.checked_at = time.time()
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        """启动后台延迟检查任务"""
+        if self.engine is not None and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> dict:
+        """获取副本路由指标"""
+        return {
+            "configured": self.engine is not None,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": self.max_lag,
+            "last_error": self.last_error,
+            "checked_at": self.checked_at,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+
+# 全局副本延迟检查
+replica_guard = ReplicaLagGuard(
+    max_lag=settings.replica_max_lag_seconds,
+    check_interval=settings.replica_lag_check_interval
+)
+
+
+class RoutingSession(Session):
+    """按请求类型和写入情况选择主库或只读副本的会话"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        is_write = self._flushing or getattr(clause, "is_dml", False)
+        if is_write:
+            self.info[HAS_WRITTEN] = True
+        elif (
+            self.info.get(USE_REPLICA)
+            and not self.info.get(HAS_WRITTEN)
+            and replica_guard.available
+            and not (clause is not None and clause.get_execution_options().get(USE_PRIMARY))
+        ):
+            replica_guard.replica_reads += 1
+            return replica_guard.engine.sync_engine
+        else:
+            replica_guard.primary_reads += 1
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
@@ -0,0 +1,260 @@
+"""
+可续传的分块上传
+
+大视频不再通过一次 multipart 请求上传：
+1. POST   /api/media/uploads                  创建上传会话（声明文件名、类型和总大小）
+2. PUT    /api/media/uploads/{id}?offset=N    从偏移 N 开始追加一个分块（请求体为原始字节）
+3. GET    /api/media/uploads/{id}             查询已接收的字节数，断线后从该偏移继续
+4. POST   /api/media/uploads/{id}/complete    全部接收后生成 MediaItem
+
+分块直接追加到磁盘上的暂存文件（以点开头的目录，不会被 /uploads 对外提供），
+已接收的字节数就是暂存文件的大小；每个请求只占用一个读取缓冲区的内存。
+超过 upload_session_ttl 没有任何分块写入的会话由后台任务清理。
+
+同一会话的写入与完成操作在进程内用 asyncio.Lock 串行化，多个工作进程之间对暂存文件加
+fcntl.flock 排他锁，拿到锁后再读取偏移。没有 fcntl 的平台（Windows）只能以单个工作进程运行。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Optional
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, status
+from .config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SESSION_DIR = ".resumable"
+FILE_LOCK_POLL_INTERVAL = 0.05  # 秒
+
+
+@dataclass
+class UploadSession:
+    """上传会话元数据（保存为暂存目录中的JSON文件）"""
+    id: str
+    user_id: int
+    activity_id: int
+    title: str
+    description: Optional[str]
+    filename: str
+    content_type: str
+    media_type: str
+    total_size: int
+    created_at: float
+    offset: int = 0  # 已接收的字节数，即暂存文件大小
+    updated_at: float = 0.0  # 最后一次写入时间，即暂存文件修改时间
+
+    @property
+    def expires_at(self) -> float:
+        return max(self.created_at, self.updated_at) + settings.upload_session_ttl
+
+
+class UploadSessionStore:
+    """磁盘上的上传会话"""
+
+    def __init__(self, directory: str, ttl: int, sweep_interval: float):
+        self.directory = directory
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._task: Optional[asyncio.Task] = None
+        self.expired_total = 0
+
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.json")
+
+    def data_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.part")
+
+    @staticmethod
+    def _valid_id(upload_id: str) -> bool:
+        # 会话ID是uuid十六进制，拒绝其他字符防止路径穿越
+        return len(upload_id) == 32 and all(c in "0123456789abcdef" for c in upload_id)
+
+    def _try_flock(self, upload_id: str):
+        """
+        尝试对暂存文件加排他的 flock（不等待），返回 (是否拿到锁, 文件描述符)
+        暂存文件不存在或平台没有 fcntl 时返回 (True, None)；调用方关闭文件描述符即释放锁
+        """
+        if fcntl is None or not self._valid_id(upload_id):
+            return True, None
+        try:
+            fd = os.open(self.data_path(upload_id), os.O_RDONLY)
+        except FileNotFoundError:
+            return True, None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False, None
+        return True, fd
+
+    @asynccontextmanager
+    async def lock(self, upload_id: str):
+        """
+        同一会话的分块写入与完成操作串行执行
+        - 进程内的锁按需创建，没有请求持有时自动回收，无效的会话ID不会留下锁
+        - 再对暂存文件加 flock，多个工作进程之间同样串行；会话不存在时不加文件锁，由 get() 返回404
+        """
+        lock = self._locks.get(upload_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[upload_id] = lock
+        async with lock:
+            # 非阻塞轮询，等待期间请求被取消时不会留下阻塞在 flock 上的线程
+            acquired, fd = self._try_flock(upload_id)
+            while not acquired:
+                await asyncio.sleep(FILE_LOCK_POLL_INTERVAL)
+                acquired, fd = self._try_flock(upload_id)
+            try:
+                yield
+            finally:
+                if fd is not None:
+                    os.close(fd)
+
+    async def create(self, **fields) -> UploadSession:
+        os.makedirs(self.directory, exist_ok=True)
+        session = UploadSession(id=uuid.uuid4().hex, created_at=time.time(), **fields)
+        async with aiofiles.open(self.data_path(session.id), "wb"):
+            pass
+        async with aiofiles.open(self._meta_path(session.id), "w", encoding="utf-8") as f:
+            await f.write(json.dumps(asdict(session), ensure_ascii=False))
+        return session
+
+    async def get(self, upload_id: str, user_id: int) -> UploadSession:
+        """读取会话，不存在、已过期或不属于该用户时返回404"""
+        # 会话ID是uuid十六进制，拒绝其他字符防止路径穿越
+        not_found = HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="上传会话不存在或已过期")
+        if not self._valid_id(upload_id):
+            raise not_found
+        try:
+            async with aiofiles.open(self._meta_path(upload_id), "r", encoding="utf-8") as f:
+                data = json.loads(await f.read())
+            data_stat = await aiofiles.os.stat(self.data_path(upload_id))
+        except (FileNotFoundError, ValueError):
+            raise not_found
+        data.update(offset=data_stat.st_size, updated_at=data_stat.st_mtime)
+        session = UploadSession(**data)
+        if session.user_id != user_id or session.expires_at < time.time():
+            raise not_found
+        return session
+
+    async def append(self, session: UploadSession, offset: int, chunks: AsyncIterator[bytes]) -> int:
+        """
+        从 offset 开始追加一个分块，返回追加后的偏移
+        - offset 与已接收的字节数不一致时返回409，客户端应先查询偏移
+        - 超过声明的总大小或单个分块上限时返回413；已写入的部分保留，可以继续续传
+        """
+        if offset != session.offset:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"偏移不匹配，服务端已接收 {session.offset} 字节"
+            )
+        received = 0
+        async with aiofiles.open(self.data_path(session.id), "ab") as f:
+            async for chunk in chunks:
+                received += len(chunk)
+                if received > settings.upload_chunk_max_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail="分块大小超过限制"
+                    )
+                if offset + received > session.total_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail="上传的数据超过声明的文件大小"
+                    )
+                await f.write(chunk)
+        session.offset = offset + received
+        return session.offset
+
+    async def remove(self, upload_id: str):
+        """删除会话元数据和暂存文件（暂存文件已被移走时忽略）"""
+        for path in (self._meta_path(upload_id), self.data_path(upload_id)):
+            try:
+                await aiofiles.os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def sweep(self) -> int:
+        """
+        清理超过有效期没有写入的会话，返回清理数量
+        元数据已丢失（或从未写入）的暂存文件同样按修改时间清理
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+        deadline = time.time() - self.ttl
+        expired = 0
+        names = set(os.listdir(self.directory))
+        for name in names:
+            upload_id, extension = os.path.splitext(name)
+            lock = self._locks.get(upload_id)
+            if lock is not None and lock.locked():
+                continue
+            # 以元数据文件为准逐个会话检查；没有元数据的暂存文件单独检查
+            orphan = extension == ".part" and f"{upload_id}.json" not in names
+            if extension != ".json" and not orphan:
+                continue
+            # 正在被其他工作进程写入的会话跳过；拿到文件锁后再判断是否过期，删除期间一直持有
+            acquired, fd = self._try_flock(upload_id)
+            if not acquired:
+                continue
+            try:
+                try:
+                    last_write = os.stat(self.data_path(upload_id)).st_mtime
+                except FileNotFoundError:
+                    last_write = 0
+                if last_write < deadline:
+                    await self.remove(upload_id)
+                    expired += 1
+            finally:
+                if fd is not None:
+                    os.close(fd)
+        if expired:
+            self.expired_total += expired
+            logger.info(f"清理过期上传会话 {expired} 个")
+        return expired
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except OSError as e:
+                logger.warning(f"清理上传会话失败: {e}")
+
+    def start(self):
+        """启动后台清理任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台清理任务（未完成的会话保留，重启后可以继续上传）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# 全局上传会话存储
+upload_sessions = UploadSessionStore(
+    directory=os.path.join(settings.upload_dir, SESSION_DIR),
+    ttl=settings.upload_session_ttl,
+    sweep_interval=settings.upload_session_sweep_interval
+)
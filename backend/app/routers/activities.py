@@ -1,41 +1,66 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from ..database import get_db
 from ..models import User, Activity
 from ..schemas import Activity as ActivitySchema, ActivityCreate, ActivityUpdate
 from ..auth import get_current_active_user
+from ..pagination import paginate, set_next_cursor
+from ..fast_json import fast_json_route_class
+from ..stats import cached_stats, load_activity_stats
+from ..conditional import check_not_modified, table_state
 
-router = APIRouter(prefix="/activities", tags=["活动管理"])
+router = APIRouter(prefix="/activities", tags=["活动管理"], route_class=fast_json_route_class("activities"))
+
+
+async def get_activity_with_creator(db: AsyncSession, activity_id: int, refresh: bool = False):
+    """查询活动并预加载创建者（响应中需要嵌套的creator信息）"""
+    stmt = select(Activity).options(selectinload(Activity.creator)).where(Activity.id == activity_id)
+    if refresh:
+        stmt = stmt.execution_options(populate_existing=True)
+    return await db.scalar(stmt)
 
 
 @router.get("/", response_model=List[ActivitySchema], summary="获取活动列表")
 async def get_activities(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status_filter: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     获取活动列表
-    - 支持分页查询
+    - 按创建时间倒序，支持游标分页（cursor）和 skip/limit 分页
+    - 下一页游标在 X-Next-Cursor 响应头中返回
     - 支持状态筛选
+    - 支持 If-None-Match / If-Modified-Since，活动及创建者未变化时返回304
     """
-    query = db.query(Activity)
+    not_modified = await check_not_modified(request, response, db, table_state(Activity), table_state(User))
+    if not_modified:
+        return not_modified
+    
+    query = select(Activity).options(selectinload(Activity.creator))
     
     # 这里可以添加状态筛选逻辑
     # if status_filter:
     #     query = query.filter(Activity.status == status_filter)
     
-    activities = query.offset(skip).limit(limit).all()
+    query = paginate(query, Activity.created_at, Activity.id, skip, limit, cursor, descending=True)
+    activities = (await db.scalars(query)).all()
+    set_next_cursor(response, activities, "created_at", limit)
     return activities
 
 
 @router.post("/", response_model=ActivitySchema, summary="创建活动")
 async def create_activity(
     activity: ActivityCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -47,22 +72,21 @@ async def create_activity(
     )
     
     db.add(db_activity)
-    db.commit()
-    db.refresh(db_activity)
+    await db.commit()
     
-    return db_activity
+    return await get_activity_with_creator(db, db_activity.id, refresh=True)
 
 
 @router.get("/{activity_id}", response_model=ActivitySchema, summary="获取活动详情")
 async def get_activity(
     activity_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     获取指定活动的详细信息
     """
-    activity = db.query(Activity).filter(Activity.id == activity_id).first()
+    activity = await get_activity_with_creator(db, activity_id)
     if not activity:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -75,13 +99,13 @@ async def get_activity(
 async def update_activity(
     activity_id: int,
     activity_update: ActivityUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     更新活动信息
     """
-    activity = db.query(Activity).filter(Activity.id == activity_id).first()
+    activity = await db.get(Activity, activity_id)
     if not activity:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -100,22 +124,21 @@ async def update_activity(
     for field, value in update_data.items():
         setattr(activity, field, value)
     
-    db.commit()
-    db.refresh(activity)
+    await db.commit()
     
-    return activity
+    return await get_activity_with_creator(db, activity.id, refresh=True)
 
 
 @router.delete("/{activity_id}", summary="删除活动")
 async def delete_activity(
     activity_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     删除指定活动
     """
-    activity = db.query(Activity).filter(Activity.id == activity_id).first()
+    activity = await db.get(Activity, activity_id)
     if not activity:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -129,34 +152,18 @@ async def delete_activity(
             detail="无权限删除此活动"
         )
     
-    db.delete(activity)
-    db.commit()
+    await db.delete(activity)
+    await db.commit()
     
     return {"message": "活动删除成功"}
 
 
 @router.get("/stats/summary", summary="获取活动统计信息")
 async def get_activity_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    获取活动相关的统计信息
+    获取活动相关的统计信息（单条聚合查询，结果在进程内短时间缓存）
     """
-    from datetime import datetime
-    
-    total_activities = db.query(Activity).count()
-    
-    # 统计即将开始的活动（活动时间在未来）
-    now = datetime.utcnow()
-    upcoming_activities = db.query(Activity).filter(Activity.activity_date > now).count()
-    
-    # 统计已完成的活动（活动时间在过去）
-    completed_activities = db.query(Activity).filter(Activity.activity_date <= now).count()
-    
-    return {
-        "total_activities": total_activities,
-        "upcoming_activities": upcoming_activities,
-        "completed_activities": completed_activities,
-        "ongoing_activities": 0  # 可以根据具体业务逻辑计算
-    }
+    return await cached_stats("activities", lambda: load_activity_stats(db))
@@ -0,0 +1,91 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from ..models import User
+from ..migrations import LATEST_VERSION, get_current_version, run_migrations
+from ..auth import get_current_admin_user, user_cache
+from ..hashing import password_hasher
+from ..view_counter import view_counter
+from ..database import use_sqlite_profile
+from ..pool_metrics import pool_monitor
+from ..replica import replica_guard
+from ..slow_queries import slow_query_log
+from ..stats import stats_cache
+from ..sqlite_profile import write_queue
+
+router = APIRouter(prefix="/admin", tags=["系统管理"])
+
+
+@router.get("/metrics", summary="获取运行时指标")
+async def get_runtime_metrics(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    获取当前进程的运行时指标
+    - 密码哈希执行器的排队耗时与哈希耗时
+    - 已认证用户缓存、统计接口缓存的命中/未命中次数
+    - 浏览次数写回缓冲
+    - 数据库连接池的检出/溢出连接数、等待时间与连接存活时长
+    - 只读副本的延迟与读取路由次数
+    - SQLite写队列的排队情况（仅SQLite）
+    """
+    metrics = {
+        "password_hashing": password_hasher.metrics(),
+        "user_cache": user_cache.stats(),
+        "stats_cache": stats_cache.stats(),
+        "view_counter": view_counter.metrics(),
+        "database_pool": pool_monitor.snapshot(),
+        "read_replica": replica_guard.metrics()
+    }
+    if use_sqlite_profile:
+        metrics["sqlite_write_queue"] = write_queue.metrics()
+    return metrics
+
+
+@router.get("/slow-queries", summary="获取慢查询日志")
+async def get_slow_queries(
+    limit: int = Query(50, ge=1, le=1000, description="返回的记录数"),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    获取当前进程最近的慢查询（新的在前）
+    - 每条记录包含SQL、参数、发出查询的路由、耗时和查询计划
+    - 查询计划在后台获取，刚记录的慢查询 plan 可能暂时为空
+    """
+    return {
+        "threshold_ms": slow_query_log.threshold_ms,
+        "total": slow_query_log.total,
+        "entries": slow_query_log.entries(limit)
+    }
+
+
+@router.delete("/slow-queries", summary="清空慢查询日志")
+async def clear_slow_queries(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """清空内存中的慢查询记录（不影响JSONL文件）"""
+    slow_query_log.clear()
+    return {"message": "慢查询日志已清空"}
+
+
+@router.post("/migrate-database", summary="执行数据库迁移")
+async def migrate_database(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    执行尚未执行的数据库迁移（应用启动时会自动执行，此接口用于手动重试）
+    - 数据库已是最新版本时不做任何修改
+    """
+    try:
+        applied = await asyncio.to_thread(run_migrations)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"迁移失败: {str(e)}"
+        )
+    return {
+        "status": "success",
+        "message": "数据库迁移完成" if applied else "数据库已是最新版本",
+        "version": await asyncio.to_thread(get_current_version),
+        "latest_version": LATEST_VERSION,
+        "applied": applied
+    }
@@ -1,14 +1,15 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBasic
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from ..models import User
 from ..schemas import UserCreate, UserLogin, Token, User as UserSchema
 from ..auth import (
     authenticate_user, 
     create_access_token, 
-    get_password_hash,
+    get_password_hash_async,
     get_current_active_user
 )
 from ..config import settings
@@ -17,14 +18,14 @@ router = APIRouter(prefix="/auth", tags=["认证"])
 
 
 @router.post("/register", response_model=UserSchema, summary="用户注册")
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """
     用户注册
     - 检查用户名和邮箱是否已存在
     - 创建新用户账户
     """
     # 检查用户名是否已存在
-    db_user = db.query(User).filter(User.username == user.username).first()
+    db_user = await db.scalar(select(User).where(User.username == user.username))
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -32,7 +33,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # 检查邮箱是否已存在
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await db.scalar(select(User).where(User.email == user.email))
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -41,7 +42,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     
     # 检查学号是否已存在（如果提供了学号）
     if user.student_id:
-        db_user = db.query(User).filter(User.student_id == user.student_id).first()
+        db_user = await db.scalar(select(User).where(User.student_id == user.student_id))
         if db_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -49,7 +50,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
             )
     
     # 创建新用户
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -65,20 +66,20 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 
 @router.post("/login", response_model=Token, summary="用户登录")
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     """
     用户登录
     - 验证用户名和密码
     - 返回JWT访问令牌
     """
-    user = authenticate_user(db, user_credentials.username, user_credentials.password)
+    user = await authenticate_user(db, user_credentials.username, user_credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
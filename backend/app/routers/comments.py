@@ -1,52 +1,147 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from sqlalchemy import select, delete, func, literal, inspect as sa_inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, joinedload, raiseload
+from ..config import settings
 from ..database import get_db
 from ..models import User, Comment, MediaItem, Notification
 from ..schemas import Comment as CommentSchema, CommentCreate
 from ..auth import get_current_active_user
+from ..pagination import paginate, set_next_cursor
+from ..fast_json import fast_json_route_class
+from ..conditional import check_not_modified, table_state
 
-router = APIRouter(prefix="/comments", tags=["评论管理"])
+router = APIRouter(prefix="/comments", tags=["评论管理"], route_class=fast_json_route_class("comments"))
+
+
+
+def resolve_thread_limits(max_depth: Optional[int], replies_limit: Optional[int]):
+    """计算回复嵌套深度和每个节点的回复预览数，不超过配置的上限"""
+    depth = settings.comment_max_depth
+    if max_depth is not None:
+        depth = max(0, min(max_depth, depth))
+    preview = settings.comment_replies_preview
+    if replies_limit is not None:
+        preview = max(0, min(replies_limit, preview)) if preview > 0 else max(0, replies_limit)
+    return depth, preview
+
+
+async def load_comment_threads(
+    db: AsyncSession,
+    root_ids,
+    max_depth: int,
+    replies_limit: int
+) -> List[dict]:
+    """
+    用一条递归CTE查询加载若干根评论及其回复，并在内存中组装成评论树
+    - root_ids: 根评论ID列表或子查询
+    - max_depth: 回复的最大嵌套层数，0 表示只返回根评论
+    - replies_limit: 每个节点最多保留的回复数，0 表示不限制；replies_count 始终是回复总数
+    """
+    thread = select(
+        Comment.id, literal(0).label("depth")
+    ).where(Comment.id.in_(root_ids)).cte("comment_thread", recursive=True)
+    thread = thread.union_all(
+        select(Comment.id, thread.c.depth + 1)
+        .join(thread, Comment.parent_id == thread.c.id)
+        .where(thread.c.depth < max_depth)
+    )
+
+    reply = aliased(Comment)
+    replies_count = (
+        select(func.count(reply.id))
+        .where(reply.parent_id == Comment.id)
+        .correlate(Comment)
+        .scalar_subquery()
+    )
+
+    rows = (await db.execute(
+        select(Comment, replies_count, thread.c.depth)
+        .join(thread, Comment.id == thread.c.id)
+        .options(joinedload(Comment.author), raiseload("*"))
+        .order_by(Comment.created_at, Comment.id)
+    )).all()
+
+    columns = [attr.key for attr in sa_inspect(Comment).column_attrs]
+    nodes = {}
+    for comment, count, _ in rows:
+        node = {key: getattr(comment, key) for key in columns}
+        node.update(author=comment.author, replies=[], replies_count=count)
+        nodes[comment.id] = node
+
+    roots = []
+    for comment, _, depth in rows:
+        node = nodes[comment.id]
+        if depth == 0:
+            roots.append(node)
+            continue
+        parent = nodes.get(comment.parent_id)
+        # 父节点因预览数被截断时，其子树也不会挂到树上
+        if parent is not None and (replies_limit <= 0 or len(parent["replies"]) < replies_limit):
+            parent["replies"].append(node)
+    return roots
 
 
 @router.get("/media/{media_id}", response_model=List[CommentSchema], summary="获取媒体文件的评论")
 async def get_media_comments(
     media_id: int,
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    max_depth: Optional[int] = None,
+    replies_limit: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     获取指定媒体文件的评论列表
+    - 分页作用于顶级评论（按时间正序，支持游标分页和 skip/limit 分页），回复以树形嵌套返回
+    - 下一页游标在 X-Next-Cursor 响应头中返回
+    - max_depth: 回复嵌套层数；replies_limit: 每条评论预览的回复数（均不超过服务端配置）
+    - 支持 If-None-Match / If-Modified-Since，该媒体的评论及作者未变化时返回304
     """
     # 验证媒体文件是否存在
-    media_item = db.query(MediaItem).filter(MediaItem.id == media_id).first()
+    media_item = await db.get(MediaItem, media_id)
     if not media_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="媒体文件不存在"
         )
     
-    comments = db.query(Comment).filter(
-        Comment.media_item_id == media_id,
-        Comment.parent_id.is_(None)  # 只获取顶级评论
-    ).offset(skip).limit(limit).all()
+    not_modified = await check_not_modified(
+        request, response, db, table_state(Comment, Comment.media_item_id == media_id), table_state(User)
+    )
+    if not_modified:
+        return not_modified
+    
+    root_ids = paginate(
+        select(Comment.id).where(
+            Comment.media_item_id == media_id,
+            Comment.parent_id.is_(None)  # 只获取顶级评论
+        ),
+        Comment.created_at, Comment.id, skip, limit, cursor
+    )
     
+    depth, preview = resolve_thread_limits(max_depth, replies_limit)
+    comments = await load_comment_threads(db, root_ids, depth, preview)
+    set_next_cursor(response, comments, "created_at", limit)
     return comments
 
 
 @router.post("/", response_model=CommentSchema, summary="创建评论")
 async def create_comment(
     comment: CommentCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     创建新评论
     """
     # 验证媒体文件是否存在
-    media_item = db.query(MediaItem).filter(MediaItem.id == comment.media_item_id).first()
+    media_item = await db.get(MediaItem, comment.media_item_id)
     if not media_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -55,7 +150,7 @@ async def create_comment(
     
     # 如果是回复评论，验证父评论是否存在
     if comment.parent_id:
-        parent_comment = db.query(Comment).filter(Comment.id == comment.parent_id).first()
+        parent_comment = await db.get(Comment, comment.parent_id)
         if not parent_comment:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -71,43 +166,46 @@ async def create_comment(
     )
     
     db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
+    await db.commit()
     
     # 创建通知
     await create_comment_notification(db, db_comment, media_item, current_user)
     
-    return db_comment
+    threads = await load_comment_threads(db, [db_comment.id], 0, 0)
+    return threads[0]
 
 
 @router.get("/{comment_id}", response_model=CommentSchema, summary="获取评论详情")
 async def get_comment(
     comment_id: int,
-    db: Session = Depends(get_db),
+    max_depth: Optional[int] = None,
+    replies_limit: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    获取指定评论的详细信息
+    获取指定评论的详细信息（包含回复树）
     """
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
-    if not comment:
+    depth, preview = resolve_thread_limits(max_depth, replies_limit)
+    threads = await load_comment_threads(db, [comment_id], depth, preview)
+    if not threads:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="评论不存在"
         )
-    return comment
+    return threads[0]
 
 
 @router.delete("/{comment_id}", summary="删除评论")
 async def delete_comment(
     comment_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     删除指定评论
     """
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    comment = await db.get(Comment, comment_id)
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -122,15 +220,15 @@ async def delete_comment(
         )
     
     # 删除评论及其回复
-    db.query(Comment).filter(Comment.parent_id == comment_id).delete()
-    db.delete(comment)
-    db.commit()
+    await db.execute(delete(Comment).where(Comment.parent_id == comment_id))
+    await db.delete(comment)
+    await db.commit()
     
     return {"message": "评论删除成功"}
 
 
 async def create_comment_notification(
-    db: Session, 
+    db: AsyncSession, 
     comment: Comment, 
     media_item: MediaItem, 
     author: User
@@ -150,7 +248,7 @@ async def create_comment_notification(
     
     # 如果是回复评论，通知被回复的用户
     if comment.parent_id:
-        parent_comment = db.query(Comment).filter(Comment.id == comment.parent_id).first()
+        parent_comment = await db.get(Comment, comment.parent_id)
         if parent_comment and parent_comment.author_id != author.id:
             notification = Notification(
                 title="评论回复",
@@ -160,4 +258,4 @@ async def create_comment_notification(
             )
             db.add(notification)
     
-    db.commit()
+    await db.commit()
@@ -1,140 +1,552 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+import asyncio
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, raiseload
+from sqlalchemy.orm.attributes import set_committed_value
 from ..database import get_db
-from ..models import User, MediaItem, Activity
-from ..schemas import MediaItem as MediaItemSchema, MediaItemCreate
+from ..models import User, MediaItem, MediaBlob, Activity
+from ..schemas import (
+    MediaItem as MediaItemSchema, MediaItemCreate, BatchUploadResult as BatchUploadResultSchema,
+    UploadSession as UploadSessionSchema, UploadSessionCreate,
+    DirectUploadCreate, DirectUploadTicket as DirectUploadTicketSchema
+)
 from ..auth import get_current_active_user
 from ..config import settings
+from ..blob_store import IncomingBlob, blob_relative_path, blob_store
+from ..resumable import UploadSession, upload_sessions
+from ..storage import storage
+from ..pagination import paginate, set_next_cursor
+from ..fast_json import fast_json_route_class
+from ..thumbnails import thumbnail_pipeline
+from ..view_counter import view_counter
+from ..stats import cached_stats, load_media_stats
+from ..conditional import check_not_modified, table_state
 import os
-import uuid
-from PIL import Image
 
-router = APIRouter(prefix="/media", tags=["媒体管理"])
+router = APIRouter(prefix="/media", tags=["媒体管理"], route_class=fast_json_route_class("media"))
+
+# 响应中嵌套了上传者、活动及活动创建者，都是多对一关系，
+# 通过 JOIN 与媒体记录在同一条语句中加载，查询次数与分页大小无关；
+# 其余关系禁止懒加载，避免序列化时悄悄产生 N+1 查询
+media_load_options = (
+    joinedload(MediaItem.uploader),
+    joinedload(MediaItem.activity).joinedload(Activity.creator),
+    raiseload("*"),
+)
 
 
 @router.get("/", response_model=List[MediaItemSchema], summary="获取媒体文件列表")
 async def get_media_items(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     activity_id: Optional[int] = None,
     media_type: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     获取媒体文件列表
+    - 按上传时间倒序，支持游标分页（cursor）和 skip/limit 分页
+    - 下一页游标在 X-Next-Cursor 响应头中返回
     - 支持按活动筛选
     - 支持按媒体类型筛选
+    - 支持 If-None-Match / If-Modified-Since，媒体（含浏览次数、缩略图）、活动及用户未变化时返回304
     """
-    query = db.query(MediaItem)
-    
+    criteria = []
     if activity_id:
-        query = query.filter(MediaItem.activity_id == activity_id)
+        criteria.append(MediaItem.activity_id == activity_id)
     
     if media_type:
-        query = query.filter(MediaItem.media_type == media_type)
+        criteria.append(MediaItem.media_type == media_type)
+    
+    not_modified = await check_not_modified(
+        request, response, db,
+        table_state(MediaItem, *criteria, created_column=MediaItem.upload_time),
+        table_state(Activity),
+        table_state(User)
+    )
+    if not_modified:
+        return not_modified
     
-    media_items = query.offset(skip).limit(limit).all()
+    query = select(MediaItem).options(*media_load_options).where(*criteria)
+    query = paginate(query, MediaItem.upload_time, MediaItem.id, skip, limit, cursor, descending=True)
+    media_items = (await db.scalars(query)).all()
+    set_next_cursor(response, media_items, "upload_time", limit)
     return media_items
 
 
+async def get_activity_or_404(db: AsyncSession, activity_id: int) -> Activity:
+    activity = await db.get(Activity, activity_id)
+    if not activity:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="活动不存在"
+        )
+    return activity
+
+
+def media_type_for(content_type: Optional[str]) -> str:
+    """根据文件类型确定媒体类型，只支持图片和视频"""
+    if not content_type or not content_type.startswith(('image/', 'video/')):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="只支持图片和视频文件"
+        )
+    return "photo" if content_type.startswith('image/') else "video"
+
+
+async def store_media_items(db: AsyncSession, uploads: List[Tuple[IncomingBlob, dict]]) -> List[MediaItem]:
+    """
+    把已接收的文件存入内容寻址存储，并在一个事务中创建全部媒体记录
+    - uploads: [(临时文件, MediaItem 字段)]
+    - 相同内容只保存一份：每个哈希只确定一个路径、只存入一次，引用数由 upsert 原子地增加
+    - 文件通常在第一条写语句之前存好，SQLite 的写锁不会在文件或网络I/O期间被占用
+    - 提交失败时回滚，并删除本次新放入存储、仍没有引用的文件
+    """
+    items, placed = [], []
+    async with AsyncExitStack() as stack:
+        # 按哈希排序加锁，避免并发批量上传互相等待
+        for content_hash in sorted({incoming.content_hash for incoming, _ in uploads}):
+            await stack.enter_async_context(blob_store.lock(content_hash))
+        try:
+            paths = await blob_store.blob_paths(db, [incoming for incoming, _ in uploads])
+            checked = set()
+            for incoming, _ in uploads:
+                if incoming.content_hash in checked:
+                    continue
+                checked.add(incoming.content_hash)
+                if await blob_store.place(incoming, paths[incoming.content_hash]):
+                    placed.append((incoming.content_hash, paths[incoming.content_hash]))
+            for incoming, fields in uploads:
+                blob, created = await blob_store.add_reference(db, incoming, paths[incoming.content_hash])
+                if created:
+                    thumbnails = None
+                    if await blob_store.ensure_stored(incoming, blob.file_path):
+                        placed.append((blob.content_hash, blob.file_path))
+                else:
+                    thumbnails = await blob_store.existing_thumbnails(db, blob.content_hash)
+                # 其他进程先以另一个扩展名建立了记录时，以记录中的路径为准
+                paths[blob.content_hash] = blob.file_path
+                db_media = MediaItem(
+                    filename=os.path.basename(blob.file_path),
+                    file_path=blob.file_path,  # 相对于uploads目录，前端拼接为 /uploads/blobs/ab/cd/<哈希>.jpg
+                    file_size=blob.file_size,
+                    content_hash=blob.content_hash,
+                    thumbnails=thumbnails,
+                    **fields
+                )
+                db.add(db_media)
+                items.append(db_media)
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            for content_hash, file_path in placed:
+                await blob_store.remove_unreferenced(db, content_hash, file_path)
+            raise
+        await blob_store.remove_files([
+            file_path for content_hash, file_path in placed if file_path != paths[content_hash]
+        ])
+    
+    # 照片在后台进程池中生成缩略图（同一内容已有缩略图时直接复用），完成后写回 thumbnails 字段
+    for db_media in items:
+        if db_media.media_type == "photo" and not db_media.thumbnails:
+            thumbnail_pipeline.schedule(db_media.id, db_media.file_path, db_media.content_hash)
+    return items
+
+
+async def store_media_item(db: AsyncSession, incoming: IncomingBlob, **fields) -> MediaItem:
+    """存储单个文件并创建媒体记录"""
+    return (await store_media_items(db, [(incoming, fields)]))[0]
+
+
+async def load_media_item(db: AsyncSession, media_id: int) -> Optional[MediaItem]:
+    """加载响应所需的媒体记录及其关联数据"""
+    return await db.scalar(
+        select(MediaItem)
+        .options(*media_load_options)
+        .where(MediaItem.id == media_id)
+        .execution_options(populate_existing=True)
+    )
+
+
 @router.post("/upload", response_model=MediaItemSchema, summary="上传媒体文件")
 async def upload_media_file(
     activity_id: int = Form(...),
     title: str = Form(...),
     description: Optional[str] = Form(None),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     上传媒体文件
+    - 一次请求上传整个文件，大小不超过 max_file_size；大视频请使用分块上传（/media/uploads）
     """
-    # 验证活动是否存在
-    activity = db.query(Activity).filter(Activity.id == activity_id).first()
-    if not activity:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="活动不存在"
-        )
+    await get_activity_or_404(db, activity_id)
+    media_type = media_type_for(file.content_type)
     
-    # 验证文件类型
-    if not file.content_type.startswith(('image/', 'video/')):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="只支持图片和视频文件"
+    # 流式保存到临时文件，同时计算内容哈希并校验文件大小
+    incoming = await blob_store.receive(file, settings.max_file_size)
+    try:
+        db_media = await store_media_item(
+            db, incoming,
+            activity_id=activity_id,
+            title=title,
+            description=description,
+            original_filename=file.filename,
+            media_type=media_type,
+            uploader_id=current_user.id
         )
+    finally:
+        await blob_store.discard(incoming)
     
-    # 验证文件大小
-    if file.size > settings.max_file_size:
+    return await load_media_item(db, db_media.id)
+
+
+@router.post("/upload/batch", response_model=BatchUploadResultSchema, summary="批量上传媒体文件")
+async def upload_media_batch(
+    activity_id: int = Form(...),
+    files: List[UploadFile] = File(...),
+    titles: List[str] = Form([]),
+    description: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    向同一个活动批量上传多个文件
+    - titles 按顺序对应每个文件，缺省时使用文件名
+    - 每个文件单独校验类型和大小，不合格的文件在结果中返回错误，不影响其他文件
+    - 合格的文件在一个事务中创建记录，缩略图在后台进程池中并行生成
+    """
+    if len(files) > settings.batch_upload_max_files:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="文件大小超过限制"
+            detail=f"一次最多上传 {settings.batch_upload_max_files} 个文件"
         )
+    await get_activity_or_404(db, activity_id)
     
-    # 确定媒体类型
-    media_type = "photo" if file.content_type.startswith('image/') else "video"
-    
-    # 生成唯一文件名
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
+    semaphore = asyncio.Semaphore(settings.batch_upload_concurrency)
+    # 已写入暂存目录的全部文件，无论成功、失败还是请求中断，最后都会删除临时文件
+    received_files: List[IncomingBlob] = []
     
-    # 确定文件保存路径
-    if media_type == "photo":
-        file_dir = f"{settings.upload_dir}/photos"
-    else:
-        file_dir = f"{settings.upload_dir}/videos"
+    async def receive(index: int, file: UploadFile):
+        """校验并流式保存一个文件，返回 (临时文件, 记录字段) 或错误信息"""
+        try:
+            media_type = media_type_for(file.content_type)
+            async with semaphore:
+                incoming = await blob_store.receive(file, settings.max_file_size)
+            received_files.append(incoming)
+        except HTTPException as e:
+            return None, e.detail
+        title = titles[index] if index < len(titles) else None
+        return incoming, {
+            "activity_id": activity_id,
+            "title": title or os.path.splitext(file.filename or "")[0],
+            "description": description,
+            "original_filename": file.filename,
+            "media_type": media_type,
+            "uploader_id": current_user.id,
+        }
     
-    os.makedirs(file_dir, exist_ok=True)
-    file_path = os.path.join(file_dir, unique_filename)
+    try:
+        # 等待所有文件处理完毕再检查异常，出错时不会有仍在写入的文件
+        received = await asyncio.gather(
+            *(receive(index, file) for index, file in enumerate(files)), return_exceptions=True
+        )
+        for result in received:
+            if isinstance(result, BaseException):
+                raise result
+        accepted = [(incoming, fields) for incoming, fields in received if incoming is not None]
+        stored = await store_media_items(db, accepted) if accepted else []
+    finally:
+        for incoming in received_files:
+            await blob_store.discard(incoming)
     
-    # 保存文件
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    loaded = {}
+    if stored:
+        loaded = {item.id: item for item in (await db.scalars(
+            select(MediaItem)
+            .options(*media_load_options)
+            .where(MediaItem.id.in_([item.id for item in stored]))
+            .execution_options(populate_existing=True)
+        )).all()}
     
-    # 创建数据库记录（保存相对于uploads目录的路径）
-    relative_path = f"{media_type}s/{unique_filename}"  # photos/xxx.jpg 或 videos/xxx.mp4
+    stored_iter = iter(stored)
+    results = []
+    for file, (incoming, error) in zip(files, received):
+        if incoming is None:
+            results.append({"filename": file.filename, "success": False, "error": error, "media": None})
+        else:
+            media = loaded[next(stored_iter).id]
+            results.append({"filename": file.filename, "success": True, "error": None, "media": media})
+    succeeded = len(stored)
+    return {"succeeded": succeeded, "failed": len(files) - succeeded, "results": results}
+
+
+def upload_session_response(session: UploadSession) -> dict:
+    return {
+        "id": session.id,
+        "filename": session.filename,
+        "media_type": session.media_type,
+        "total_size": session.total_size,
+        "offset": session.offset,
+        "expires_at": datetime.fromtimestamp(session.expires_at, tz=timezone.utc),
+    }
+
+
+@router.post(
+    "/uploads",
+    response_model=UploadSessionSchema,
+    status_code=status.HTTP_201_CREATED,
+    summary="创建分块上传会话"
+)
+async def create_upload_session(
+    upload: UploadSessionCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    创建可续传的分块上传会话
+    - 视频最大 max_video_size，照片最大 max_file_size
+    - 之后用 PUT /media/uploads/{id}?offset=N 依次上传分块
+    """
+    await get_activity_or_404(db, upload.activity_id)
+    media_type = media_type_for(upload.content_type)
+    max_size = settings.max_video_size if media_type == "video" else settings.max_file_size
+    if upload.total_size > max_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="文件大小超过限制"
+        )
     
-    db_media = MediaItem(
-        filename=unique_filename,
-        original_filename=file.filename,
-        file_path=relative_path,  # 保存相对路径，前端可以拼接为 /uploads/photos/xxx.jpg
-        file_size=file.size,
+    session = await upload_sessions.create(
+        user_id=current_user.id,
+        activity_id=upload.activity_id,
+        title=upload.title,
+        description=upload.description,
+        filename=upload.filename,
+        content_type=upload.content_type,
         media_type=media_type,
-        title=title,
-        description=description,
-        activity_id=activity_id,
-        uploader_id=current_user.id
+        total_size=upload.total_size
     )
+    return upload_session_response(session)
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionSchema, summary="查询分块上传进度")
+async def get_upload_session(
+    upload_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    查询服务端已接收的字节数，断线后从 offset 继续上传
+    """
+    return upload_session_response(await upload_sessions.get(upload_id, current_user.id))
+
+
+@router.put("/uploads/{upload_id}", response_model=UploadSessionSchema, summary="上传一个分块")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="分块在文件中的起始位置，必须等于已接收的字节数"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    上传一个分块，请求体为原始字节
+    - offset 与服务端已接收的字节数不一致时返回409
+    - 单个分块不超过 upload_chunk_max_size；连接中断时已收到的部分保留
+    """
+    async with upload_sessions.lock(upload_id):
+        session = await upload_sessions.get(upload_id, current_user.id)
+        await upload_sessions.append(session, offset, request.stream())
+    return upload_session_response(session)
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=MediaItemSchema, summary="完成分块上传")
+async def complete_upload(
+    upload_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    全部分块上传完成后生成媒体记录
+    """
+    async with upload_sessions.lock(upload_id):
+        session = await upload_sessions.get(upload_id, current_user.id)
+        if session.offset != session.total_size:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"文件尚未上传完成，已接收 {session.offset}/{session.total_size} 字节"
+            )
+        await get_activity_or_404(db, session.activity_id)
+        
+        # 入库使用暂存文件的硬链接，失败时会话数据保持完整，可以重试完成操作
+        incoming = await blob_store.adopt(
+            upload_sessions.data_path(session.id), os.path.splitext(session.filename)[1]
+        )
+        try:
+            db_media = await store_media_item(
+                db, incoming,
+                activity_id=session.activity_id,
+                title=session.title,
+                description=session.description,
+                original_filename=session.filename,
+                media_type=session.media_type,
+                uploader_id=current_user.id
+            )
+        finally:
+            await blob_store.discard(incoming)
+        await upload_sessions.remove(session.id)
+    
+    return await load_media_item(db, db_media.id)
+
+
+@router.delete("/uploads/{upload_id}", summary="取消分块上传")
+async def cancel_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    取消分块上传并删除已接收的数据
+    """
+    async with upload_sessions.lock(upload_id):
+        await upload_sessions.get(upload_id, current_user.id)
+        await upload_sessions.remove(upload_id)
+    return {"message": "上传已取消"}
+
+
+async def check_direct_upload(db: AsyncSession, upload: DirectUploadCreate) -> Tuple[str, Optional[MediaBlob]]:
+    """
+    校验直传请求，返回 (存储路径, 已有的文件记录)
+    文件直接保存在内容寻址路径上，相同内容已存在时不需要再上传
+    """
+    if not storage.supports_presigned_upload:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="当前存储不支持直传，请使用分块上传"
+        )
+    await get_activity_or_404(db, upload.activity_id)
+    media_type = media_type_for(upload.content_type)
+    max_size = settings.max_video_size if media_type == "video" else settings.max_file_size
+    if upload.total_size > max_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="文件大小超过限制"
+        )
+    blob = await db.get(MediaBlob, upload.content_hash)
+    if blob is not None:
+        return blob.file_path, blob
+    return blob_relative_path(upload.content_hash, os.path.splitext(upload.filename)[1]), None
+
+
+@router.post("/direct-uploads", response_model=DirectUploadTicketSchema, summary="申请直传到存储")
+async def create_direct_upload(
+    upload: DirectUploadCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    申请把文件直接上传到对象存储（需要 s3 存储后端），文件内容不经过本服务
+    - 客户端先计算文件的 SHA-256，按返回的 method/url/headers 上传，再调用 /media/direct-uploads/complete
+    - 上传URL的签名包含内容校验和，内容与 content_hash 不一致时存储会拒绝
+    - 存储中已有相同内容时 upload_required 为 False，直接调用完成接口即可
+    """
+    key, blob = await check_direct_upload(db, upload)
+    if blob is not None:
+        return {"upload_required": False, "key": key}
     
-    db.add(db_media)
-    db.commit()
-    db.refresh(db_media)
+    presigned = storage.presign_upload(key, upload.content_type, upload.total_size, upload.content_hash)
+    return {
+        "upload_required": True,
+        "key": key,
+        "method": presigned.method,
+        "url": presigned.url,
+        "headers": presigned.headers,
+        "expires_in": presigned.expires_in,
+    }
+
+
+@router.post("/direct-uploads/complete", response_model=MediaItemSchema, summary="完成直传")
+async def complete_direct_upload(
+    upload: DirectUploadCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    直传完成后生成媒体记录，请求体与申请直传时相同
+    - 校验存储中文件的大小和存储记录的 SHA-256 校验和，不一致时删除该文件并返回400
+    - 文件内容不经过本服务：存储没有记录校验和（上传时没有带上票据中的请求头）时同样拒绝，不在这里重新计算哈希
+    """
+    key, blob = await check_direct_upload(db, upload)
+    if blob is None:
+        stored = await storage.stat(key)
+        if stored is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="文件尚未上传到存储，请重新上传"
+            )
+        if stored.sha256 is None:
+            await storage.delete(key)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="存储中的文件没有 SHA-256 校验和，请按申请直传返回的请求头重新上传"
+            )
+        if stored.size != upload.total_size or stored.sha256 != upload.content_hash:
+            # 路径由哈希决定，内容不一致的文件不可能被其他记录引用
+            await storage.delete(key)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="上传的文件与声明的大小或哈希不一致"
+            )
     
-    return db_media
+    incoming = IncomingBlob(
+        temp_path=None,
+        content_hash=upload.content_hash,
+        size=upload.total_size,
+        extension=os.path.splitext(upload.filename)[1]
+    )
+    db_media = await store_media_item(
+        db, incoming,
+        activity_id=upload.activity_id,
+        title=upload.title,
+        description=upload.description,
+        original_filename=upload.filename,
+        media_type=media_type_for(upload.content_type),
+        uploader_id=current_user.id
+    )
+    return await load_media_item(db, db_media.id)
 
 
 @router.get("/{media_id}", response_model=MediaItemSchema, summary="获取媒体文件详情")
 async def get_media_item(
     media_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     获取指定媒体文件的详细信息
     """
-    media_item = db.query(MediaItem).filter(MediaItem.id == media_id).first()
+    media_item = await db.scalar(
+        select(MediaItem).options(*media_load_options).where(MediaItem.id == media_id)
+    )
     if not media_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="媒体文件不存在"
         )
     
-    # 增加浏览次数
-    media_item.views_count += 1
-    db.commit()
+    # 增加浏览次数：先计入内存缓冲，由后台任务批量写回数据库
+    view_counter.increment(media_id)
+    # 响应中包含尚未写回的浏览次数（不标记为修改，避免被当作绝对值写入）
+    set_committed_value(
+        media_item, "views_count", (media_item.views_count or 0) + view_counter.pending(media_id)
+    )
     
     return media_item
 
@@ -142,13 +554,13 @@ async def get_media_item(
 @router.delete("/{media_id}", summary="删除媒体文件")
 async def delete_media_item(
     media_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     删除指定媒体文件
     """
-    media_item = db.query(MediaItem).filter(MediaItem.id == media_id).first()
+    media_item = await db.get(MediaItem, media_id)
     if not media_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -162,37 +574,31 @@ async def delete_media_item(
             detail="无权限删除此文件"
         )
     
-    # 删除文件
-    full_file_path = os.path.join(settings.upload_dir, media_item.file_path)
-    if os.path.exists(full_file_path):
-        os.remove(full_file_path)
-    
-    # 删除数据库记录
-    db.delete(media_item)
-    db.commit()
+    file_path, thumbnails = media_item.file_path, list((media_item.thumbnails or {}).values())
+    if media_item.content_hash is None:
+        # 内容寻址之前上传的文件只属于这一条记录
+        await db.delete(media_item)
+        await db.commit()
+        await blob_store.remove_files([file_path, *thumbnails])
+    else:
+        # 文件可能被其他记录共享：先提交引用数减一，再按提交后的引用数决定是否删除文件及其缩略图
+        content_hash = media_item.content_hash
+        async with blob_store.lock(content_hash):
+            await db.delete(media_item)
+            await db.flush()
+            await blob_store.release(db, content_hash)
+            await db.commit()
+            await blob_store.remove_unreferenced(db, content_hash, file_path, thumbnails)
     
     return {"message": "媒体文件删除成功"}
 
 
 @router.get("/stats/summary", summary="获取媒体统计信息")
 async def get_media_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    获取媒体相关的统计信息
+    获取媒体相关的统计信息（单条聚合查询，结果在进程内短时间缓存）
     """
-    total_media = db.query(MediaItem).count()
-    total_photos = db.query(MediaItem).filter(MediaItem.media_type == "photo").count()
-    total_videos = db.query(MediaItem).filter(MediaItem.media_type == "video").count()
-    
-    # 计算总浏览量
-    from sqlalchemy import func
-    total_views = db.query(func.sum(MediaItem.views_count)).scalar() or 0
-    
-    return {
-        "total_media": total_media,
-        "total_photos": total_photos,
-        "total_videos": total_videos,
-        "total_views": total_views
-    }
+    return await cached_stats("media", lambda: load_media_stats(db))
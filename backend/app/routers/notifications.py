@@ -1,47 +1,65 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from ..models import User, Notification
 from ..schemas import Notification as NotificationSchema
 from ..auth import get_current_active_user
+from ..pagination import paginate, set_next_cursor
+from ..fast_json import fast_json_route_class
+from ..conditional import check_not_modified, table_state
 
-router = APIRouter(prefix="/notifications", tags=["通知管理"])
+router = APIRouter(prefix="/notifications", tags=["通知管理"], route_class=fast_json_route_class("notifications"))
 
 
 @router.get("/", response_model=List[NotificationSchema], summary="获取当前用户通知")
 async def get_user_notifications(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
     unread_only: bool = False,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     获取当前用户的通知列表
+    - 按时间倒序，支持游标分页（cursor）和 skip/limit 分页
+    - 下一页游标在 X-Next-Cursor 响应头中返回
+    - 支持 If-None-Match / If-Modified-Since，当前用户的通知（含已读状态）未变化时返回304
     """
-    query = db.query(Notification).filter(Notification.user_id == current_user.id)
+    not_modified = await check_not_modified(
+        request, response, db, table_state(Notification, Notification.user_id == current_user.id)
+    )
+    if not_modified:
+        return not_modified
+    
+    query = select(Notification).where(Notification.user_id == current_user.id)
     
     if unread_only:
-        query = query.filter(Notification.is_read == False)
+        query = query.where(Notification.is_read == False)
     
-    notifications = query.order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
+    query = paginate(query, Notification.created_at, Notification.id, skip, limit, cursor, descending=True)
+    notifications = (await db.scalars(query)).all()
+    set_next_cursor(response, notifications, "created_at", limit)
     return notifications
 
 
 @router.put("/{notification_id}/read", summary="标记通知为已读")
 async def mark_notification_as_read(
     notification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     标记指定通知为已读
     """
-    notification = db.query(Notification).filter(
+    notification = await db.scalar(select(Notification).where(
         Notification.id == notification_id,
         Notification.user_id == current_user.id
-    ).first()
+    ))
     
     if not notification:
         raise HTTPException(
@@ -50,25 +68,25 @@ async def mark_notification_as_read(
         )
     
     notification.is_read = True
-    db.commit()
+    await db.commit()
     
     return {"message": "通知已标记为已读"}
 
 
 @router.put("/mark-all-read", summary="标记所有通知为已读")
 async def mark_all_notifications_as_read(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     标记当前用户的所有通知为已读
     """
-    db.query(Notification).filter(
+    await db.execute(update(Notification).where(
         Notification.user_id == current_user.id,
         Notification.is_read == False
-    ).update({"is_read": True})
+    ).values(is_read=True))
     
-    db.commit()
+    await db.commit()
     
     return {"message": "所有通知已标记为已读"}
 
@@ -76,16 +94,16 @@ async def mark_all_notifications_as_read(
 @router.delete("/{notification_id}", summary="删除通知")
 async def delete_notification(
     notification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     删除指定通知
     """
-    notification = db.query(Notification).filter(
+    notification = await db.scalar(select(Notification).where(
         Notification.id == notification_id,
         Notification.user_id == current_user.id
-    ).first()
+    ))
     
     if not notification:
         raise HTTPException(
@@ -93,28 +111,28 @@ async def delete_notification(
             detail="通知不存在"
         )
     
-    db.delete(notification)
-    db.commit()
+    await db.delete(notification)
+    await db.commit()
     
     return {"message": "通知删除成功"}
 
 
 @router.get("/stats", summary="获取通知统计")
 async def get_notification_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     获取当前用户的通知统计信息
     """
-    total_notifications = db.query(Notification).filter(
+    total_notifications = await db.scalar(select(func.count()).select_from(Notification).where(
         Notification.user_id == current_user.id
-    ).count()
+    ))
     
-    unread_notifications = db.query(Notification).filter(
+    unread_notifications = await db.scalar(select(func.count()).select_from(Notification).where(
         Notification.user_id == current_user.id,
         Notification.is_read == False
-    ).count()
+    ))
     
     return {
         "total_notifications": total_notifications,
@@ -1,6 +1,7 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from ..models import User
 from ..schemas import User as UserSchema, UserUpdate, PasswordChange
@@ -8,23 +9,43 @@ from ..auth import get_current_active_user
 import os
 import uuid
 from ..config import settings
+from ..pagination import paginate, set_next_cursor
+from ..fast_json import fast_json_route_class
+from ..uploads import save_upload_file
+from ..storage import storage
+from ..stats import cached_stats, load_user_stats
+from ..conditional import check_not_modified, table_state
 
-router = APIRouter(prefix="/users", tags=["用户管理"])
+# 头像文件的最大字节数
+AVATAR_MAX_SIZE = 2 * 1024 * 1024
+
+router = APIRouter(prefix="/users", tags=["用户管理"], route_class=fast_json_route_class("users"))
 
 
 @router.get("/", response_model=List[UserSchema], summary="获取所有用户")
 async def get_all_users(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     获取所有用户列表
-    - 支持分页查询
+    - 按注册时间排序，支持游标分页（cursor）和 skip/limit 分页
+    - 下一页游标在 X-Next-Cursor 响应头中返回
     - 需要登录权限
+    - 支持 If-None-Match / If-Modified-Since，用户表未变化时返回304
     """
-    users = db.query(User).offset(skip).limit(limit).all()
+    not_modified = await check_not_modified(request, response, db, table_state(User))
+    if not_modified:
+        return not_modified
+    
+    query = paginate(select(User), User.created_at, User.id, skip, limit, cursor)
+    users = (await db.scalars(query)).all()
+    set_next_cursor(response, users, "created_at", limit)
     return users
 
 
@@ -41,7 +62,7 @@ async def get_current_user_profile(
 @router.put("/me", response_model=UserSchema, summary="更新当前用户信息")
 async def update_current_user_profile(
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -52,8 +73,8 @@ async def update_current_user_profile(
     for field, value in update_data.items():
         setattr(current_user, field, value)
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
     
     return current_user
 
@@ -61,13 +82,13 @@ async def update_current_user_profile(
 @router.get("/{user_id}", response_model=UserSchema, summary="获取指定用户信息")
 async def get_user_by_id(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     获取指定用户的详细信息
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -78,36 +99,19 @@ async def get_user_by_id(
 
 @router.get("/stats/summary", summary="获取用户统计信息")
 async def get_user_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    获取用户相关的统计信息
+    获取用户相关的统计信息（单条聚合查询，结果在进程内短时间缓存）
     """
-    total_users = db.query(User).count()
-    
-    # 按角色统计
-    students_count = db.query(User).filter(User.role == "student").count()
-    teachers_count = db.query(User).filter(User.role == "teacher").count()
-    admins_count = db.query(User).filter(User.role == "admin").count()
-    
-    # 活跃用户统计
-    active_users = db.query(User).filter(User.is_active == True).count()
-    
-    return {
-        "total_users": total_users,
-        "students_count": students_count,
-        "teachers_count": teachers_count,
-        "admins_count": admins_count,
-        "active_users": active_users,
-        "dormitories": []  # 可以后续扩展宿舍统计
-    }
+    return await cached_stats("users", lambda: load_user_stats(db))
 
 
 @router.post("/avatar", response_model=dict, summary="上传用户头像")
 async def upload_avatar(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -120,31 +124,24 @@ async def upload_avatar(
             detail="只能上传图片文件"
         )
     
-    # 检查文件大小 (2MB)
-    if file.size > 2 * 1024 * 1024:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="图片大小不能超过2MB"
-        )
-    
     # 生成唯一文件名
     file_extension = os.path.splitext(file.filename)[1]
     unique_filename = f"avatar_{current_user.id}_{uuid.uuid4()}{file_extension}"
     
-    # 确保头像目录存在
+    # 流式保存到本地暂存目录，写入过程中检查文件大小 (2MB)，再存入存储后端
+    avatar_url = f"avatars/{unique_filename}"
     avatar_dir = f"{settings.upload_dir}/avatars"
-    os.makedirs(avatar_dir, exist_ok=True)
-    
-    # 保存文件
-    file_path = os.path.join(avatar_dir, unique_filename)
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    await save_upload_file(
+        file, avatar_dir, unique_filename,
+        max_size=AVATAR_MAX_SIZE,
+        too_large_detail="图片大小不能超过2MB"
+    )
+    if storage.local_path(avatar_url) is None:
+        await storage.put(avatar_url, os.path.join(avatar_dir, unique_filename))
     
     # 更新用户头像URL
-    avatar_url = f"avatars/{unique_filename}"
     current_user.avatar_url = avatar_url
-    db.commit()
+    await db.commit()
     
     return {"avatar_url": avatar_url, "message": "头像上传成功"}
 
@@ -152,22 +149,22 @@ async def upload_avatar(
 @router.post("/change-password", summary="修改密码")
 async def change_password(
     password_data: PasswordChange,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     修改用户密码
     """
     # 验证当前密码
-    from ..auth import verify_password, get_password_hash
-    if not verify_password(password_data.current_password, current_user.hashed_password):
+    from ..auth import verify_password_async, get_password_hash_async
+    if not await verify_password_async(password_data.current_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="当前密码错误"
         )
     
     # 更新密码
-    current_user.hashed_password = get_password_hash(password_data.new_password)
-    db.commit()
+    current_user.hashed_password = await get_password_hash_async(password_data.new_password)
+    await db.commit()
     
     return {"message": "密码修改成功"}
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, EmailStr, field_validator
 from .models import UserRole, MediaType
 
@@ -136,6 +136,8 @@ class MediaItem(MediaItemBase):
     uploader_id: int
     upload_time: datetime
     views_count: int = 0
+    thumbnails: Optional[Dict[str, str]] = None  # 缩略图路径 {宽度: 相对路径}，生成完成前为空
+    content_hash: Optional[str] = None  # 文件内容的SHA-256
     uploader: User
     activity: Activity
 
@@ -143,6 +145,68 @@ class MediaItem(MediaItemBase):
         from_attributes = True
 
 
+class BatchUploadItem(BaseModel):
+    filename: Optional[str] = None
+    success: bool
+    error: Optional[str] = None  # 失败原因
+    media: Optional[MediaItem] = None  # 成功时的媒体记录
+
+
+class BatchUploadResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BatchUploadItem]  # 与上传的文件顺序一致
+
+
+# 分块上传相关schemas
+class UploadSessionCreate(MediaItemCreate):
+    title: str
+    filename: str
+    content_type: str
+    total_size: int
+
+    @field_validator('total_size')
+    @classmethod
+    def validate_total_size(cls, v):
+        if v <= 0:
+            raise ValueError('文件大小必须大于0')
+        return v
+
+
+class UploadSession(BaseModel):
+    id: str
+    filename: str
+    media_type: MediaType
+    total_size: int
+    offset: int  # 服务端已接收的字节数，下一个分块从这里开始
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# 直传相关schemas
+class DirectUploadCreate(UploadSessionCreate):
+    content_hash: str  # 文件内容的SHA-256（十六进制），由客户端在上传前计算
+
+    @field_validator('content_hash')
+    @classmethod
+    def validate_content_hash(cls, v):
+        v = v.lower()
+        if len(v) != 64 or not all(c in "0123456789abcdef" for c in v):
+            raise ValueError('content_hash 必须是64位十六进制SHA-256')
+        return v
+
+
+class DirectUploadTicket(BaseModel):
+    upload_required: bool  # 存储中已有相同内容时为 False，直接调用完成接口
+    key: str  # 文件在存储中的路径
+    method: Optional[str] = None
+    url: Optional[str] = None
+    headers: Dict[str, str] = {}  # 上传请求必须带上的请求头
+    expires_in: Optional[int] = None  # 上传URL有效期（秒）
+
+
 # 评论相关schemas
 class CommentBase(BaseModel):
     content: str
@@ -162,6 +226,7 @@ class Comment(CommentBase):
     updated_at: Optional[datetime] = None
     author: User
     replies: List['Comment'] = []
+    replies_count: int = 0  # 直接回复总数（replies 可能只包含预览部分）
 
     class Config:
         from_attributes = True
@@ -0,0 +1,165 @@
+"""
+慢查询日志
+
+执行时间超过 slow_query_ms 的语句会被记录：SQL、参数、发出该查询的路由和执行耗时。
+查询计划（PostgreSQL 为 EXPLAIN，SQLite 为 EXPLAIN QUERY PLAN）在后台任务中用同一引擎的
+另一个连接获取，不会延长原请求。最近的记录保存在有界的内存环形缓冲区中，
+可选地逐行追加到 JSONL 文件。
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from .config import settings
+from .query_stats import current_query_stats
+
+logger = logging.getLogger(__name__)
+
+# 标记慢查询日志自身执行的 EXPLAIN，避免被再次记录
+SKIP_OPTION = "skip_slow_query_log"
+
+EXPLAINABLE_PREFIXES = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+
+
+def _format_parameters(parameters) -> Optional[list]:
+    """把参数转换为可以JSON序列化的形式（过长的值截断）"""
+    if parameters is None:
+        return None
+    values = parameters.values() if isinstance(parameters, dict) else parameters
+    formatted = []
+    for value in values:
+        text = value if isinstance(value, (int, float, bool)) or value is None else str(value)
+        if isinstance(text, str) and len(text) > 200:
+            text = text[:200] + "..."
+        formatted.append(text)
+    return formatted
+
+
+class SlowQueryLog:
+    """慢查询记录器"""
+
+    def __init__(self, threshold_ms: float, size: int, log_file: Optional[str], explain: bool):
+        self.threshold_ms = threshold_ms
+        self.log_file = log_file
+        self.explain = explain
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._engines: Dict[Engine, AsyncEngine] = {}
+        self._tasks = set()
+        self.total = 0
+
+    def instrument(self, async_engine: AsyncEngine):
+        """为异步引擎注册计时事件"""
+        sync_engine = async_engine.sync_engine
+        self._engines[sync_engine] = async_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("slow_query_start_time", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            duration_ms = (time.perf_counter() - conn.info["slow_query_start_time"].pop()) * 1000
+            if self.threshold_ms <= 0 or duration_ms < self.threshold_ms:
+                return
+            if context is not None and context.execution_options.get(SKIP_OPTION):
+                return
+            self.record(conn.engine, statement, parameters, duration_ms, executemany)
+
+    def record(self, sync_engine: Engine, statement: str, parameters, duration_ms: float, executemany: bool):
+        stats = current_query_stats.get()
+        entry = {
+            "timestamp": time.time(),
+            "duration_ms": round(duration_ms, 3),
+            "route": stats.route if stats is not None else None,
+            "statement": statement,
+            "parameters": None if executemany else _format_parameters(parameters),
+            "executemany": executemany,
+            "plan": None,
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self.total += 1
+        logger.warning(f"慢查询 {duration_ms:.1f}ms ({entry['route'] or '后台任务'}): {' '.join(statement.split())[:200]}")
+
+        explainable = (
+            self.explain
+            and not executemany
+            and statement.lstrip().upper().startswith(EXPLAINABLE_PREFIXES)
+            and sync_engine in self._engines
+        )
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None:
+            # 同步脚本中执行的查询：不获取查询计划，直接写入文件
+            self._write(entry)
+            return
+        task = loop.create_task(self._finish(
+            entry, self._engines.get(sync_engine) if explainable else None, statement, parameters
+        ))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _finish(self, entry: dict, async_engine: Optional[AsyncEngine], statement: str, parameters):
+        """后台获取查询计划并写入文件"""
+        # 后台任务复制了请求的上下文，EXPLAIN 不应计入该请求的查询统计
+        current_query_stats.set(None)
+        if async_engine is not None:
+            entry["plan"] = await self._explain(async_engine, statement, parameters)
+        if self.log_file:
+            await asyncio.to_thread(self._write, entry)
+
+    @staticmethod
+    async def _explain(async_engine: AsyncEngine, statement: str, parameters) -> Optional[List[str]]:
+        prefix = "EXPLAIN QUERY PLAN " if async_engine.dialect.name == "sqlite" else "EXPLAIN "
+        try:
+            async with async_engine.connect() as conn:
+                conn = await conn.execution_options(**{SKIP_OPTION: True})
+                result = await conn.exec_driver_sql(prefix + statement, parameters)
+                plan = [" ".join(str(value) for value in row) for row in result]
+                await conn.rollback()
+                return plan
+        except Exception as e:
+            return [f"EXPLAIN 失败: {e}"]
+
+    def _write(self, entry: dict):
+        if not self.log_file:
+            return
+        try:
+            with open(self.log_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            logger.error(f"写入慢查询日志失败: {e}")
+
+    def entries(self, limit: int = 50) -> List[dict]:
+        """获取最近的慢查询（新的在前）"""
+        with self._lock:
+            return list(reversed(self._entries))[:limit]
+
+    def clear(self):
+        """清空内存中的慢查询记录"""
+        with self._lock:
+            self._entries.clear()
+
+    async def shutdown(self):
+        """等待进行中的 EXPLAIN 任务结束"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# 全局慢查询日志
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.slow_query_ms,
+    size=settings.slow_query_log_size,
+    log_file=settings.slow_query_log_file,
+    explain=settings.slow_query_explain
+)
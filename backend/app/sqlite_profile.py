@@ -0,0 +1,142 @@
+"""
+SQLite 生产配置
+
+默认数据库是 SQLite，单文件数据库在并发上传、评论时容易出现 "database is locked"：
+- 每个新连接执行 PRAGMA：WAL 日志模式（读不阻塞写、写不阻塞读）、busy_timeout、
+  synchronous=NORMAL（WAL下仍保证一致性）、mmap_size 与 cache_size
+- 同一进程内的写事务经过一个单写者队列串行执行：会话在第一次写入前排队获取写锁，
+  提交/回滚/关闭时释放，写事务之间不再在 SQLite 的文件锁上互相重试
+"""
+
+import asyncio
+import time
+import weakref
+from typing import Dict
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from .config import settings
+
+
+def sqlite_pragmas() -> Dict[str, object]:
+    """根据配置生成每个连接需要执行的 PRAGMA"""
+    return {
+        "journal_mode": "WAL" if settings.sqlite_wal else "DELETE",
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        "synchronous": settings.sqlite_synchronous,
+        "mmap_size": settings.sqlite_mmap_size,
+        # 负数表示以KB为单位
+        "cache_size": -settings.sqlite_cache_size_kb,
+    }
+
+
+def apply_sqlite_pragmas(sync_engine: Engine, pragmas: Dict[str, object]):
+    """在引擎每次建立新连接时执行 PRAGMA（异步引擎传入 async_engine.sync_engine）"""
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+class SQLiteWriteQueue:
+    """进程内的单写者队列（每个事件循环一把锁），记录排队等待时间"""
+
+    def __init__(self):
+        self._locks = weakref.WeakKeyDictionary()
+        self.acquired = 0
+        self.contended = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        return lock
+
+    async def acquire(self):
+        lock = self._lock()
+        if lock.locked():
+            self.contended += 1
+        started = time.perf_counter()
+        await lock.acquire()
+        wait = time.perf_counter() - started
+        self.acquired += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def release(self):
+        self._lock().release()
+
+    def metrics(self) -> dict:
+        """获取写队列指标"""
+        return {
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "avg_wait_ms": round(self.total_wait / self.acquired * 1000, 3) if self.acquired else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+# 全局写队列
+write_queue = SQLiteWriteQueue()
+
+
+class SerializedWriteSession(AsyncSession):
+    """
+    写事务串行化的异步会话
+    - ORM 变更在 flush/commit 前、Core 的 INSERT/UPDATE/DELETE 在执行前获取写锁
+    - 写锁一直持有到 commit/rollback/close，保证同一时刻只有一个写事务
+    - 只读的会话不会排队
+    """
+
+    _holds_write_lock = False
+
+    async def _acquire_write_lock(self):
+        if not self._holds_write_lock:
+            await write_queue.acquire()
+            self._holds_write_lock = True
+
+    def _release_write_lock(self):
+        if self._holds_write_lock:
+            self._holds_write_lock = False
+            write_queue.release()
+
+    def _has_pending_changes(self) -> bool:
+        return bool(self.new or self.dirty or self.deleted)
+
+    async def execute(self, statement, *args, **kwargs):
+        if getattr(statement, "is_dml", False):
+            await self._acquire_write_lock()
+        return await super().execute(statement, *args, **kwargs)
+
+    async def flush(self, objects=None):
+        if self._has_pending_changes():
+            await self._acquire_write_lock()
+        return await super().flush(objects)
+
+    async def commit(self):
+        if self._has_pending_changes():
+            await self._acquire_write_lock()
+        try:
+            return await super().commit()
+        finally:
+            self._release_write_lock()
+
+    async def rollback(self):
+        try:
+            return await super().rollback()
+        finally:
+            self._release_write_lock()
+
+    async def close(self):
+        try:
+            return await super().close()
+        finally:
+            self._release_write_lock()
@@ -0,0 +1,112 @@
+"""
+统计接口的聚合查询与缓存
+
+每个统计接口只执行一条条件聚合查询（COUNT(CASE WHEN ...)），结果在进程内缓存 stats_cache_ttl 秒。
+缓存过期时同一统计只有一个请求去查询数据库（single-flight），其余请求等待其结果，
+首页流量突增时每个TTL周期只产生一次查询。
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Dict
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .cache import TTLCache
+from .config import settings
+from .models import User, Activity, MediaItem
+
+# 全局统计缓存
+stats_cache = TTLCache(maxsize=16, ttl=settings.stats_cache_ttl)
+
+# 每个统计一把刷新锁
+_refresh_locks: Dict[str, asyncio.Lock] = {}
+
+
+async def cached_stats(key: str, loader: Callable[[], Awaitable[dict]]) -> dict:
+    """从缓存获取统计结果，过期时只由一个请求执行 loader 刷新"""
+    if not stats_cache.enabled:
+        return await loader()
+
+    value = stats_cache.get(key)
+    if value is not None:
+        return value
+
+    lock = _refresh_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        # 等待期间其他请求可能已经刷新了缓存
+        value = stats_cache.get(key)
+        if value is None:
+            value = await loader()
+            stats_cache.set(key, value)
+    return value
+
+
+def count_where(condition):
+    """条件计数：COUNT(CASE WHEN condition THEN 1 END)"""
+    return func.count(case((condition, 1)))
+
+
+async def load_user_stats(db: AsyncSession) -> dict:
+    """用户统计"""
+    row = (await db.execute(select(
+        func.count(),
+        count_where(User.role == "student"),
+        count_where(User.role == "teacher"),
+        count_where(User.role == "admin"),
+        count_where(User.is_active == True),
+    ).select_from(User))).one()
+    return {
+        "total_users": row[0],
+        "students_count": row[1],
+        "teachers_count": row[2],
+        "admins_count": row[3],
+        "active_users": row[4],
+        "dormitories": []  # 可以后续扩展宿舍统计
+    }
+
+
+async def load_activity_stats(db: AsyncSession) -> dict:
+    """活动统计"""
+    now = datetime.utcnow()
+    row = (await db.execute(select(
+        func.count(),
+        # 活动时间在未来的为即将开始，在过去的为已完成
+        count_where(Activity.activity_date > now),
+        count_where(Activity.activity_date <= now),
+    ).select_from(Activity))).one()
+    return {
+        "total_activities": row[0],
+        "upcoming_activities": row[1],
+        "completed_activities": row[2],
+        "ongoing_activities": 0  # 可以根据具体业务逻辑计算
+    }
+
+
+async def load_media_stats(db: AsyncSession) -> dict:
+    """媒体统计"""
+    row = (await db.execute(select(
+        func.count(),
+        count_where(MediaItem.media_type == "photo"),
+        count_where(MediaItem.media_type == "video"),
+        func.coalesce(func.sum(MediaItem.views_count), 0),
+    ).select_from(MediaItem))).one()
+    return {
+        "total_media": row[0],
+        "total_photos": row[1],
+        "total_videos": row[2],
+        "total_views": row[3]
+    }
+
+
+async def load_public_stats(db: AsyncSession) -> dict:
+    """首页公开统计：三张表的数量合并为一条查询"""
+    row = (await db.execute(select(
+        select(func.count()).select_from(User).scalar_subquery(),
+        select(func.count()).select_from(Activity).scalar_subquery(),
+        select(func.count()).select_from(MediaItem).scalar_subquery(),
+    ))).one()
+    return {
+        "total_users": row[0],
+        "total_activities": row[1],
+        "total_media": row[2]
+    }
@@ -0,0 +1,303 @@
+"""
+文件存储后端
+
+上传的文件（媒体、缩略图、头像）通过统一的存储接口读写，key 为相对路径（如 blobs/ab/cd/<哈希>.jpg）：
+- put(key, source_path)   把本地暂存文件存入后端（本地存储为移动，对象存储为上传后删除暂存文件）
+- get(key) / stream(key)  读取整个文件 / 按块读取（可指定字节范围）
+- delete(key)             删除文件，不存在时忽略
+- url(key)                浏览器访问文件使用的URL
+- stat(key)               文件大小与内容SHA-256（后端能提供时），不存在时返回 None
+
+两种实现，由 settings.storage_backend 选择：
+- local: 保存在 settings.upload_dir，由 /uploads（media_files.MediaFiles）直接提供
+- s3:    S3 兼容的对象存储（AWS S3、MinIO 等），需要安装 boto3。多个应用节点共享同一个存储桶，
+         /uploads 重定向到对象URL；支持预签名直传（presign_upload），文件内容不经过API进程
+
+上传过程中的暂存文件始终写在本地的 settings.upload_dir 下。
+"""
+
+import asyncio
+import base64
+import mimetypes
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import quote
+import aiofiles
+import aiofiles.os
+from starlette.responses import PlainTextResponse, RedirectResponse
+from .config import settings
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # 可选依赖，仅 s3 存储需要
+    boto3 = None
+
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+@dataclass
+class StoredObject:
+    """存储中的文件信息"""
+    size: int
+    sha256: Optional[str] = None  # 十六进制；后端无法提供时为 None
+
+
+@dataclass
+class PresignedUpload:
+    """预签名直传：客户端按 method 把文件发送到 url，并带上全部 headers"""
+    url: str
+    method: str
+    headers: Dict[str, str]
+    expires_in: int
+
+
+class StorageBackend(ABC):
+    """
+    存储后端接口
+    子类必须实现全部抽象方法，缺少任何一个时在创建实例时就会报错
+    """
+
+    supports_presigned_upload = False
+
+    @abstractmethod
+    async def put(self, key: str, source_path: str):
+        """把本地文件存入 key，成功后源文件不再保留"""
+
+    async def get(self, key: str) -> bytes:
+        chunks = [chunk async for chunk in self.stream(key)]
+        return b"".join(chunks)
+
+    @abstractmethod
+    def stream(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """按块读取 [start, end] 字节范围（end 为闭区间，None 表示到文件末尾）"""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """删除文件，不存在时忽略"""
+
+    async def exists(self, key: str) -> bool:
+        return await self.stat(key) is not None
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        """文件大小与内容SHA-256，不存在时返回 None"""
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """浏览器访问文件使用的URL"""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """文件在本机上的路径，远程存储返回 None"""
+        return None
+
+    def presign_upload(self, key: str, content_type: str, size: int, sha256: str) -> PresignedUpload:
+        """生成预签名直传，仅 supports_presigned_upload 为 True 的后端支持"""
+        raise RuntimeError(f"{type(self).__name__} 不支持预签名直传")
+
+    async def download_to(self, key: str, target_path: str):
+        """把文件下载到本地路径（远程存储上处理缩略图等需要本地文件的场景）"""
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        async with aiofiles.open(target_path, "wb") as f:
+            async for chunk in self.stream(key):
+                await f.write(chunk)
+
+
+class LocalStorage(StorageBackend):
+    """本地文件系统存储"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    async def put(self, key: str, source_path: str):
+        target = self.local_path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        await aiofiles.os.replace(source_path, target)
+
+    async def stream(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        async with aiofiles.open(self.local_path(key), "rb") as f:
+            await f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = await f.read(STREAM_CHUNK_SIZE if remaining is None else min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, key: str):
+        try:
+            await aiofiles.os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            return StoredObject(size=(await aiofiles.os.stat(self.local_path(key))).st_size)
+        except FileNotFoundError:
+            return None
+
+    def url(self, key: str) -> str:
+        return f"/uploads/{quote(key)}"
+
+
+class S3Storage(StorageBackend):
+    """
+    S3 兼容的对象存储
+    boto3 是同步客户端，所有请求在线程池中执行
+    """
+
+    supports_presigned_upload = True
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        public_url: Optional[str] = None,
+        presign_expires: int = 3600
+    ):
+        if boto3 is None:
+            raise RuntimeError("使用 s3 存储需要安装 boto3: pip install boto3")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.presign_expires = presign_expires
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            # MinIO 等自建服务通常不支持虚拟主机风格的存储桶域名
+            config=BotoConfig(signature_version="s3v4", s3={"addressing_style": "path" if endpoint_url else "auto"})
+        )
+
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    async def put(self, key: str, source_path: str):
+        content_type = mimetypes.guess_type(key)[0]
+        await asyncio.to_thread(
+            self.client.upload_file, source_path, self.bucket, self.object_key(key),
+            ExtraArgs={"ContentType": content_type} if content_type else None
+        )
+        await aiofiles.os.remove(source_path)
+
+    async def stream(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        params = {"Bucket": self.bucket, "Key": self.object_key(key)}
+        if start or end is not None:
+            params["Range"] = f"bytes={start}-{'' if end is None else end}"
+        response = await asyncio.to_thread(self.client.get_object, **params)
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self.object_key(key))
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            response = await asyncio.to_thread(
+                self.client.head_object, Bucket=self.bucket, Key=self.object_key(key), ChecksumMode="ENABLED"
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        checksum = response.get("ChecksumSHA256")
+        return StoredObject(
+            size=response["ContentLength"],
+            sha256=base64.b64decode(checksum).hex() if checksum else None
+        )
+
+    def url(self, key: str) -> str:
+        if self.public_url:
+            return f"{self.public_url}/{quote(self.object_key(key))}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self.object_key(key)},
+            ExpiresIn=self.presign_expires
+        )
+
+    def presign_upload(self, key: str, content_type: str, size: int, sha256: str) -> PresignedUpload:
+        """
+        预签名 PUT 上传
+        签名中包含内容的 SHA-256 校验和，对象存储会拒绝内容与声明的哈希不一致的上传
+        """
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.object_key(key),
+                "ContentType": content_type,
+                "ContentLength": size,
+                "ChecksumSHA256": checksum,
+            },
+            ExpiresIn=self.presign_expires
+        )
+        return PresignedUpload(
+            url=url,
+            method="PUT",
+            headers={
+                "Content-Type": content_type,
+                "x-amz-checksum-sha256": checksum,
+                "x-amz-sdk-checksum-algorithm": "SHA256",
+            },
+            expires_in=self.presign_expires
+        )
+
+
+class StorageRedirect:
+    """远程存储时挂载在 /uploads 的ASGI应用：重定向到对象URL，兼容数据库中保存的相对路径"""
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        key = scope["path"].lstrip("/")
+        if scope["method"] not in ("GET", "HEAD") or not key or key.startswith(".") or "/." in key:
+            response = PlainTextResponse("Not Found", status_code=404)
+        else:
+            response = RedirectResponse(self.backend.url(key), status_code=307)
+            # 预签名URL会过期，重定向本身只短时间缓存
+            response.headers["Cache-Control"] = "private, max-age=300"
+        await response(scope, receive, send)
+
+
+def create_storage() -> StorageBackend:
+    """根据配置创建存储后端"""
+    if settings.storage_backend == "s3":
+        return S3Storage(
+            bucket=settings.s3_bucket,
+            prefix=settings.s3_prefix,
+            endpoint_url=settings.s3_endpoint_url,
+            region=settings.s3_region,
+            access_key_id=settings.s3_access_key_id,
+            secret_access_key=settings.s3_secret_access_key,
+            public_url=settings.s3_public_url,
+            presign_expires=settings.s3_presign_expires
+        )
+    return LocalStorage(settings.upload_dir)
+
+
+# 全局存储后端
+storage = create_storage()
@@ -0,0 +1,143 @@
+"""
+照片缩略图生成
+
+上传完成后在进程池中按固定宽度生成缩略图，生成结果写回 MediaItem.thumbnails，
+请求路径不会被图片解码和缩放阻塞。照片墙等列表页使用缩略图，详情页再加载原图。
+使用远程存储时，原图先下载到本地临时目录，生成的缩略图再存入存储。
+写回前在内容哈希锁内确认文件仍被引用：生成期间最后一个引用已被删除时，删除刚生成的缩略图。
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Optional
+from PIL import Image, ImageOps
+from sqlalchemy import select, update
+from .blob_store import blob_store
+from .config import settings
+from .database import AsyncSessionLocal
+from .models import MediaBlob, MediaItem
+from .storage import storage
+
+logger = logging.getLogger(__name__)
+
+
+def generate_thumbnails(upload_dir: str, file_path: str, widths: Iterable[int], quality: int) -> Dict[str, str]:
+    """
+    为 upload_dir/file_path 生成各个宽度的JPEG缩略图（在工作进程中执行）
+    - 返回 {宽度: 相对于上传目录的路径}
+    - 只生成比原图窄的尺寸，更大的尺寸直接使用原图
+    """
+    source_path = os.path.join(upload_dir, file_path)
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    variants = {}
+
+    with Image.open(source_path) as image:
+        # 按EXIF方向旋转，统一转换为RGB以便保存为JPEG
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+        for width in sorted(set(widths)):
+            if width >= image.width:
+                continue
+            height = max(1, round(image.height * width / image.width))
+            relative_path = f"thumbnails/{width}/{base_name}.jpg"
+            target_path = os.path.join(upload_dir, relative_path)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+            # 以点开头的临时文件不会被 /uploads 对外提供，写完后再原子替换；
+            # 同一内容可能同时有多个生成任务，临时文件名带随机部分，互不覆盖
+            temp_path = os.path.join(os.path.dirname(target_path), f".{base_name}.{uuid.uuid4().hex}.jpg.part")
+            try:
+                image.resize((width, height), Image.LANCZOS).save(
+                    temp_path, "JPEG", quality=quality, optimize=True, progressive=True
+                )
+                os.replace(temp_path, target_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            variants[str(width)] = relative_path
+
+    return variants
+
+
+class ThumbnailPipeline:
+    """缩略图后台生成管道"""
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks = set()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def _run(self, upload_dir: str, file_path: str) -> Dict[str, str]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(),
+            generate_thumbnails,
+            upload_dir,
+            file_path,
+            tuple(settings.thumbnail_widths),
+            settings.thumbnail_quality
+        )
+
+    async def generate(self, file_path: str) -> Dict[str, str]:
+        """在进程池中生成缩略图并返回各尺寸路径"""
+        if storage.local_path(file_path) is not None:
+            return await self._run(settings.upload_dir, file_path)
+
+        with tempfile.TemporaryDirectory(dir=settings.upload_dir, prefix=".thumbnails-") as work_dir:
+            await storage.download_to(file_path, os.path.join(work_dir, file_path))
+            variants = await self._run(work_dir, file_path)
+            for relative_path in variants.values():
+                await storage.put(relative_path, os.path.join(work_dir, relative_path))
+        return variants
+
+    async def _process(self, media_id: int, file_path: str, content_hash: str):
+        try:
+            variants = await self.generate(file_path)
+        except Exception as e:
+            logger.warning(f"生成缩略图失败 (media_id={media_id}): {e}")
+            return
+
+        # 与删除媒体使用同一把锁，避免缩略图写在最后一个引用删除之后而无人引用
+        async with blob_store.lock(content_hash):
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    update(MediaItem).where(MediaItem.id == media_id).values(thumbnails=variants)
+                )
+                referenced = await db.scalar(
+                    select(MediaBlob.content_hash).where(
+                        MediaBlob.content_hash == content_hash, MediaBlob.ref_count > 0
+                    )
+                )
+                await db.commit()
+            if not result.rowcount and referenced is None:
+                await blob_store.remove_files(variants.values())
+
+    def schedule(self, media_id: int, file_path: str, content_hash: str):
+        """提交后台缩略图任务，不等待结果"""
+        task = asyncio.create_task(self._process(media_id, file_path, content_hash))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def shutdown(self):
+        """等待进行中的任务结束并关闭进程池"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# 全局缩略图管道
+thumbnail_pipeline = ThumbnailPipeline(workers=settings.thumbnail_workers)
@@ -0,0 +1,112 @@
+"""
+上传文件的流式写入
+
+multipart 请求体在进入处理函数之前已由 Starlette 解析并缓存到临时文件，
+处理函数中的大小检查无法阻止超大的请求占用带宽和磁盘，因此分两层限制：
+- UploadSizeLimitMiddleware 在接收请求体时限制上传接口的总字节数：
+  Content-Length 超限时不读取请求体直接返回413，没有 Content-Length 时按已接收的字节数中止
+- save_upload_file 按固定大小的分块读取单个文件，写入同目录下的临时文件，
+  边写边检查大小（可选地同时计算哈希），成功后原子地重命名到目标路径。整个过程中内存占用只有一个分块
+"""
+
+import asyncio
+import os
+import uuid
+from typing import Dict, Tuple
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, UploadFile, status
+from starlette.responses import JSONResponse
+
+# 每次读取/写入的分块大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+async def save_upload_file(
+    file: UploadFile,
+    directory: str,
+    filename: str,
+    max_size: int,
+    too_large_detail: str = "文件大小超过限制",
+    hasher=None
+) -> int:
+    """
+    将上传文件流式保存到 directory/filename，返回实际写入的字节数
+    - 超过 max_size 时立即中止并删除临时文件（请求体整体的大小由 UploadSizeLimitMiddleware 限制）
+    - 不依赖客户端提供的 file.size
+    - 传入 hasher（如 hashlib.sha256()）时边写边更新哈希
+    """
+    # 客户端声明了大小时提前拒绝，省去无用的读写
+    if file.size is not None and file.size > max_size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=too_large_detail)
+
+    os.makedirs(directory, exist_ok=True)
+    final_path = os.path.join(directory, filename)
+    temp_path = os.path.join(directory, f".{uuid.uuid4().hex}.part")
+
+    written = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as buffer:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_size:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=too_large_detail)
+                if hasher is not None:
+                    # hashlib 处理大块数据时会释放GIL，放到线程中不阻塞事件循环
+                    await asyncio.to_thread(hasher.update, chunk)
+                await buffer.write(chunk)
+        await aiofiles.os.replace(temp_path, final_path)
+    except BaseException:
+        try:
+            await aiofiles.os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return written
+
+
+# multipart 中文件以外的部分（分隔符、各部分的头、表单字段）预留的字节数
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """
+    限制上传接口请求体大小的ASGI中间件
+    limits: {路径: (最大字节数, 超限时的提示)}，只对这些路径的 POST 请求生效
+    """
+
+    def __init__(self, app, limits: Dict[str, Tuple[int, str]]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        max_size, detail = limit
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_size:
+            # 不读取请求体，客户端不必把整个文件发送完
+            response = JSONResponse({"detail": detail}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    # 在解析请求体时抛出，由 FastAPI 转换为413响应
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+            return message
+
+        await self.app(scope, receive_limited, send)
@@ -0,0 +1,110 @@
+"""
+媒体浏览次数的写回缓冲
+
+详情页每次访问只在内存中累加，后台任务定期把各媒体的增量合并成一批
+UPDATE ... SET views_count = views_count + :delta 语句提交，避免每次读取都开启写事务，
+也避免在Python中读-改-写导致的并发丢失。应用关闭时会执行最后一次写回。
+"""
+
+import asyncio
+import logging
+from typing import Dict, Optional
+from sqlalchemy import bindparam, func
+from .config import settings
+from .database import AsyncSessionLocal
+from .models import MediaItem
+
+logger = logging.getLogger(__name__)
+
+media_items_table = MediaItem.__table__
+
+# 按主键原子地累加浏览次数（executemany）
+increment_views_statement = (
+    media_items_table.update()
+    .where(media_items_table.c.id == bindparam("media_id"))
+    .values(views_count=func.coalesce(media_items_table.c.views_count, 0) + bindparam("delta"))
+)
+
+
+class ViewCounter:
+    """浏览次数累加器"""
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.flushed_views = 0
+        self.flush_count = 0
+
+    def increment(self, media_id: int, count: int = 1):
+        """记录一次浏览"""
+        self._pending[media_id] = self._pending.get(media_id, 0) + count
+
+    def pending(self, media_id: int) -> int:
+        """获取尚未写回数据库的浏览次数"""
+        return self._pending.get(media_id, 0)
+
+    async def flush(self) -> int:
+        """把累积的增量写回数据库，返回写回的浏览次数"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            # 在同一事件循环内交换缓冲区，之后的浏览计入新的缓冲区
+            deltas, self._pending = self._pending, {}
+
+            # 按主键排序，多个进程同时写回时加锁顺序一致
+            params = [
+                {"media_id": media_id, "delta": delta}
+                for media_id, delta in sorted(deltas.items())
+            ]
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(increment_views_statement, params)
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"写回浏览次数失败: {e}")
+                # 放回缓冲区，下次重试
+                for media_id, delta in deltas.items():
+                    self.increment(media_id, delta)
+                return 0
+
+            total = sum(deltas.values())
+            self.flushed_views += total
+            self.flush_count += 1
+            return total
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """启动后台定时写回任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务并写回剩余的浏览次数"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def metrics(self) -> dict:
+        """获取写回指标"""
+        return {
+            "flush_interval_seconds": self.flush_interval,
+            "pending_items": len(self._pending),
+            "pending_views": sum(self._pending.values()),
+            "flushed_views": self.flushed_views,
+            "flush_count": self.flush_count,
+        }
+
+
+# 全局浏览次数累加器
+view_counter = ViewCounter(flush_interval=settings.view_count_flush_interval)
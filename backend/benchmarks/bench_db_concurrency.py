@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+数据库并发基准测试 - 对比同步会话（改造前）与异步会话（改造后）
+
+模拟N个并发请求各自执行媒体列表查询：
+- sync:  在协程中直接使用同步 SessionLocal，查询期间阻塞事件循环（改造前路由的行为）
+- async: 使用 AsyncSession，查询期间事件循环可以继续处理其他请求
+
+同时运行一个心跳协程测量事件循环延迟，延迟越大说明其他请求被阻塞得越久。
+
+用法:
+    python benchmarks/bench_db_concurrency.py --concurrency 50 --requests 1000 --latency-ms 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker, selectinload
+
+from app.database import get_async_database_url
+from app.models import Base, User, Activity, MediaItem
+
+
+def register_latency_function(engine, latency_ms: float):
+    """为SQLite注册 simulated_latency() 函数，模拟网络数据库的往返延迟"""
+
+    def sleep_ms():
+        time.sleep(latency_ms / 1000)
+        return 1
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function("simulated_latency", 0, sleep_ms)
+
+
+def seed_database(database_url: str, media_count: int):
+    """创建表并写入测试数据"""
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        if db.query(MediaItem).count() >= media_count:
+            return
+        user = User(username="bench", email="bench@example.com", hashed_password="x", full_name="Bench")
+        db.add(user)
+        db.flush()
+        activity = Activity(title="基准测试活动", creator_id=user.id)
+        db.add(activity)
+        db.flush()
+        for i in range(media_count):
+            db.add(MediaItem(
+                filename=f"{i}.jpg",
+                original_filename=f"{i}.jpg",
+                file_path=f"photos/{i}.jpg",
+                media_type="photo",
+                activity_id=activity.id,
+                uploader_id=user.id
+            ))
+        db.commit()
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def build_query(use_latency: bool):
+    """与媒体列表路由相同形状的查询"""
+    query = select(MediaItem).options(
+        selectinload(MediaItem.uploader),
+        selectinload(MediaItem.activity).selectinload(Activity.creator),
+    ).limit(20)
+    if use_latency:
+        # 非关联子查询只会执行一次，即每条语句一次往返延迟
+        query = query.where(select(func.simulated_latency()).scalar_subquery() == 1)
+    return query
+
+
+async def heartbeat(stop: asyncio.Event, lags: list, interval: float = 0.005):
+    """测量事件循环延迟"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run_sync_mode(database_url, concurrency, total, latency_ms):
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    if latency_ms:
+        register_latency_function(engine, latency_ms)
+    Session = sessionmaker(bind=engine)
+    query = build_query(bool(latency_ms))
+    latencies = []
+
+    async def worker(count):
+        for _ in range(count):
+            started = time.perf_counter()
+            db = Session()
+            try:
+                db.scalars(query).all()
+            finally:
+                db.close()
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0)
+
+    try:
+        return await run_workers(worker, concurrency, total, latencies)
+    finally:
+        engine.dispose()
+
+
+async def run_async_mode(database_url, concurrency, total, latency_ms):
+    engine = create_async_engine(get_async_database_url(database_url))
+    if latency_ms:
+        register_latency_function(engine.sync_engine, latency_ms)
+    Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    query = build_query(bool(latency_ms))
+    latencies = []
+
+    async def worker(count):
+        for _ in range(count):
+            started = time.perf_counter()
+            async with Session() as db:
+                (await db.scalars(query)).all()
+            latencies.append(time.perf_counter() - started)
+
+    try:
+        return await run_workers(worker, concurrency, total, latencies)
+    finally:
+        await engine.dispose()
+
+
+async def run_workers(worker, concurrency, total, latencies):
+    stop = asyncio.Event()
+    lags = []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    per_worker = max(1, total // concurrency)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(per_worker) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await beat
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "loop_lag_max_ms": max(lags, default=0) * 1000,
+    }
+
+
+def print_result(mode, result):
+    print(
+        f"{mode:>6} | {result['requests']:>6} 请求 | {result['elapsed_s']:7.2f}s | "
+        f"{result['throughput_rps']:8.1f} req/s | p50 {result['p50_ms']:7.2f}ms | "
+        f"p95 {result['p95_ms']:7.2f}ms | 事件循环最大延迟 {result['loop_lag_max_ms']:7.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="同步/异步数据库会话并发基准测试")
+    parser.add_argument("--database-url", help="数据库URL（默认使用临时SQLite文件）")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发请求数")
+    parser.add_argument("--requests", type=int, default=1000, help="总请求数")
+    parser.add_argument("--media", type=int, default=200, help="写入的媒体记录数")
+    parser.add_argument("--latency-ms", type=float, default=0,
+                        help="为SQLite模拟的每次查询延迟（毫秒），用于近似网络数据库")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    if args.latency_ms and not database_url.startswith("sqlite"):
+        parser.error("--latency-ms 仅支持SQLite")
+
+    seed_database(database_url, args.media)
+    print(f"数据库: {database_url}  并发: {args.concurrency}  请求: {args.requests}")
+
+    print_result("sync", asyncio.run(run_sync_mode(database_url, args.concurrency, args.requests, args.latency_ms)))
+    print_result("async", asyncio.run(run_async_mode(database_url, args.concurrency, args.requests, args.latency_ms)))
+
+
+if __name__ == "__main__":
+    main()
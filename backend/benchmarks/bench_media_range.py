@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+视频 Range 读取基准测试 - 对比 /uploads 的 MediaFiles 与原来的 StaticFiles
+
+模拟N个并发播放器在同一个视频中随机拖动进度，每次请求一个固定大小的字节范围：
+- media:  app/media_files.py 的 MediaFiles，返回206和请求的范围
+- static: Starlette StaticFiles（当前版本忽略 Range），每次都返回完整文件
+
+在进程内通过 ASGI 调用（不经过网络），统计请求吞吐、延迟和实际传输的字节数。
+
+用法:
+    python benchmarks/bench_media_range.py --size-mb 64 --concurrency 32 --requests 500 --range-kb 512
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from starlette.staticfiles import StaticFiles
+
+from app.media_files import MediaFiles
+
+
+async def run_mode(app, name, file_name, size, concurrency, total, range_bytes):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    transferred = 0
+    mismatched = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(random.randrange(0, max(1, size - range_bytes)))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            nonlocal transferred, mismatched
+            while True:
+                try:
+                    start = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                end = start + range_bytes - 1
+                began = time.perf_counter()
+                response = await client.get(f"/{file_name}", headers={"Range": f"bytes={start}-{end}"})
+                latencies.append((time.perf_counter() - began) * 1000)
+                transferred += len(response.content)
+                if response.status_code != 206:
+                    mismatched += 1
+
+        began = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - began
+
+    latencies.sort()
+    print(
+        f"{name:<7} {total / elapsed:8.1f} req/s  "
+        f"p50 {statistics.median(latencies):7.1f}ms  p95 {latencies[int(len(latencies) * 0.95) - 1]:7.1f}ms  "
+        f"传输 {transferred / 1024 / 1024:9.1f} MB  非206响应 {mismatched}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="视频 Range 读取基准测试")
+    parser.add_argument("--size-mb", type=int, default=64, help="测试视频大小（MB）")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发播放器数")
+    parser.add_argument("--requests", type=int, default=500, help="总请求数")
+    parser.add_argument("--range-kb", type=int, default=512, help="每次请求的范围大小（KB）")
+    parser.add_argument("--skip-static", action="store_true", help="不测试 StaticFiles（大文件时很慢）")
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    range_bytes = args.range_kb * 1024
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = f"{uuid.uuid4()}.mp4"
+        with open(os.path.join(directory, file_name), "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        print(f"视频 {args.size_mb}MB，并发 {args.concurrency}，请求 {args.requests}，每次 {args.range_kb}KB")
+        asyncio.run(run_mode(
+            MediaFiles(directory), "media", file_name, size, args.concurrency, args.requests, range_bytes
+        ))
+        if not args.skip_static:
+            asyncio.run(run_mode(
+                StaticFiles(directory=directory), "static", file_name, size, args.concurrency, args.requests, range_bytes
+            ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+响应序列化基准测试 - 对比默认的 response_model 序列化与快速JSON模式
+
+从临时SQLite数据库中按路由相同的方式加载媒体列表（ORM对象）和评论树（dict），分别用两种方式编码：
+- pydantic: response_model 校验 + 转换为JSON兼容数据 + 标准库 json 编码（FastAPI默认行为）
+- fast:     按 response_model 字段直接取值 + orjson 编码（app/fast_json.py）
+
+输出每条记录的平均序列化耗时，并检查两种方式输出的JSON内容一致。
+
+用法:
+    python benchmarks/bench_serialization.py --items 500 --rounds 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import get_async_database_url
+from app.fast_json import build_serializer, dumps, orjson
+from app.models import Comment, MediaItem, User
+from app.routers.comments import load_comment_threads
+from app.routers.media import media_load_options
+from app.schemas import Comment as CommentSchema, MediaItem as MediaItemSchema
+from bench_db_concurrency import seed_database
+
+
+def seed_comments(database_url: str, root_count: int):
+    """为第一个媒体写入 root_count 条顶级评论，每条带两条回复"""
+    engine = create_engine(database_url)
+    db = sessionmaker(bind=engine)()
+    try:
+        user = db.scalar(select(User))
+        media = db.scalar(select(MediaItem))
+        for i in range(root_count):
+            root = Comment(content=f"评论 {i} " * 5, media_item_id=media.id, author_id=user.id)
+            db.add(root)
+            db.flush()
+            for j in range(2):
+                db.add(Comment(content=f"回复 {i}-{j}", media_item_id=media.id, author_id=user.id, parent_id=root.id))
+        db.commit()
+        return media.id
+    finally:
+        db.close()
+        engine.dispose()
+
+
+async def load_rows(database_url: str, media_id: int):
+    engine = create_async_engine(get_async_database_url(database_url))
+    Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with Session() as db:
+        media_items = (await db.scalars(select(MediaItem).options(*media_load_options))).all()
+        root_ids = select(Comment.id).where(Comment.media_item_id == media_id, Comment.parent_id.is_(None))
+        comments = await load_comment_threads(db, root_ids, 5, 20)
+    await engine.dispose()
+    return media_items, comments
+
+
+def pydantic_encode(adapter: TypeAdapter, rows) -> bytes:
+    content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def fast_encode(serializer, rows) -> bytes:
+    return dumps(serializer(rows))
+
+
+def measure(func, rows, rounds: int) -> float:
+    """返回每条记录的平均耗时（微秒）"""
+    func(rows)  # 预热
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(rows)
+    return (time.perf_counter() - start) / rounds / len(rows) * 1e6
+
+
+def run(name: str, schema, rows, rounds: int):
+    adapter = TypeAdapter(List[schema])
+    serializer = build_serializer(List[schema])
+    baseline = pydantic_encode(adapter, rows)
+    fast = fast_encode(serializer, rows)
+    if json.loads(baseline) != json.loads(fast):
+        raise SystemExit(f"❌ {name}: 两种方式的输出不一致")
+
+    slow_us = measure(lambda r: pydantic_encode(adapter, r), rows, rounds)
+    fast_us = measure(lambda r: fast_encode(serializer, r), rows, rounds)
+    print(f"{name:<10} {len(rows):>6} 条  pydantic {slow_us:8.1f} µs/条  fast {fast_us:8.1f} µs/条  "
+          f"提升 {slow_us / fast_us:5.1f}x  ({len(baseline)} -> {len(fast)} 字节)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应序列化基准测试")
+    parser.add_argument("--items", type=int, default=500, help="媒体数量（评论树数量为其一半）")
+    parser.add_argument("--rounds", type=int, default=20, help="每种方式重复编码的轮数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        seed_database(database_url, args.items)
+        media_id = seed_comments(database_url, max(1, args.items // 2))
+        media_items, comments = asyncio.run(load_rows(database_url, media_id))
+
+    print(f"编码器: {'orjson' if orjson is not None else '标准库 json（未安装 orjson）'}")
+    run("MediaItem", MediaItemSchema, media_items, args.rounds)
+    run("Comment", CommentSchema, comments, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
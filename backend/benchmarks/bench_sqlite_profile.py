@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+SQLite 配置基准测试 - 对比默认配置与 SQLite 生产配置（WAL + PRAGMA + 写队列）
+
+N个并发协程混合执行读写：
+- 读: 与媒体列表路由相同形状的查询
+- 写: 插入一条评论并提交
+
+每种配置使用独立的临时数据库文件（journal_mode 会持久化在文件中），
+统计读写吞吐、延迟以及 "database is locked" 等错误次数。
+
+用法:
+    python benchmarks/bench_sqlite_profile.py --concurrency 32 --operations 2000 --write-ratio 0.3
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import exc, select
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+
+from app.database import get_async_database_url
+from app.models import Activity, Comment, MediaItem
+from app.sqlite_profile import SerializedWriteSession, apply_sqlite_pragmas, sqlite_pragmas, write_queue
+from bench_db_concurrency import seed_database
+
+
+async def run_mode(database_url, profile, concurrency, total, write_ratio):
+    if profile:
+        engine = create_async_engine(
+            get_async_database_url(database_url),
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=concurrency
+        )
+        apply_sqlite_pragmas(engine.sync_engine, sqlite_pragmas())
+    else:
+        # aiosqlite 默认使用 NullPool，每个会话都新建连接
+        engine = create_async_engine(get_async_database_url(database_url))
+    Session = async_sessionmaker(
+        bind=engine,
+        class_=SerializedWriteSession if profile else AsyncSession,
+        expire_on_commit=False
+    )
+    read_query = select(MediaItem).options(
+        selectinload(MediaItem.uploader),
+        selectinload(MediaItem.activity).selectinload(Activity.creator),
+    ).limit(20)
+    results = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0}
+    rng = random.Random(42)
+
+    async def worker(count):
+        for _ in range(count):
+            kind = "write" if rng.random() < write_ratio else "read"
+            started = time.perf_counter()
+            try:
+                async with Session() as db:
+                    if kind == "read":
+                        (await db.scalars(read_query)).all()
+                    else:
+                        db.add(Comment(content="基准测试评论", media_item_id=1, author_id=1))
+                        await db.commit()
+            except exc.OperationalError:
+                errors[kind] += 1
+                continue
+            results[kind].append(time.perf_counter() - started)
+
+    per_worker = max(1, total // concurrency)
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker(per_worker) for _ in range(concurrency)))
+    finally:
+        await engine.dispose()
+    elapsed = time.perf_counter() - started
+
+    summary = {"elapsed_s": elapsed}
+    for kind, latencies in results.items():
+        latencies.sort()
+        summary[kind] = {
+            "count": len(latencies),
+            "errors": errors[kind],
+            "ops": len(latencies) / elapsed,
+            "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+            "p95_ms": latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000 if latencies else 0.0,
+        }
+    return summary
+
+
+def print_result(mode, result):
+    for kind in ("read", "write"):
+        stats = result[kind]
+        print(
+            f"{mode:>8} {kind:>5} | {stats['count']:>6} 次 | {stats['ops']:8.1f} ops/s | "
+            f"p50 {stats['p50_ms']:8.2f}ms | p95 {stats['p95_ms']:8.2f}ms | 错误 {stats['errors']}"
+        )
+    print(f"{mode:>8} 总耗时 {result['elapsed_s']:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite默认配置与生产配置的读写吞吐对比")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发协程数")
+    parser.add_argument("--operations", type=int, default=2000, help="总操作数")
+    parser.add_argument("--write-ratio", type=float, default=0.3, help="写操作占比")
+    parser.add_argument("--media", type=int, default=200, help="写入的媒体记录数")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    print(f"并发: {args.concurrency}  操作: {args.operations}  写占比: {args.write_ratio}")
+    for mode, profile in (("default", False), ("profile", True)):
+        database_url = f"sqlite:///{os.path.join(directory, f'{mode}.db')}"
+        seed_database(database_url, args.media)
+        result = asyncio.run(run_mode(database_url, profile, args.concurrency, args.operations, args.write_ratio))
+        print_result(mode, result)
+    print(f"写队列: {write_queue.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
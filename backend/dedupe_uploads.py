@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+上传文件去重 - 把内容寻址存储之前上传的媒体文件迁移到 blobs/ 下
+
+对 content_hash 为空的 MediaItem 逐条计算文件的 SHA-256：
+- 第一次出现的内容：文件移动到 blobs/ab/cd/<哈希>.<扩展名>，新建 media_blobs 记录
+- 重复的内容：记录指向已有文件，引用数加一，删除重复的文件（已有缩略图时一并复用）
+最后列出 uploads/photos、uploads/videos 中没有任何记录引用的文件。
+
+运行前请停止后端服务（上传/删除与本脚本之间没有加锁）。只适用于本地存储（STORAGE_BACKEND=local）。
+
+用法:
+    python dedupe_uploads.py --dry-run          # 只统计，不修改文件和数据库
+    python dedupe_uploads.py
+    python dedupe_uploads.py --delete-orphans   # 同时删除没有记录引用的文件
+"""
+
+import argparse
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select
+
+from app.blob_store import blob_relative_path, hash_file
+from app.config import settings
+from app.database import SessionLocal
+from app.migrations import run_migrations
+from app.models import MediaBlob, MediaItem
+
+LEGACY_DIRS = ("photos", "videos")
+
+
+def remove_quietly(relative_paths):
+    for relative_path in relative_paths:
+        try:
+            os.remove(os.path.join(settings.upload_dir, relative_path))
+        except FileNotFoundError:
+            pass
+
+
+def dedupe_media(dry_run: bool):
+    """把未去重的媒体记录迁移到内容寻址存储，返回统计信息"""
+    stats = {"processed": 0, "blobs": 0, "duplicates": 0, "missing": 0, "saved_bytes": 0}
+    seen = {}  # 仅 dry-run 使用：哈希 -> 第一次出现的路径
+    db = SessionLocal()
+    try:
+        item_ids = db.scalars(
+            select(MediaItem.id).where(MediaItem.content_hash.is_(None)).order_by(MediaItem.id)
+        ).all()
+        for item_id in item_ids:
+            item = db.get(MediaItem, item_id)
+            source = os.path.join(settings.upload_dir, item.file_path)
+            if not os.path.isfile(source):
+                print(f"⚠️ 文件不存在，跳过: media_id={item.id} {item.file_path}")
+                stats["missing"] += 1
+                continue
+
+            content_hash, size = hash_file(source)
+            stats["processed"] += 1
+            blob = db.get(MediaBlob, content_hash)
+            duplicate = blob is not None or content_hash in seen
+
+            if dry_run:
+                if duplicate:
+                    stats["duplicates"] += 1
+                    stats["saved_bytes"] += size
+                    print(f"重复: {item.file_path} == {blob.file_path if blob else seen[content_hash]}")
+                else:
+                    stats["blobs"] += 1
+                    seen[content_hash] = item.file_path
+                continue
+
+            moved_to = None
+            stale_files = []
+            if blob is None:
+                blob = MediaBlob(
+                    content_hash=content_hash,
+                    file_path=blob_relative_path(content_hash, os.path.splitext(item.file_path)[1]),
+                    file_size=size,
+                    ref_count=1
+                )
+                db.add(blob)
+                target = os.path.join(settings.upload_dir, blob.file_path)
+                if os.path.exists(target):
+                    # 之前中断的运行已经移动过相同内容
+                    stale_files.append(item.file_path)
+                else:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(source, target)
+                    moved_to = target
+                stats["blobs"] += 1
+            else:
+                blob.ref_count += 1
+                stale_files.append(item.file_path)
+                # 复用同一内容已有的缩略图，删除本条记录自己的缩略图
+                thumbnails = db.scalar(
+                    select(MediaItem.thumbnails)
+                    .where(MediaItem.content_hash == content_hash, MediaItem.thumbnails.is_not(None))
+                    .limit(1)
+                )
+                if thumbnails:
+                    stale_files.extend(
+                        path for path in (item.thumbnails or {}).values() if path not in thumbnails.values()
+                    )
+                    item.thumbnails = thumbnails
+                stats["duplicates"] += 1
+                stats["saved_bytes"] += size
+
+            item.file_path = blob.file_path
+            item.filename = os.path.basename(blob.file_path)
+            item.file_size = size
+            item.content_hash = content_hash
+            try:
+                db.commit()
+            except Exception:
+                db.rollback()
+                if moved_to is not None:
+                    os.replace(moved_to, source)
+                raise
+            remove_quietly(stale_files)
+    finally:
+        db.close()
+    return stats
+
+
+def find_orphans():
+    """photos/ 和 videos/ 下没有任何记录引用的文件"""
+    db = SessionLocal()
+    try:
+        referenced = set(db.scalars(select(MediaItem.file_path)).all())
+    finally:
+        db.close()
+
+    orphans = []
+    for directory in LEGACY_DIRS:
+        root = os.path.join(settings.upload_dir, directory)
+        if not os.path.isdir(root):
+            continue
+        for name in sorted(os.listdir(root)):
+            relative_path = f"{directory}/{name}"
+            if os.path.isfile(os.path.join(root, name)) and relative_path not in referenced:
+                orphans.append(relative_path)
+    return orphans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上传文件去重")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不修改文件和数据库")
+    parser.add_argument("--delete-orphans", action="store_true", help="删除没有记录引用的旧文件")
+    args = parser.parse_args()
+
+    if settings.storage_backend != "local":
+        print(f"❌ 只支持本地存储，当前为 {settings.storage_backend}")
+        sys.exit(1)
+
+    run_migrations()
+    print("🔄 开始去重上传文件..." if not args.dry_run else "🔍 统计重复的上传文件（dry-run）...")
+    stats = dedupe_media(args.dry_run)
+    print(
+        f"处理 {stats['processed']} 个文件：独立内容 {stats['blobs']}，重复 {stats['duplicates']}，"
+        f"缺失 {stats['missing']}，节省 {stats['saved_bytes'] / 1024 / 1024:.1f} MB"
+    )
+
+    orphans = find_orphans()
+    if orphans:
+        print(f"没有记录引用的文件 {len(orphans)} 个:")
+        for relative_path in orphans:
+            print(f"  {relative_path}")
+        if args.delete_orphans and not args.dry_run:
+            remove_quietly(orphans)
+            print("🗑️ 已删除")
+    print("✅ 完成")
+
+
+if __name__ == "__main__":
+    main()
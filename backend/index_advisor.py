@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+索引顾问 - 对各路由实际发出的查询执行 EXPLAIN，标记全表扫描
+
+直接调用各路由的只读处理函数，捕获它们执行的每条SQL，
+在同一连接上执行 EXPLAIN（SQLite 为 EXPLAIN QUERY PLAN），
+若查询计划中出现对业务表的全表扫描或额外排序则给出提示。
+
+建议在数据量接近生产环境的数据库上运行，空表上的查询计划参考价值有限。
+
+用法:
+    python index_advisor.py
+    python index_advisor.py --verbose   # 输出完整查询计划
+"""
+
+import argparse
+import asyncio
+import inspect
+import os
+import re
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import HTTPException, Request, Response
+from fastapi.params import Depends, Param
+from sqlalchemy import event, select
+
+from app.database import async_engine, AsyncSessionLocal
+from app.models import Base, User, Activity, MediaItem, Comment
+from app.routers import users, activities, media, comments, notifications
+
+# 业务表名，用于区分对CTE/临时表的扫描
+TABLE_NAMES = set(Base.metadata.tables)
+
+
+# 按设计无法用索引避免的问题：统计接口聚合整张表（结果有TTL缓存），
+# 评论线程对递归CTE的结果排序。这些只做提示，不计入问题数
+EXPECTED_PROBLEMS = {
+    "users.get_user_stats": {"全表扫描 users"},
+    "media.get_media_stats": {"全表扫描 media_items"},
+    "comments.get_media_comments": {"排序未使用索引"},
+    "comments.get_comment": {"排序未使用索引"},
+}
+
+
+def build_checks(sample):
+    """要检查的路由调用：(名称, 处理函数, 参数)"""
+    return [
+        ("users.get_all_users", users.get_all_users, {}),
+        ("users.get_user_by_id", users.get_user_by_id, {"user_id": sample["user_id"]}),
+        ("users.get_user_stats", users.get_user_stats, {}),
+        ("activities.get_activities", activities.get_activities, {}),
+        ("activities.get_activity", activities.get_activity, {"activity_id": sample["activity_id"]}),
+        ("activities.get_activity_stats", activities.get_activity_stats, {}),
+        ("media.get_media_items", media.get_media_items, {}),
+        ("media.get_media_items(activity_id)", media.get_media_items, {"activity_id": sample["activity_id"]}),
+        ("media.get_media_items(activity_id, media_type)", media.get_media_items,
+         {"activity_id": sample["activity_id"], "media_type": "photo"}),
+        ("media.get_media_item", media.get_media_item, {"media_id": sample["media_id"]}),
+        ("media.get_media_stats", media.get_media_stats, {}),
+        ("comments.get_media_comments", comments.get_media_comments, {"media_id": sample["media_id"]}),
+        ("comments.get_comment", comments.get_comment, {"comment_id": sample["comment_id"]}),
+        ("notifications.get_user_notifications", notifications.get_user_notifications, {}),
+        ("notifications.get_user_notifications(unread_only)", notifications.get_user_notifications,
+         {"unread_only": True}),
+        ("notifications.get_notification_stats", notifications.get_notification_stats, {}),
+    ]
+
+
+def explain_prefix():
+    if async_engine.dialect.name == "sqlite":
+        return "EXPLAIN QUERY PLAN "
+    return "EXPLAIN "
+
+
+def find_problems(plan_lines):
+    """从查询计划中找出全表扫描和临时排序"""
+    problems = []
+    for line in plan_lines:
+        # SQLite: "SCAN media_items"（不含 USING INDEX 时为全表扫描）
+        match = re.search(r"\bSCAN (?:TABLE )?(\w+)", line)
+        if match and match.group(1) in TABLE_NAMES and "USING" not in line:
+            problems.append(f"全表扫描 {match.group(1)}")
+        # PostgreSQL: "Seq Scan on media_items"
+        match = re.search(r"Seq Scan on (\w+)", line)
+        if match and match.group(1) in TABLE_NAMES:
+            problems.append(f"全表扫描 {match.group(1)}")
+        if "USE TEMP B-TREE FOR ORDER BY" in line:
+            problems.append("排序未使用索引")
+    return problems
+
+
+def fill_arguments(handler, db, current_user, overrides):
+    """按处理函数签名补齐参数：查询参数使用默认值，依赖使用传入的会话和用户"""
+    arguments = {}
+    for name, parameter in inspect.signature(handler).parameters.items():
+        if name in overrides:
+            arguments[name] = overrides[name]
+        elif name == "db":
+            arguments[name] = db
+        elif name == "current_user":
+            arguments[name] = current_user
+        elif parameter.annotation is Response:
+            arguments[name] = Response()
+        elif parameter.annotation is Request:
+            arguments[name] = Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+        elif isinstance(parameter.default, Param):
+            arguments[name] = parameter.default.default
+        elif isinstance(parameter.default, Depends):
+            arguments[name] = None
+        else:
+            arguments[name] = parameter.default
+    return arguments
+
+
+async def load_sample():
+    """取一组已存在的记录ID作为调用参数"""
+    async with AsyncSessionLocal() as db:
+        return {
+            "user_id": await db.scalar(select(User.id).limit(1)) or 1,
+            "activity_id": await db.scalar(select(Activity.id).limit(1)) or 1,
+            "media_id": await db.scalar(select(MediaItem.id).limit(1)) or 1,
+            "comment_id": await db.scalar(select(Comment.id).limit(1)) or 1,
+        }
+
+
+async def run(verbose: bool):
+    sample = await load_sample()
+    prefix = explain_prefix()
+    captured = []
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def _explain(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return
+        cursor.execute(prefix + statement, parameters)
+        plan = [" ".join(str(value) for value in row) for row in cursor.fetchall()]
+        captured.append((statement, plan))
+
+    total_problems = 0
+    current_user = User(id=sample["user_id"], role="admin", is_active=True)
+    for name, handler, overrides in build_checks(sample):
+        captured.clear()
+        # 每个路由使用独立的会话，避免命中上一次调用留下的对象而少发查询
+        async with AsyncSessionLocal() as db:
+            try:
+                await handler(**fill_arguments(handler, db, current_user, overrides))
+            except HTTPException:
+                pass
+
+        print(f"\n== {name} ({len(captured)} 条查询)")
+        expected = EXPECTED_PROBLEMS.get(name, set())
+        for statement, plan in captured:
+            problems = find_problems(plan)
+            unexpected = [problem for problem in problems if problem not in expected]
+            total_problems += len(unexpected)
+            summary = " ".join(statement.split())
+            print(f"  {'⚠️ ' if unexpected else '✅'} {summary[:120]}{'...' if len(summary) > 120 else ''}")
+            for problem in problems:
+                print(f"      -> {problem}{'' if problem in unexpected else '（预期）'}")
+            if verbose:
+                for line in plan:
+                    print(f"         {line}")
+
+    event.remove(async_engine.sync_engine, "before_cursor_execute", _explain)
+    await async_engine.dispose()
+    print(f"\n共发现 {total_problems} 处潜在问题")
+    return total_problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对各路由的查询执行EXPLAIN并标记全表扫描")
+    parser.add_argument("--verbose", action="store_true", help="输出完整查询计划")
+    args = parser.parse_args()
+    problems = asyncio.run(run(args.verbose))
+    sys.exit(1 if problems else 0)
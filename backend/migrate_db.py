@@ -1,58 +1,34 @@
 #!/usr/bin/env python3
 """
-数据库迁移脚本 - 添加新的用户字段
+数据库迁移脚本 - 执行 app/migrations.py 中尚未执行的迁移
 """
 
 import sys
 import os
-from sqlalchemy import text, inspect
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app.database import engine, SessionLocal
+from app.database import engine
 from app.models import Base
-
-def check_column_exists(table_name, column_name):
-    """检查表中是否存在指定列"""
-    inspector = inspect(engine)
-    columns = inspector.get_columns(table_name)
-    return any(col['name'] == column_name for col in columns)
+from app.migrations import LATEST_VERSION, get_current_version, run_migrations, version_metadata
 
 def migrate_database():
     """执行数据库迁移"""
     print("🔄 开始数据库迁移...")
+    print(f"当前版本: {get_current_version() or 0}，最新版本: {LATEST_VERSION}")
     
-    db = SessionLocal()
     try:
-        # 检查并添加新字段
-        new_fields = [
-            ('gender', 'VARCHAR(10)'),
-            ('birthday', 'DATETIME'),
-            ('interests', 'TEXT'),
-            ('address', 'VARCHAR(200)'),
-            ('emergency_contact', 'VARCHAR(100)'),
-            ('emergency_phone', 'VARCHAR(20)')
-        ]
-        
-        for field_name, field_type in new_fields:
-            if not check_column_exists('users', field_name):
-                print(f"添加字段: {field_name}")
-                sql = f"ALTER TABLE users ADD COLUMN {field_name} {field_type}"
-                db.execute(text(sql))
-                db.commit()
-                print(f"✅ 字段 {field_name} 添加成功")
-            else:
-                print(f"⏭️ 字段 {field_name} 已存在，跳过")
-        
+        applied = run_migrations()
+        for description in applied:
+            print(f"✅ 已执行迁移 {description}")
+        if not applied:
+            print("⏭️ 数据库已是最新版本，跳过")
         print("✅ 数据库迁移完成！")
         
     except Exception as e:
         print(f"❌ 数据库迁移失败: {e}")
-        db.rollback()
         raise
-    finally:
-        db.close()
 
 def reset_database():
     """重置数据库（危险操作，仅用于开发环境）"""
@@ -62,7 +38,8 @@ def reset_database():
     if response == 'YES':
         print("🔄 重置数据库...")
         Base.metadata.drop_all(bind=engine)
-        Base.metadata.create_all(bind=engine)
+        version_metadata.drop_all(bind=engine)
+        run_migrations()
         print("✅ 数据库重置完成！")
         
         # 重新初始化数据
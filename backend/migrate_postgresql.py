@@ -5,13 +5,13 @@ PostgreSQL数据库迁移脚本 - Railway生产环境
 
 import sys
 import os
-from sqlalchemy import text, inspect, create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text, create_engine
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.config import settings
+from app.migrations import LATEST_VERSION, get_current_version, run_migrations
 
 def get_database_engine():
     """获取数据库引擎"""
@@ -23,16 +23,6 @@ def get_database_engine():
     
     return create_engine(database_url)
 
-def check_column_exists(engine, table_name, column_name):
-    """检查表中是否存在指定列"""
-    try:
-        inspector = inspect(engine)
-        columns = inspector.get_columns(table_name)
-        return any(col['name'] == column_name for col in columns)
-    except Exception as e:
-        print(f"检查列时出错: {e}")
-        return False
-
 def migrate_postgresql():
     """执行PostgreSQL数据库迁移"""
     print("🔄 开始PostgreSQL数据库迁移...")
@@ -40,39 +30,16 @@ def migrate_postgresql():
     try:
         engine = get_database_engine()
         print(f"数据库连接: {engine.url}")
+        print(f"当前版本: {get_current_version(engine) or 0}，最新版本: {LATEST_VERSION}")
         
-        # 创建会话
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        db = SessionLocal()
-        
-        # 要添加的新字段
-        new_fields = [
-            ('gender', 'VARCHAR(10)'),
-            ('birthday', 'TIMESTAMP'),
-            ('interests', 'TEXT'),
-            ('address', 'VARCHAR(200)'),
-            ('emergency_contact', 'VARCHAR(100)'),
-            ('emergency_phone', 'VARCHAR(20)')
-        ]
-        
-        for field_name, field_type in new_fields:
-            try:
-                if not check_column_exists(engine, 'users', field_name):
-                    print(f"添加字段: {field_name} ({field_type})")
-                    sql = f"ALTER TABLE users ADD COLUMN {field_name} {field_type}"
-                    db.execute(text(sql))
-                    db.commit()
-                    print(f"✅ 字段 {field_name} 添加成功")
-                else:
-                    print(f"⏭️ 字段 {field_name} 已存在，跳过")
-            except Exception as e:
-                print(f"❌ 添加字段 {field_name} 失败: {e}")
-                db.rollback()
-                # 继续尝试其他字段
-                continue
+        # 多个实例同时执行时由 advisory lock 保证只有一个真正迁移
+        applied = run_migrations(engine)
+        for description in applied:
+            print(f"✅ 已执行迁移 {description}")
+        if not applied:
+            print("⏭️ 数据库已是最新版本，跳过")
         
         print("✅ PostgreSQL数据库迁移完成！")
-        db.close()
         
     except Exception as e:
         print(f"❌ PostgreSQL数据库迁移失败: {e}")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+内容寻址存储测试
+覆盖引用计数与文件的一致性：删除最后一个引用与新上传同一内容交错、同一批中扩展名不同的相同内容、提交失败
+"""
+
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import uuid
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.blob_store import TEMP_DIR, IncomingBlob, blob_relative_path, blob_store
+from app.models import Base, User, Activity, MediaBlob, MediaItem
+from app.routers import media
+from app.storage import LocalStorage
+
+CONTENT = b"same content" * 100
+
+
+def incoming_file(content: bytes, extension: str) -> IncomingBlob:
+    """在暂存目录写一个待入库的临时文件"""
+    temp_path = blob_store.full_path(os.path.join(TEMP_DIR, uuid.uuid4().hex))
+    os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+    with open(temp_path, "wb") as f:
+        f.write(content)
+    return IncomingBlob(
+        temp_path=temp_path, content_hash=hashlib.sha256(content).hexdigest(),
+        size=len(content), extension=extension
+    )
+
+
+def media_fields(user: User, activity: Activity, filename: str) -> dict:
+    # 视频不会触发后台缩略图任务
+    return {
+        "activity_id": activity.id, "title": filename, "description": None,
+        "original_filename": filename, "media_type": "video", "uploader_id": user.id,
+    }
+
+
+async def run_with_store(check):
+    """在临时目录的本地存储和数据库文件上执行 check(session_factory, user, activity, root)"""
+    with tempfile.TemporaryDirectory() as root:
+        original = blob_store.upload_dir, blob_store.backend
+        blob_store.upload_dir, blob_store.backend = root, LocalStorage(root)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(root, 'test.db')}")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+            async with session_factory() as db:
+                user = User(username="owner", email="owner@example.com", hashed_password="x", full_name="上传者", role="admin")
+                db.add(user)
+                await db.flush()
+                activity = Activity(title="活动", creator_id=user.id)
+                db.add(activity)
+                await db.commit()
+            await check(session_factory, user, activity, root)
+        finally:
+            await engine.dispose()
+            blob_store.upload_dir, blob_store.backend = original
+
+
+async def check_delete_races_new_reference(session_factory, user, activity, root):
+    async with session_factory() as db:
+        first = await media.store_media_item(db, incoming_file(CONTENT, ".mp4"), **media_fields(user, activity, "a.mp4"))
+    blob_path = blob_store.full_path(first.file_path)
+    assert os.path.exists(blob_path)
+
+    # 另一个进程上传同一内容：存入文件时发现文件已存在
+    incoming = incoming_file(CONTENT, ".mp4")
+    async with session_factory() as db:
+        paths = await blob_store.blob_paths(db, [incoming])
+        assert not await blob_store.place(incoming, paths[incoming.content_hash])
+
+    # 此时删除最后一个引用，文件随之被删除
+    async with session_factory() as db:
+        await media.delete_media_item(first.id, db=db, current_user=user)
+    assert not os.path.exists(blob_path)
+
+    # 新建记录的一方发现文件已不在存储中，用自己的临时文件重新存入
+    async with session_factory() as db:
+        blob, created = await blob_store.add_reference(db, incoming, paths[incoming.content_hash])
+        assert created
+        assert await blob_store.ensure_stored(incoming, blob.file_path)
+        await db.commit()
+    await blob_store.discard(incoming)
+    assert os.path.exists(blob_path)
+    async with session_factory() as db:
+        assert (await db.get(MediaBlob, incoming.content_hash)).ref_count == 1
+
+
+async def check_batch_duplicate_extensions(session_factory, user, activity, root):
+    uploads = [
+        (incoming_file(CONTENT, ".jpg"), media_fields(user, activity, "a.jpg")),
+        (incoming_file(CONTENT, ".jpeg"), media_fields(user, activity, "a.jpeg")),
+    ]
+    async with session_factory() as db:
+        items = await media.store_media_items(db, uploads)
+    for incoming, _ in uploads:
+        await blob_store.discard(incoming)
+
+    content_hash = hashlib.sha256(CONTENT).hexdigest()
+    assert {item.file_path for item in items} == {blob_relative_path(content_hash, ".jpg")}
+    stored = os.listdir(os.path.dirname(blob_store.full_path(items[0].file_path)))
+    assert stored == [f"{content_hash}.jpg"], f"不应留下无人引用的文件: {stored}"
+    async with session_factory() as db:
+        assert (await db.get(MediaBlob, content_hash)).ref_count == 2
+
+
+async def check_failed_commit_removes_placed_file(session_factory, user, activity, root):
+    incoming = incoming_file(b"never committed", ".mp4")
+    fields = media_fields(user, activity, "x.mp4")
+    fields["original_filename"] = None  # 违反非空约束，提交失败
+    async with session_factory() as db:
+        try:
+            await media.store_media_item(db, incoming, **fields)
+        except Exception:
+            pass
+        else:
+            raise AssertionError("缺少必填字段时应提交失败")
+    await blob_store.discard(incoming)
+
+    assert not os.path.exists(blob_store.full_path(blob_relative_path(incoming.content_hash, ".mp4")))
+    async with session_factory() as db:
+        assert await db.get(MediaBlob, incoming.content_hash) is None
+        assert (await db.scalars(select(MediaItem))).all() == []
+
+
+def test_delete_races_new_reference():
+    """删除最后一个引用与另一个进程的新上传交错时，新记录引用的文件仍在存储中"""
+    asyncio.run(run_with_store(check_delete_races_new_reference))
+
+
+def test_batch_duplicate_extensions():
+    """同一批中内容相同、扩展名不同的文件只保存一份"""
+    asyncio.run(run_with_store(check_batch_duplicate_extensions))
+
+
+def test_failed_commit_removes_placed_file():
+    """提交失败时删除本次新存入的文件，不留下记录"""
+    asyncio.run(run_with_store(check_failed_commit_removes_placed_file))
+
+
+if __name__ == "__main__":
+    test_delete_races_new_reference()
+    test_batch_duplicate_extensions()
+    test_failed_commit_removes_placed_file()
+    print("✅ 内容寻址存储的引用计数与文件保持一致")
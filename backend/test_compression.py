@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+响应压缩测试
+按 Accept-Encoding 协商 brotli / gzip，压缩后的内容可以还原，过小的响应不压缩
+"""
+
+import asyncio
+import gzip
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import brotli
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.compression import CompressionMiddleware
+
+PAYLOAD = [{"id": i, "title": f"活动{i}", "description": "班级活动" * 10} for i in range(100)]
+STREAM_CHUNKS = [("第%d行\n" % i * 50).encode() for i in range(20)]
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+
+@app.get("/items")
+async def items():
+    return PAYLOAD
+
+
+@app.get("/small")
+async def small():
+    return {"ok": True}
+
+
+@app.get("/stream")
+async def stream():
+    async def lines():
+        for chunk in STREAM_CHUNKS:
+            yield chunk
+    return StreamingResponse(lines(), media_type="text/plain")
+
+
+async def get(path: str, accept_encoding: str):
+    """直接调用ASGI应用（不经过会自动解压的HTTP客户端），返回 (响应头, 原始响应体)"""
+    scope = {
+        "type": "http", "method": "GET", "path": path, "root_path": "", "query_string": b"",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+        "scheme": "http", "server": ("testserver", 80), "http_version": "1.1",
+    }
+    messages = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            # 之后的调用是在等待客户端断开，保持挂起
+            await asyncio.Event().wait()
+        requested = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    headers = {name.decode(): value.decode() for name, value in messages[0]["headers"]}
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return headers, body
+
+
+def uncompressed(path: str) -> bytes:
+    return asyncio.run(get(path, "identity"))[1]
+
+
+def test_brotli_preferred():
+    """客户端同时接受 br 和 gzip 时使用 brotli"""
+    headers, body = asyncio.run(get("/items", "gzip, deflate, br"))
+    assert headers["content-encoding"] == "br"
+    assert "Accept-Encoding" in headers["vary"]
+    assert int(headers["content-length"]) == len(body)
+    assert brotli.decompress(body) == uncompressed("/items")
+
+
+def test_gzip_when_brotli_refused():
+    """br 的 q=0 时回退到 gzip"""
+    headers, body = asyncio.run(get("/items", "br;q=0, gzip"))
+    assert headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body) == uncompressed("/items")
+
+
+def test_small_response_not_compressed():
+    headers, body = asyncio.run(get("/small", "br"))
+    assert "content-encoding" not in headers
+    assert body == b'{"ok":true}'
+
+
+def test_streaming_brotli():
+    """流式响应逐块压缩，拼接后可以完整还原"""
+    headers, body = asyncio.run(get("/stream", "br"))
+    assert headers["content-encoding"] == "br"
+    assert "content-length" not in headers
+    assert brotli.decompress(body) == b"".join(STREAM_CHUNKS)
+
+
+if __name__ == "__main__":
+    test_brotli_preferred()
+    test_gzip_when_brotli_refused()
+    test_small_response_not_compressed()
+    test_streaming_brotli()
+    print("✅ 响应压缩按 Accept-Encoding 协商 brotli / gzip")
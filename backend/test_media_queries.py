@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+媒体列表查询次数回归测试
+确保媒体列表和详情接口的SQL语句数量与分页大小无关（无N+1懒加载）
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base, User, Activity, MediaItem
+from app.routers import media
+from app.schemas import MediaItem as MediaItemSchema
+
+MEDIA_COUNT = 100
+
+
+async def seed(session_factory):
+    """写入测试数据：每条媒体记录都有不同的上传者，活动和活动创建者也各不相同"""
+    async with session_factory() as db:
+        users = [
+            User(username=f"user{i}", email=f"user{i}@example.com", hashed_password="x", full_name=f"用户{i}")
+            for i in range(MEDIA_COUNT)
+        ]
+        db.add_all(users)
+        await db.flush()
+
+        activities = [Activity(title=f"活动{i}", creator_id=users[i].id) for i in range(MEDIA_COUNT // 5)]
+        db.add_all(activities)
+        await db.flush()
+
+        db.add_all([
+            MediaItem(
+                filename=f"{i}.jpg",
+                original_filename=f"{i}.jpg",
+                file_path=f"photos/{i}.jpg",
+                media_type="photo",
+                activity_id=activities[i % len(activities)].id,
+                uploader_id=users[(i * 7) % MEDIA_COUNT].id
+            )
+            for i in range(MEDIA_COUNT)
+        ])
+        await db.commit()
+
+
+async def count_queries(page_sizes):
+    """统计不同分页大小下列表接口和详情接口发出的SQL语句数量"""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    await seed(session_factory)
+
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    list_counts = {}
+    for page_size in page_sizes:
+        async with session_factory() as db:
+            statements.clear()
+            items = await media.get_media_items(
+                request=Request({"type": "http", "method": "GET", "path": "/api/media/", "headers": [], "query_string": b""}),
+                response=Response(), skip=0, limit=page_size, cursor=None,
+                activity_id=None, media_type=None, db=db, current_user=None
+            )
+            # 序列化会访问所有嵌套字段，若存在懒加载会在这里抛出异常
+            payload = [MediaItemSchema.model_validate(item) for item in items]
+            assert len(payload) == page_size
+            list_counts[page_size] = len(statements)
+
+    detail_counts = []
+    for media_id in (1, MEDIA_COUNT // 2, MEDIA_COUNT):
+        async with session_factory() as db:
+            statements.clear()
+            item = await media.get_media_item(media_id=media_id, db=db, current_user=None)
+            MediaItemSchema.model_validate(item)
+            detail_counts.append(len(statements))
+
+    await engine.dispose()
+    return list_counts, detail_counts
+
+
+def test_media_queries_constant():
+    """列表查询次数不随分页大小增长，详情查询次数固定"""
+    list_counts, detail_counts = asyncio.run(count_queries([1, 10, MEDIA_COUNT]))
+    assert len(set(list_counts.values())) == 1, f"列表查询次数随分页大小变化: {list_counts}"
+    # 条件GET的验证器查询 + 列表查询
+    assert list_counts[1] == 2, f"列表应只发出2条查询: {list_counts}"
+    assert len(set(detail_counts)) == 1, f"详情查询次数不固定: {detail_counts}"
+
+
+if __name__ == "__main__":
+    list_counts, detail_counts = asyncio.run(count_queries([1, 10, MEDIA_COUNT]))
+    print(f"列表接口（分页大小: 查询次数）: {list_counts}")
+    print(f"详情接口查询次数: {detail_counts}")
+    test_media_queries_constant()
+    print("✅ 媒体查询次数与分页大小无关")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+数据库迁移测试
+从最初版本的表结构（没有 schema_version 表）升级到最新版本，结果应与新建数据库的表结构一致
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, inspect, text
+
+from app.migrations import LATEST_VERSION, get_current_version, run_migrations
+from app.models import Base
+
+# 最初版本的表结构：users 还没有个人资料字段，media_items 还没有缩略图和内容哈希
+BASELINE_SCHEMA = [
+    """CREATE TABLE users (
+        id INTEGER NOT NULL PRIMARY KEY,
+        username VARCHAR(50) NOT NULL,
+        email VARCHAR(100) NOT NULL,
+        hashed_password VARCHAR(255) NOT NULL,
+        full_name VARCHAR(100) NOT NULL,
+        student_id VARCHAR(20),
+        role VARCHAR(7),
+        avatar_url VARCHAR(255),
+        bio TEXT,
+        phone VARCHAR(20),
+        qq VARCHAR(20),
+        wechat VARCHAR(50),
+        dormitory VARCHAR(50),
+        hometown VARCHAR(100),
+        is_active BOOLEAN,
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+        updated_at DATETIME
+    )""",
+    "CREATE UNIQUE INDEX ix_users_email ON users (email)",
+    "CREATE UNIQUE INDEX ix_users_student_id ON users (student_id)",
+    "CREATE INDEX ix_users_id ON users (id)",
+    "CREATE UNIQUE INDEX ix_users_username ON users (username)",
+    """CREATE TABLE activities (
+        id INTEGER NOT NULL PRIMARY KEY,
+        title VARCHAR(200) NOT NULL,
+        description TEXT,
+        activity_date DATETIME,
+        location VARCHAR(200),
+        creator_id INTEGER REFERENCES users (id),
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+        updated_at DATETIME
+    )""",
+    "CREATE INDEX ix_activities_id ON activities (id)",
+    """CREATE TABLE media_items (
+        id INTEGER NOT NULL PRIMARY KEY,
+        filename VARCHAR(255) NOT NULL,
+        original_filename VARCHAR(255) NOT NULL,
+        file_path VARCHAR(500) NOT NULL,
+        file_size INTEGER,
+        media_type VARCHAR(5) NOT NULL,
+        title VARCHAR(200),
+        description TEXT,
+        activity_id INTEGER REFERENCES activities (id),
+        uploader_id INTEGER REFERENCES users (id),
+        upload_time DATETIME DEFAULT (CURRENT_TIMESTAMP),
+        views_count INTEGER
+    )""",
+    "CREATE INDEX ix_media_items_id ON media_items (id)",
+    """CREATE TABLE comments (
+        id INTEGER NOT NULL PRIMARY KEY,
+        content TEXT NOT NULL,
+        media_item_id INTEGER REFERENCES media_items (id),
+        author_id INTEGER REFERENCES users (id),
+        parent_id INTEGER REFERENCES comments (id),
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+        updated_at DATETIME
+    )""",
+    "CREATE INDEX ix_comments_id ON comments (id)",
+    """CREATE TABLE notifications (
+        id INTEGER NOT NULL PRIMARY KEY,
+        title VARCHAR(200) NOT NULL,
+        message TEXT NOT NULL,
+        user_id INTEGER REFERENCES users (id),
+        is_read BOOLEAN,
+        related_comment_id INTEGER REFERENCES comments (id),
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP)
+    )""",
+    "CREATE INDEX ix_notifications_id ON notifications (id)",
+]
+
+BASELINE_DATA = [
+    "INSERT INTO users (username, email, hashed_password, full_name, is_active) "
+    "VALUES ('old', 'old@example.com', 'x', '老用户', 1)",
+    "INSERT INTO activities (title, creator_id) VALUES ('老活动', 1)",
+    "INSERT INTO media_items (filename, original_filename, file_path, media_type, activity_id, uploader_id) "
+    "VALUES ('a.jpg', 'a.jpg', 'photos/a.jpg', 'photo', 1, 1)",
+]
+
+
+def describe_schema(engine):
+    """{表名: (字段集合, {索引名: (列, 是否唯一)})}"""
+    inspector = inspect(engine)
+    schema = {}
+    for table_name in inspector.get_table_names():
+        if table_name == "schema_version":
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table_name)}
+        indexes = {
+            index["name"]: (tuple(index["column_names"]), bool(index["unique"]))
+            for index in inspector.get_indexes(table_name)
+        }
+        schema[table_name] = (columns, indexes)
+    return schema
+
+
+def test_upgrade_baseline_schema():
+    """最初版本的数据库执行全部迁移后，字段和索引与新建的数据库一致，原有数据保留"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'baseline.db')}")
+        with engine.begin() as conn:
+            for statement in BASELINE_SCHEMA + BASELINE_DATA:
+                conn.execute(text(statement))
+
+        applied = run_migrations(engine)
+        assert len(applied) == LATEST_VERSION, applied
+        assert get_current_version(engine) == LATEST_VERSION
+        # 已是最新版本时不再执行
+        assert run_migrations(engine) == []
+
+        fresh = create_engine(f"sqlite:///{os.path.join(tmp, 'fresh.db')}")
+        Base.metadata.create_all(fresh)
+        migrated_schema, fresh_schema = describe_schema(engine), describe_schema(fresh)
+        assert migrated_schema.keys() == fresh_schema.keys()
+        for table_name, (columns, indexes) in fresh_schema.items():
+            migrated_columns, migrated_indexes = migrated_schema[table_name]
+            assert migrated_columns == columns, f"{table_name}: {migrated_columns ^ columns}"
+            assert migrated_indexes == indexes, f"{table_name}: 迁移后 {migrated_indexes}，新建 {indexes}"
+
+        with engine.connect() as conn:
+            assert conn.scalar(text("SELECT file_path FROM media_items WHERE id = 1")) == "photos/a.jpg"
+            assert len(conn.scalar(text("SELECT upload_time FROM media_items WHERE id = 1"))) == 26
+        engine.dispose()
+        fresh.dispose()
+
+
+if __name__ == "__main__":
+    test_upgrade_baseline_schema()
+    print("✅ 最初版本的数据库可以迁移到最新版本")
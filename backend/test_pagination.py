@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+游标分页回归测试
+确保在SQLite上逐页翻阅时，落在整秒上的时间戳（以及同一时刻的多条记录）既不会被跳过也不会重复
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import Response
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.migrations import migration_sqlite_timestamp_format
+from app.models import Base, User, Activity
+from app.pagination import NEXT_CURSOR_HEADER, paginate, set_next_cursor
+
+WHOLE_SECOND = datetime(2024, 5, 1, 12, 0, 0)
+MAX_PAGES = 50
+
+
+async def seed(engine, session_factory):
+    """写入测试数据：整秒、带微秒和同一时刻的多条活动，以及服务端默认值写入的旧格式时间戳"""
+    async with session_factory() as db:
+        creator = User(username="creator", email="creator@example.com", hashed_password="x", full_name="创建者")
+        db.add(creator)
+        await db.flush()
+        timestamps = [
+            WHOLE_SECOND,
+            WHOLE_SECOND,
+            WHOLE_SECOND + timedelta(microseconds=1),
+            WHOLE_SECOND - timedelta(microseconds=1),
+            WHOLE_SECOND + timedelta(seconds=1),
+            WHOLE_SECOND - timedelta(seconds=1),
+            WHOLE_SECOND,
+        ]
+        db.add_all([
+            Activity(title=f"活动{i}", creator_id=creator.id, created_at=timestamp)
+            for i, timestamp in enumerate(timestamps)
+        ])
+        # ORM默认值写入的当前时间
+        db.add(Activity(title="默认时间", creator_id=creator.id))
+        await db.commit()
+
+    # 迁移之前由 CURRENT_TIMESTAMP 写入的整秒时间戳不带微秒
+    async with engine.begin() as conn:
+        for _ in range(2):
+            await conn.execute(text(
+                "INSERT INTO activities (title, creator_id, created_at) "
+                "VALUES ('旧格式', 1, '2024-05-01 12:00:00')"
+            ))
+        await conn.run_sync(migration_sqlite_timestamp_format)
+
+
+async def walk_pages(session_factory, page_size: int, descending: bool):
+    """按游标逐页读取全部活动，返回读到的id顺序"""
+    seen, cursor = [], None
+    # 重复返回同一页时游标不会前进，限制页数避免死循环
+    for _ in range(MAX_PAGES):
+        async with session_factory() as db:
+            query = paginate(
+                select(Activity), Activity.created_at, Activity.id,
+                skip=0, limit=page_size, cursor=cursor, descending=descending
+            )
+            items = (await db.scalars(query)).all()
+        seen.extend(item.id for item in items)
+        response = Response()
+        set_next_cursor(response, items, "created_at", page_size)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+    return seen
+
+
+async def check_pagination():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    await seed(engine, session_factory)
+
+    results = {}
+    for descending in (True, False):
+        async with session_factory() as db:
+            query = select(Activity)
+            if descending:
+                query = query.order_by(Activity.created_at.desc(), Activity.id.desc())
+            else:
+                query = query.order_by(Activity.created_at.asc(), Activity.id.asc())
+            expected = [item.id for item in (await db.scalars(query)).all()]
+        for page_size in (1, 2, 3):
+            results[(descending, page_size)] = (expected, await walk_pages(session_factory, page_size, descending))
+
+    await engine.dispose()
+    return results
+
+
+def test_cursor_pagination_whole_seconds():
+    """逐页读取的结果与一次性排序的结果完全一致"""
+    for (descending, page_size), (expected, seen) in asyncio.run(check_pagination()).items():
+        order = "倒序" if descending else "正序"
+        assert seen == expected, f"{order} 分页大小 {page_size}: 期望 {expected}，实际 {seen}"
+
+
+if __name__ == "__main__":
+    test_cursor_pagination_whole_seconds()
+    print("✅ 整秒时间戳的游标分页没有跳过或重复记录")
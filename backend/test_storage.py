@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+存储后端测试
+使用 moto 模拟 S3（pip install -r requirements-dev.txt），覆盖 S3Storage 的读写删除、预签名直传、
+直传完成接口以及 /uploads 重定向
+"""
+
+import asyncio
+import base64
+import hashlib
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# moto 不校验凭证，但 boto3 签名时需要
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+import requests
+from fastapi import HTTPException
+from moto import mock_aws
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.blob_store import blob_relative_path, blob_store
+from app.models import Base, User, Activity, MediaBlob
+from app.routers import media
+from app.schemas import DirectUploadCreate
+from app.storage import LocalStorage, S3Storage, StorageBackend, StorageRedirect
+
+BUCKET = "class-media"
+REGION = "us-east-1"
+CONTENT = b"0123456789" * 1000
+
+
+def create_s3_storage(**options) -> S3Storage:
+    """在 moto 中创建存储桶并返回指向它的存储后端"""
+    backend = S3Storage(bucket=BUCKET, region=REGION, **options)
+    backend.client.create_bucket(Bucket=BUCKET)
+    return backend
+
+
+def write_temp_file(content: bytes) -> str:
+    fd, path = tempfile.mkstemp()
+    with os.fdopen(fd, "wb") as f:
+        f.write(content)
+    return path
+
+
+def test_incomplete_backend_fails_on_creation():
+    """缺少抽象方法的存储后端在创建实例时就报错"""
+    class IncompleteStorage(StorageBackend):
+        async def put(self, key: str, source_path: str):
+            pass
+
+    try:
+        IncompleteStorage()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("缺少抽象方法的存储后端不应能创建实例")
+    LocalStorage(tempfile.gettempdir())
+
+
+@mock_aws
+def test_s3_put_exists_stream_delete():
+    """put 上传后删除暂存文件，stat/get/stream/delete 读写同一个对象"""
+    backend = create_s3_storage(prefix="media")
+    key = "blobs/ab/cd/test.jpg"
+
+    async def run():
+        assert not await backend.exists(key)
+        source_path = write_temp_file(CONTENT)
+        await backend.put(key, source_path)
+        assert not os.path.exists(source_path), "上传后暂存文件应被删除"
+
+        head = backend.client.head_object(Bucket=BUCKET, Key=f"media/{key}")
+        assert head["ContentType"] == "image/jpeg"
+
+        assert await backend.exists(key)
+        assert (await backend.stat(key)).size == len(CONTENT)
+        assert await backend.get(key) == CONTENT
+        assert b"".join([chunk async for chunk in backend.stream(key, 10, 19)]) == CONTENT[10:20]
+        assert b"".join([chunk async for chunk in backend.stream(key, len(CONTENT) - 5)]) == CONTENT[-5:]
+
+        await backend.delete(key)
+        assert not await backend.exists(key)
+        assert await backend.stat(key) is None
+        # 删除不存在的对象不报错
+        await backend.delete(key)
+
+    asyncio.run(run())
+
+
+@mock_aws
+def test_s3_url():
+    """配置了公开URL时直接拼接，否则返回预签名下载URL"""
+    key = "blobs/ab/cd/测试.jpg"
+    public = create_s3_storage(prefix="media", public_url="https://cdn.example.com/")
+    assert public.url(key) == "https://cdn.example.com/media/blobs/ab/cd/%E6%B5%8B%E8%AF%95.jpg"
+
+    private = create_s3_storage()
+    private.client.put_object(Bucket=BUCKET, Key=key, Body=CONTENT)
+    response = requests.get(private.url(key))
+    assert response.status_code == 200 and response.content == CONTENT
+
+
+@mock_aws
+def test_s3_presign_upload():
+    """按预签名结果上传后，stat 返回存储计算的 SHA-256"""
+    backend = create_s3_storage()
+    key = "blobs/ab/cd/direct.mp4"
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+
+    presigned = backend.presign_upload(key, "video/mp4", len(CONTENT), sha256)
+    assert presigned.method == "PUT"
+    assert presigned.headers["x-amz-checksum-sha256"] == base64.b64encode(bytes.fromhex(sha256)).decode()
+    response = requests.request(presigned.method, presigned.url, data=CONTENT, headers=presigned.headers)
+    assert response.status_code == 200, response.text
+
+    stored = asyncio.run(backend.stat(key))
+    assert stored.size == len(CONTENT)
+    assert stored.sha256 == sha256
+
+
+def test_local_storage_has_no_presign():
+    """本地存储不支持直传"""
+    backend = LocalStorage(tempfile.gettempdir())
+    assert not backend.supports_presigned_upload
+    try:
+        backend.presign_upload("blobs/x.jpg", "image/jpeg", 1, "0" * 64)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("本地存储不应生成预签名直传")
+
+
+async def check_direct_upload_flow(backend: S3Storage):
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async with session_factory() as db:
+        user = User(username="uploader", email="uploader@example.com", hashed_password="x", full_name="上传者")
+        db.add(user)
+        await db.flush()
+        activity = Activity(title="活动", creator_id=user.id)
+        db.add(activity)
+        await db.commit()
+
+    def upload_request(content: bytes, **fields) -> DirectUploadCreate:
+        return DirectUploadCreate(
+            activity_id=activity.id, title="直传视频", filename="clip.mp4", content_type="video/mp4",
+            total_size=len(content), content_hash=hashlib.sha256(content).hexdigest(), **fields
+        )
+
+    try:
+        # 申请直传 → 按票据上传 → 完成
+        upload = upload_request(CONTENT)
+        async with session_factory() as db:
+            ticket = await media.create_direct_upload(upload, db=db, current_user=user)
+        assert ticket["upload_required"]
+        assert ticket["key"] == blob_relative_path(upload.content_hash, ".mp4")
+        response = requests.request(ticket["method"], ticket["url"], data=CONTENT, headers=ticket["headers"])
+        assert response.status_code == 200, response.text
+
+        async with session_factory() as db:
+            item = await media.complete_direct_upload(upload, db=db, current_user=user)
+            assert item.file_path == ticket["key"]
+            assert item.content_hash == upload.content_hash
+            assert item.file_size == len(CONTENT)
+            assert item.media_type == "video"
+            assert (await db.get(MediaBlob, upload.content_hash)).ref_count == 1
+
+        # 相同内容再次申请不需要上传，完成后引用同一个文件
+        async with session_factory() as db:
+            ticket = await media.create_direct_upload(upload, db=db, current_user=user)
+            assert not ticket["upload_required"]
+            item = await media.complete_direct_upload(upload, db=db, current_user=user)
+            assert item.file_path == ticket["key"]
+            blob = await db.get(MediaBlob, upload.content_hash)
+            await db.refresh(blob)
+            assert blob.ref_count == 2
+
+        # 没有上传就调用完成接口
+        missing = upload_request(b"never uploaded")
+        async with session_factory() as db:
+            try:
+                await media.complete_direct_upload(missing, db=db, current_user=user)
+            except HTTPException as e:
+                assert e.status_code == 400
+            else:
+                raise AssertionError("文件未上传时应返回400")
+
+        # 存储中的内容与声明的哈希不一致，或存储没有记录 SHA-256 校验和：返回400并删除该对象，
+        # 不在API进程中下载文件重新计算哈希
+        async def no_download(*args, **kwargs):
+            raise AssertionError("完成直传时不应下载文件内容")
+            yield b""
+
+        backend.stream = no_download
+        for content, extra_args in [
+            (b"other content!!!", {"ChecksumAlgorithm": "SHA256"}),
+            (b"declared content", {}),
+        ]:
+            declared = upload_request(b"declared content")
+            key = blob_relative_path(declared.content_hash, ".mp4")
+            backend.client.put_object(Bucket=BUCKET, Key=key, Body=content, **extra_args)
+            async with session_factory() as db:
+                try:
+                    await media.complete_direct_upload(declared, db=db, current_user=user)
+                except HTTPException as e:
+                    assert e.status_code == 400
+                else:
+                    raise AssertionError(f"应返回400: {extra_args}")
+                assert await db.get(MediaBlob, declared.content_hash) is None
+            assert not await backend.exists(key)
+    finally:
+        await engine.dispose()
+
+
+@mock_aws
+def test_direct_upload_complete():
+    """s3 存储上的直传：申请、上传、完成，以及缺失、内容不一致和没有校验和的文件"""
+    backend = create_s3_storage()
+    original_storage, original_backend = media.storage, blob_store.backend
+    media.storage = blob_store.backend = backend
+    try:
+        asyncio.run(check_direct_upload_flow(backend))
+    finally:
+        media.storage, blob_store.backend = original_storage, original_backend
+
+
+async def call_asgi(app, method: str, path: str):
+    """调用ASGI应用，返回 (状态码, 响应头)"""
+    scope = {
+        "type": "http", "method": method, "path": path, "root_path": "",
+        "query_string": b"", "headers": [], "scheme": "http", "server": ("testserver", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = messages[0]
+    return start["status"], {name.decode(): value.decode() for name, value in start["headers"]}
+
+
+@mock_aws
+def test_storage_redirect():
+    """/uploads 下的相对路径重定向到对象URL，隐藏文件和非读取请求返回404"""
+    backend = create_s3_storage(public_url="https://cdn.example.com")
+    app = StorageRedirect(backend)
+
+    async def run():
+        code, headers = await call_asgi(app, "GET", "/blobs/ab/cd/x.jpg")
+        assert code == 307
+        assert headers["location"] == "https://cdn.example.com/blobs/ab/cd/x.jpg"
+        assert headers["cache-control"] == "private, max-age=300"
+        assert (await call_asgi(app, "HEAD", "/thumbnails/x_small.jpg"))[0] == 307
+        for method, path in [("GET", "/"), ("GET", "/.tmp/upload.part"), ("GET", "/blobs/.x.jpg.part"), ("PUT", "/blobs/x.jpg")]:
+            assert (await call_asgi(app, method, path))[0] == 404, path
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_incomplete_backend_fails_on_creation()
+    test_s3_put_exists_stream_delete()
+    test_s3_url()
+    test_s3_presign_upload()
+    test_local_storage_has_no_presign()
+    test_direct_upload_complete()
+    test_storage_redirect()
+    print("✅ 存储后端与直传流程测试通过")
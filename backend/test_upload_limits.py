@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+上传大小限制测试
+确保超大的上传请求在请求体被读完（由 Starlette 缓存到磁盘）之前就被拒绝
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI, File, UploadFile
+
+from app.uploads import UploadSizeLimitMiddleware
+
+LIMIT = 64 * 1024
+CHUNK = 16 * 1024
+BOUNDARY = b"limit-test-boundary"
+
+app = FastAPI()
+app.add_middleware(UploadSizeLimitMiddleware, limits={"/upload": (LIMIT, "文件大小超过限制")})
+
+
+@app.post("/upload")
+async def upload(file: UploadFile = File(...)):
+    return {"size": len(await file.read())}
+
+
+def multipart_body(size: int) -> bytes:
+    return (
+        b"--" + BOUNDARY + b"\r\n"
+        b'Content-Disposition: form-data; name="file"; filename="a.jpg"\r\n'
+        b"Content-Type: image/jpeg\r\n\r\n" + b"x" * size + b"\r\n--" + BOUNDARY + b"--\r\n"
+    )
+
+
+async def post(body: bytes, send_length: bool):
+    """分块发送请求体，返回 (状态码, 应用读取了的请求体字节数)"""
+    headers = [(b"content-type", b"multipart/form-data; boundary=" + BOUNDARY)]
+    if send_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    scope = {
+        "type": "http", "method": "POST", "path": "/upload", "root_path": "", "query_string": b"",
+        "headers": headers, "scheme": "http", "server": ("testserver", 80), "http_version": "1.1",
+    }
+    chunks = [body[i:i + CHUNK] for i in range(0, len(body), CHUNK)]
+    consumed = 0
+    messages = []
+
+    async def receive():
+        nonlocal consumed
+        if consumed >= len(chunks):
+            return {"type": "http.disconnect"}
+        chunk = chunks[consumed]
+        consumed += 1
+        return {"type": "http.request", "body": chunk, "more_body": consumed < len(chunks)}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages[0]["status"], sum(len(chunk) for chunk in chunks[:consumed])
+
+
+def test_small_upload_passes():
+    """限制以内的上传正常处理"""
+    status_code, read = asyncio.run(post(multipart_body(LIMIT // 2), send_length=True))
+    assert status_code == 200
+
+
+def test_content_length_rejected_without_reading():
+    """Content-Length 超限时不读取请求体"""
+    status_code, read = asyncio.run(post(multipart_body(LIMIT * 10), send_length=True))
+    assert status_code == 413
+    assert read == 0, f"不应读取请求体，实际读取了 {read} 字节"
+
+
+def test_streamed_body_stops_at_limit():
+    """没有 Content-Length 时，读到超过限制的字节数就中止"""
+    status_code, read = asyncio.run(post(multipart_body(LIMIT * 10), send_length=False))
+    assert status_code == 413
+    assert read <= LIMIT + CHUNK, f"超过限制后仍读取了 {read} 字节"
+
+
+if __name__ == "__main__":
+    test_small_upload_passes()
+    test_content_length_rejected_without_reading()
+    test_streamed_body_stops_at_limit()
+    print("✅ 超大上传在请求体读完之前被拒绝")